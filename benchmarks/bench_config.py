@@ -0,0 +1,233 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark configuration loading, validation and serialization.
+
+Synthetic configurations of several sizes are generated, mixing implicit and explicit remotes.
+The best time of each benchmark and the peak memory allocated while running it are recorded.
+Results can be saved and compared against a previous run to catch regressions. Run with::
+
+    python benchmarks/bench_config.py --output new.json --compare old.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from projector import __version__
+from projector.config import ConfigSchema
+from projector.scm_tools.git import GitRepositorySchema
+
+
+#: The version of the results format.
+RESULTS_VERSION = 1
+
+#: The default numbers of repositories in the generated configurations.
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+
+#: The default fraction by which a benchmark must slow down to be reported as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+
+def make_config(count: int) -> Dict[str, Any]:
+    """Return a raw configuration with the given number of repositories.
+
+    Every third repository has a single implicit remote. The others have an explicit default
+    remote and an implicit fork, some of which also set a ref.
+    """
+    repositories = {}
+
+    for i in range(count):
+        url = f"https://example.com/org-{i % 97}/repo-{i}.git"
+
+        if i % 3 == 0:
+            config = {"remotes": {"origin": url}}
+        else:
+            config = {
+                "remotes": {
+                    "upstream": {"url": url, "default": True},
+                    "origin": f"git@example.com:user/repo-{i}.git",
+                }
+            }
+
+            if i % 3 == 2:
+                config["ref"] = "develop"
+
+        repositories[f"repo-{i}"] = {"scm": "Git", "config": config}
+
+    return {"directories": {"source": "/src"}, "repositories": repositories}
+
+
+def make_benchmarks(count: int) -> Dict[str, Callable[[], Any]]:
+    """Return the benchmarks for a configuration with the given number of repositories."""
+    raw = make_config(count)
+    config = ConfigSchema().load(raw)
+    git_configs = [repository["config"] for repository in config["repositories"].values()]
+    raw_git_configs = [repository["config"] for repository in raw["repositories"].values()]
+    git_schema = GitRepositorySchema()
+    remotes_field = git_schema.fields["remotes"].value_container
+    raw_remotes = [
+        remote for git_config in raw_git_configs for remote in git_config["remotes"].values()
+    ]
+
+    # _post_load is given the data as it is after the fields have been deserialized.
+    deserialized_git_configs = [
+        {"ref": git_config.get("ref", "master"), "detach": False, "remotes": git_config["remotes"]}
+        for git_config in raw_git_configs
+    ]
+
+    return {
+        "config.load": lambda: ConfigSchema().load(raw),
+        "config.dump": lambda: ConfigSchema().dump(config),
+        "git.dump": lambda: [git_schema.dump(git_config) for git_config in git_configs],
+        "git._post_load": lambda: [
+            git_schema._post_load(git_config) for git_config in deserialized_git_configs
+        ],
+        "git._pre_dump": lambda: [git_schema._pre_dump(git_config) for git_config in git_configs],
+        "fields.EitherField": lambda: [
+            remotes_field._field_for_type(type(remote)) for remote in raw_remotes
+        ],
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Return the best time per call and peak memory of a benchmark.
+
+    Memory is measured in a separate, untimed run, since tracing allocations slows everything
+    down.
+    """
+    timer = timeit.Timer(func)
+
+    # Fast benchmarks are run enough times per sample to be measurable over timer noise.
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def run_benchmarks(sizes: List[int], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark for every size and return the results, keyed by ``name/size``."""
+    results = {}
+
+    for size in sizes:
+        for name, func in make_benchmarks(size).items():
+            key = f"{name}/{size}"
+            results[key] = measure(func, repeat)
+
+            print(
+                f"{key:>28}: {results[key]['seconds'] * 1000:10.2f} ms, "
+                f"peak {results[key]['peak_bytes'] / 1024:10.1f} KiB",
+                flush=True,
+            )
+
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[str]:
+    """Print a comparison of results against a baseline.
+
+    Returns:
+        The keys of the benchmarks that regressed by more than the threshold, in time or memory.
+    """
+    regressions = []
+
+    for key in sorted(results.keys() & baseline.keys()):
+        new = results[key]
+        old = baseline[key]
+        time_ratio = new["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        memory_ratio = new["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else 1.0
+        regressed = max(time_ratio, memory_ratio) > 1 + threshold
+
+        if regressed:
+            regressions.append(key)
+
+        print(
+            f"{key:>28}: time x{time_ratio:5.2f}, memory x{memory_ratio:5.2f}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="The numbers of repositories to generate.",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="The number of samples to take.")
+    parser.add_argument("--output", type=Path, help="Where to save the results, as JSON.")
+    parser.add_argument("--compare", type=Path, help="Previously saved results to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="The fractional slowdown or memory growth reported as a regression.",
+    )
+    options = parser.parse_args()
+
+    results = run_benchmarks(sorted(options.sizes), options.repeat)
+
+    if options.output:
+        options.output.parent.mkdir(parents=True, exist_ok=True)
+        options.output.write_text(
+            json.dumps(
+                {
+                    "version": RESULTS_VERSION,
+                    "projector": __version__,
+                    "python": platform.python_version(),
+                    "created": time.time(),
+                    "results": results,
+                },
+                indent=2,
+                sort_keys=True,
+            )
+        )
+
+    if options.compare:
+        baseline = json.loads(options.compare.read_text())
+
+        if baseline.get("version") != RESULTS_VERSION:
+            sys.exit(f"{options.compare} has an unsupported results version")
+
+        print(f"\nCompared with Projector {baseline['projector']}:")
+
+        if compare(results, baseline["results"], options.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark EitherField dispatch through GitRepositorySchema.remotes.
+
+Run with::
+
+    python benchmarks/bench_fields.py
+"""
+
+import argparse
+import timeit
+from collections import OrderedDict
+
+from projector.scm_tools.git import GitRepositorySchema
+
+
+def make_remotes(count: int, mapping_type: type) -> dict:
+    """Return raw remotes, alternating between implicit and explicit remotes."""
+    remotes = {}
+
+    for i in range(count):
+        url = f"https://example.com/remote-{i}.git"
+
+        if i % 2:
+            remotes[f"remote-{i}"] = url
+        else:
+            remotes[f"remote-{i}"] = mapping_type(url=url, default=(i == 0))
+
+    return remotes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--remotes", type=int, default=1000, help="The number of remotes.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of samples to take.")
+    parser.add_argument("--number", type=int, default=10, help="The loads per sample.")
+    options = parser.parse_args()
+
+    schema = GitRepositorySchema()
+    remotes_field = schema.fields["remotes"].value_container
+
+    # OrderedDict values (as produced by ``object_pairs_hook``) are not an exact type match, so
+    # they exercise the subclass path of the dispatch.
+    for mapping_type in (dict, OrderedDict):
+        data = {"remotes": make_remotes(options.remotes, mapping_type)}
+
+        load_samples = timeit.repeat(
+            lambda: schema.load(data), repeat=options.repeat, number=options.number
+        )
+
+        values = list(data["remotes"].values())
+        dispatch_samples = timeit.repeat(
+            lambda: [remotes_field._field_for_type(type(value)) for value in values],
+            repeat=options.repeat,
+            number=options.number,
+        )
+
+        per_load = min(load_samples) / options.number * 1000
+        per_dispatch = min(dispatch_samples) / (options.number * len(values)) * 1e9
+
+        print(
+            f"{mapping_type.__name__:>11}: load {per_load:8.2f} ms "
+            f"({options.remotes} remotes), dispatch {per_dispatch:6.1f} ns/value"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark SCM tool discovery at startup.
+
+Each sample runs in a fresh interpreter so that import and metadata-scanning costs are included.
+Run with::
+
+    python benchmarks/bench_scm_tools.py
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+#: The code for each benchmark, keyed by benchmark name.
+BENCHMARKS = {
+    "pkg_resources": (
+        "from pkg_resources import iter_entry_points\n"
+        "tools = list(iter_entry_points('projector.scm_tools'))\n"
+    ),
+    "registry (no index)": (
+        "from projector.scm_tools.registry import ScmToolRegistry\n"
+        "tools = ScmToolRegistry.discover()\n"
+    ),
+    "registry (index)": (
+        "from pathlib import Path\n"
+        "from projector.scm_tools.registry import ScmToolRegistry\n"
+        "tools = ScmToolRegistry.discover(Path({index_path!r}))\n"
+    ),
+}
+
+
+def run_sample(code: str) -> float:
+    """Return the wall-clock time of running code in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return time.perf_counter() - start
+
+
+def run_benchmarks(repeat: int, index_path: Path) -> Dict[str, List[float]]:
+    """Run every benchmark and return its samples."""
+    results = {}
+
+    for name, code in BENCHMARKS.items():
+        code = code.format(index_path=str(index_path))
+
+        # Warm up the OS page cache and build the index, if any.
+        run_sample(code)
+
+        results[name] = [run_sample(code) for i in range(repeat)]
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="The number of samples to take.")
+    options = parser.parse_args()
+
+    baseline = min(run_sample("pass") for i in range(options.repeat))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = run_benchmarks(options.repeat, Path(tmp_dir) / "entry_points.json")
+
+    print(f"interpreter startup: {baseline * 1000:8.2f} ms (subtracted below)")
+
+    for name, samples in results.items():
+        median = (statistics.median(samples) - baseline) * 1000
+        best = (min(samples) - baseline) * 1000
+        print(f"{name:>20}: median {median:8.2f} ms, best {best:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Export and import of development environments as bundles.
+
+An environment bundle is a ZIP archive holding the configuration and a bundle of every
+repository that exists in the source directory. Repository bundles are streamed into the archive
+as they are generated, so exporting needs no disk space besides the archive itself.
+"""
+
+import asyncio
+import json
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from projector.config import ConfigSchema, dump_config
+from projector.scheduler import repository_priority
+from projector.scm_tools import get_scm_tools
+from projector.sync import DEFAULT_JOBS, SyncContext
+from projector.trace import span
+
+
+#: The version of the environment bundle format.
+BUNDLE_VERSION = 1
+
+#: The name of the configuration in an environment bundle.
+BUNDLE_CONFIG_NAME = "projector.json"
+
+#: The name of the manifest in an environment bundle.
+#:
+#: The manifest maps the names of repositories to the names of their bundles. It is written
+#: last, so that it only lists bundles that were written completely.
+BUNDLE_MANIFEST_NAME = "manifest.json"
+
+#: The directory that repository bundles are kept in within an environment bundle.
+BUNDLE_REPOSITORIES_DIR = "repositories"
+
+
+async def export_environment_async(config: Dict[str, Any], out: BinaryIO) -> Dict[str, Exception]:
+    """Export a development environment.
+
+    Repositories that do not exist in the source directory are only exported as configuration,
+    and will not be imported.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        out:
+            The file to write the environment bundle to. It does not need to be seekable.
+
+    Returns:
+        A mapping of repository names to the errors that occurred while exporting them.
+    """
+    scm_tools = get_scm_tools()
+    source = config["directories"]["source"]
+    errors: Dict[str, Exception] = {}
+    bundles: Dict[str, str] = {}
+
+    with zipfile.ZipFile(out, "w") as archive:
+        archive.writestr(
+            BUNDLE_CONFIG_NAME,
+            json.dumps(dump_config(config), indent=4),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+        for name, repository in config["repositories"].items():
+            path = source / name
+
+            if not path.exists():
+                continue
+
+            bundle_name = f"{BUNDLE_REPOSITORIES_DIR}/{name}.bundle"
+
+            # Bundles are already compressed, so they are stored as-is.
+            with span("export", "bundle", repository=name):
+                try:
+                    scm = scm_tools[repository["scm"]]
+
+                    with archive.open(bundle_name, "w", force_zip64=True) as entry:
+                        await scm.export_bundle(path, repository["config"], entry)
+                except Exception as e:
+                    errors[name] = e
+                else:
+                    bundles[name] = bundle_name
+
+        archive.writestr(
+            BUNDLE_MANIFEST_NAME,
+            json.dumps({"version": BUNDLE_VERSION, "bundles": bundles}),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+    return errors
+
+
+async def import_environment_async(
+    path: Path, *, source: Optional[Path] = None, jobs: int = DEFAULT_JOBS
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Import a development environment.
+
+    Bundles are unpacked one at a time into the source directory, and each repository is cloned
+    from its bundle while the next is unpacked. Repositories that already exist, or that have no
+    bundle, are left alone; synchronizing the environment will clone them from their remotes.
+
+    Args:
+        path:
+            The path to the environment bundle.
+
+        source:
+            The directory to check out repositories into. Defaults to the source directory of the
+            exported configuration.
+
+        jobs:
+            The maximum number of repositories to clone at once.
+
+    Returns:
+        The imported configuration and a mapping of repository names to the errors that occurred
+        while importing them.
+
+    Raises:
+        ValueError:
+            The environment bundle is not supported.
+
+        marshmallow.exceptions.ValidationError:
+            The configuration in the environment bundle is invalid.
+    """
+    with zipfile.ZipFile(str(path)) as archive:
+        manifest = json.loads(archive.read(BUNDLE_MANIFEST_NAME).decode("utf-8"))
+
+        if manifest.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported environment bundle version: {manifest.get('version')}")
+
+        data = json.loads(archive.read(BUNDLE_CONFIG_NAME).decode("utf-8"))
+
+        if source is not None:
+            data["directories"]["source"] = str(source)
+
+        config = ConfigSchema().load(data)
+        source = config["directories"]["source"]
+        source.mkdir(parents=True, exist_ok=True)
+
+        scm_tools = get_scm_tools()
+        context = SyncContext(config, jobs=jobs, local_jobs=jobs)
+        loop = asyncio.get_running_loop()
+        errors: Dict[str, Exception] = {}
+
+        def unpack(bundle_name: str, bundle_path: Path) -> None:
+            with archive.open(bundle_name) as src, bundle_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        async def clone_one(name: str, bundle_path: Path) -> None:
+            repository = config["repositories"][name]
+
+            try:
+                async with context.scheduler.slot(
+                    hosts=(), priority=repository_priority(repository)
+                ):
+                    with span("import", "bundle", repository=name):
+                        await scm_tools[repository["scm"]].clone_bundle(
+                            source / name, repository["config"], bundle_path
+                        )
+            finally:
+                bundle_path.unlink()
+
+        names = []
+        clones = []
+
+        for name, bundle_name in manifest["bundles"].items():
+            if name not in config["repositories"] or (source / name).exists():
+                continue
+
+            bundle_path = source / f".{name}.bundle"
+
+            try:
+                # Unpacking blocks, so it happens off the event loop to let clones progress.
+                await loop.run_in_executor(None, unpack, bundle_name, bundle_path)
+            except Exception as e:
+                errors[name] = e
+                continue
+
+            names.append(name)
+            clones.append(asyncio.ensure_future(clone_one(name, bundle_path)))
+
+        results = await asyncio.gather(*clones, return_exceptions=True)
+
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            errors[name] = result
+
+    return config, errors
+
+
+def export_environment(config: Dict[str, Any], path: Path) -> Dict[str, Exception]:
+    """Export a development environment to a file.
+
+    This is a blocking wrapper around :py:func:`export_environment_async`.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        path:
+            The path to write the environment bundle to.
+
+    Returns:
+        A mapping of repository names to the errors that occurred while exporting them.
+    """
+    with path.open("wb") as out:
+        return asyncio.run(export_environment_async(config, out))
+
+
+def import_environment(
+    path: Path, *, source: Optional[Path] = None, jobs: int = DEFAULT_JOBS
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Import a development environment.
+
+    This is a blocking wrapper around :py:func:`import_environment_async`.
+
+    Args:
+        path:
+            The path to the environment bundle.
+
+        source:
+            The directory to check out repositories into. Defaults to the source directory of the
+            exported configuration.
+
+        jobs:
+            The maximum number of repositories to clone at once.
+
+    Returns:
+        The imported configuration and a mapping of repository names to the errors that occurred
+        while importing them.
+    """
+    return asyncio.run(import_environment_async(path, source=source, jobs=jobs))
@@ -0,0 +1,84 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Projector's on-disk cache."""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Return the directory that Projector caches data in.
+
+    The directory can be overridden with the ``PROJECTOR_CACHE_DIR`` environment variable. If
+    that is not set, it will be ``projector`` inside the XDG cache directory (i.e.,
+    ``$XDG_CACHE_HOME`` or ``~/.cache``). Caching can be disabled by setting the
+    ``PROJECTOR_NO_CACHE`` environment variable to a non-empty value.
+
+    The directory will not be created.
+
+    Returns:
+        The cache directory, or ``None`` if caching is disabled.
+    """
+    if os.environ.get("PROJECTOR_NO_CACHE"):
+        return None
+
+    cache_dir = os.environ.get("PROJECTOR_CACHE_DIR")
+
+    if cache_dir:
+        return Path(cache_dir)
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+
+    if xdg_cache_home:
+        return Path(xdg_cache_home) / "projector"
+
+    return Path.home() / ".cache" / "projector"
+
+
+def write_atomic(path: Path, data: bytes) -> bool:
+    """Atomically write data to a file in the cache.
+
+    The parent directories will be created if necessary. Failures are not fatal, as the cache is
+    only an optimization.
+
+    Args:
+        path:
+            The path to write to.
+
+        data:
+            The data to write.
+
+    Returns:
+        Whether or not the data was written.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(data)
+        os.replace(str(tmp_path), str(path))
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+        return False
+
+    return True
@@ -0,0 +1,324 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""The command-line interface.
+
+Projector is run from shell prompts and Git hooks, so it must start quickly. Only this module
+and :py:mod:`projector` are imported up front: every command imports what it needs when it
+runs, so that, e.g., ``projector --version`` never imports marshmallow or the SCM tools.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from projector import __version__
+
+if TYPE_CHECKING:  # Avoid importing the status module just to run the CLI.
+    from projector.status import RepositoryStatus
+
+
+#: The default path of the configuration file.
+DEFAULT_CONFIG_PATH = "projector.json"
+
+
+#: The help for the ``--jobs`` option of each command.
+JOBS_HELP = "The maximum number of repositories to work on at once."
+
+
+class CommandError(Exception):
+    """An error that ends a command with a message instead of a traceback."""
+
+
+def _load_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """Load the configuration named on the command line.
+
+    Raises:
+        CommandError:
+            The configuration could not be read or is invalid.
+    """
+    from marshmallow import ValidationError
+
+    from projector.config import load_config
+
+    try:
+        return load_config(Path(args.config))
+    except OSError as e:
+        raise CommandError(f"could not read configuration: {e}")
+    except (ValueError, ValidationError) as e:
+        raise CommandError(f"invalid configuration: {e}")
+
+
+def _options(args: argparse.Namespace, *names: str) -> Dict[str, Any]:
+    """Return the options that were given on the command line.
+
+    Options that were not given are left out, so that the defaults of the function they are
+    passed to apply.
+    """
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+def _report_errors(errors: Dict[str, Exception]) -> int:
+    """Print the errors of repositories and return the exit status."""
+    for name, error in errors.items():
+        print(f"{name}: {error}", file=sys.stderr)
+
+    return 1 if errors else 0
+
+
+def _sync(args: argparse.Namespace) -> int:
+    """Synchronize every configured repository."""
+    from projector.sync import sync_repositories
+
+    config = _load_config(args)
+
+    return _report_errors(sync_repositories(config, **_options(args, "jobs", "max_age")))
+
+
+def _format_status(status: "RepositoryStatus") -> str:
+    """Return the line describing the status of a repository."""
+    if status.error is not None:
+        return f"{status.name}: error: {status.error}"
+
+    if not status.present:
+        return f"{status.name}: missing"
+
+    details = [status.ref or status.head or "?"]
+
+    if status.dirty:
+        details.append("dirty")
+
+    if status.ahead:
+        details.append(f"ahead {status.ahead}")
+
+    if status.behind:
+        details.append(f"behind {status.behind}")
+
+    return f"{status.name}: {', '.join(details)}"
+
+
+def _status(args: argparse.Namespace) -> int:
+    """Print the status of every configured repository.
+
+    The status recorded for each repository is reused while it is still valid, so this is
+    cheapest while ``projector watch`` keeps it current.
+    """
+    from projector.status import get_status
+
+    config = _load_config(args)
+
+    for status in get_status(config, **_options(args, "jobs")).values():
+        print(_format_status(status))
+
+    return 0
+
+
+def _watch(args: argparse.Namespace) -> int:
+    """Keep the recorded status of every configured repository current until interrupted.
+
+    The status of each repository is printed whenever it changes.
+    """
+    import asyncio
+
+    from projector.watch import RepositoryWatcher
+
+    config = _load_config(args)
+
+    def print_status(status: "RepositoryStatus") -> None:
+        print(_format_status(status), flush=True)
+
+    async def watch() -> None:
+        options = _options(args, "jobs", "delay")
+
+        with RepositoryWatcher(config, on_change=print_status, **options) as watcher:
+            await watcher.run()
+
+    try:
+        asyncio.run(watch())
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+def _export(args: argparse.Namespace) -> int:
+    """Export the environment to a bundle."""
+    from projector.bundle import export_environment
+
+    config = _load_config(args)
+
+    return _report_errors(export_environment(config, Path(args.bundle)))
+
+
+def _import(args: argparse.Namespace) -> int:
+    """Import an environment from a bundle."""
+    from marshmallow import ValidationError
+
+    from projector.bundle import import_environment
+
+    source = Path(args.source) if args.source is not None else None
+
+    try:
+        _, errors = import_environment(Path(args.bundle), source=source, **_options(args, "jobs"))
+    except (KeyError, ValueError, ValidationError) as e:
+        raise CommandError(f"invalid environment bundle: {e}")
+
+    return _report_errors(errors)
+
+
+def _snapshot(args: argparse.Namespace) -> int:
+    """Snapshot the source directory."""
+    from projector.snapshot import create_snapshot
+
+    create_snapshot(_load_config(args), Path(args.snapshot))
+
+    return 0
+
+
+def _restore(args: argparse.Namespace) -> int:
+    """Restore the source directory from a snapshot."""
+    from projector.snapshot import restore_snapshot
+
+    restore_snapshot(_load_config(args), Path(args.snapshot))
+
+    return 0
+
+
+def _positive_int(value: str) -> int:
+    """Parse a positive integer argument."""
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"not a positive integer: {value!r}")
+
+    return n
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """Return the parser for command-line arguments.
+
+    Returns:
+        The parser. The handler of the chosen command is stored as ``handler``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="projector", description="Manage repositories and development environments."
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=DEFAULT_CONFIG_PATH,
+        help=f"The configuration file (default: {DEFAULT_CONFIG_PATH}).",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a trace of the command in the Chrome trace event format to PATH.",
+    )
+
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    sync = commands.add_parser("sync", help="Clone or fetch every repository.")
+    sync.add_argument("-j", "--jobs", type=_positive_int, help=JOBS_HELP)
+    sync.add_argument(
+        "--max-age",
+        type=float,
+        metavar="SECONDS",
+        help="Skip repositories synchronized within this many seconds.",
+    )
+    sync.set_defaults(handler=_sync)
+
+    status = commands.add_parser("status", help="Show the status of every repository.")
+    status.add_argument("-j", "--jobs", type=_positive_int, help=JOBS_HELP)
+    status.set_defaults(handler=_status)
+
+    watch = commands.add_parser(
+        "watch", help="Keep the status of every repository current as they change."
+    )
+    watch.add_argument("-j", "--jobs", type=_positive_int, help=JOBS_HELP)
+    watch.add_argument(
+        "--delay",
+        type=float,
+        metavar="SECONDS",
+        help="Wait this many seconds for a burst of changes to settle before refreshing.",
+    )
+    watch.set_defaults(handler=_watch)
+
+    export = commands.add_parser("export", help="Export the environment to a bundle.")
+    export.add_argument("bundle", metavar="BUNDLE")
+    export.set_defaults(handler=_export)
+
+    import_ = commands.add_parser("import", help="Import an environment from a bundle.")
+    import_.add_argument("bundle", metavar="BUNDLE")
+    import_.add_argument("--source", help="The directory to check out repositories into.")
+    import_.add_argument("-j", "--jobs", type=_positive_int, help=JOBS_HELP)
+    import_.set_defaults(handler=_import)
+
+    snapshot = commands.add_parser("snapshot", help="Snapshot the source directory.")
+    snapshot.add_argument("snapshot", metavar="PATH")
+    snapshot.set_defaults(handler=_snapshot)
+
+    restore = commands.add_parser("restore", help="Restore the source directory from a snapshot.")
+    restore.add_argument("snapshot", metavar="PATH")
+    restore.set_defaults(handler=_restore)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run Projector.
+
+    Args:
+        argv:
+            The command-line arguments. Defaults to :py:data:`sys.argv`.
+
+    Returns:
+        The exit status.
+    """
+    args = make_parser().parse_args(argv)
+
+    if args.trace is None:
+        return _run(args)
+
+    from projector.trace import tracing
+
+    with tracing() as tracer:
+        try:
+            return _run(args)
+        finally:
+            tracer.write_chrome_trace(Path(args.trace))
+
+
+def _run(args: argparse.Namespace) -> int:
+    """Run the handler of a command."""
+    try:
+        return args.handler(args)
+    except CommandError as e:
+        print(f"projector: error: {e}", file=sys.stderr)
+        return 2
+    except OSError as e:
+        print(f"projector: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,17 +17,71 @@
 
 """Projector configuration."""
 
-from marshmallow import Schema, ValidationError, fields, validates_schema
+import hashlib
+import json
+import pickle
+from copy import deepcopy
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, TextIO, Tuple
 
-from projector.fields import PathField
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
+
+from projector import __version__
+from projector.cache import get_cache_dir, write_atomic
+from projector.dependencies import dependency_errors, get_dependencies
+from projector.fields import PathField, SizeField
+from projector.jsonstream import JsonStreamReader
 from projector.scm_tools import get_scm_tools
+from projector.trace import span
+
+
+#: The maximum number of validated configurations kept in the cache.
+MAX_CACHED_CONFIGS = 16
+
+#: The version of the cached configuration format.
+#:
+#: This must be bumped whenever the pickled form of validated configuration changes.
+CONFIG_CACHE_VERSION = 2
+
+#: The default number of repositories validated by each task in :py:func:`validate_repositories`.
+DEFAULT_VALIDATION_CHUNK_SIZE = 256
 
 
 class DirectoriesSchema(Schema):
     """The schema for the directories section."""
 
+    #: The directory that repositories are checked out into.
     source = PathField(required=True)
 
+    #: The directory that object stores shared between repositories are kept in.
+    #:
+    #: If this is not provided, repositories do not share objects.
+    objects = PathField()
+
+
+class MirrorsSchema(Schema):
+    """The schema for the mirrors section."""
+
+    #: The directory that mirrors of remote repositories are kept in.
+    directory = PathField(required=True)
+
+    #: The disk space mirrors may use, in bytes.
+    #:
+    #: The least recently used mirrors are removed when they use more than this. If this is not
+    #: provided, mirrors are never removed.
+    max_size = SizeField()
+
+
+class HostSchema(Schema):
+    """The schema for the limits of a single host."""
+
+    #: The maximum number of SCM operations that talk to the host at once.
+    jobs = fields.Integer(validate=validate.Range(min=1))
+
+    #: The maximum number of SCM operations started per second.
+    rate = fields.Float(validate=lambda value: value > 0)
+
 
 class RepositorySchema(Schema):
     """A schema representing a single repository."""
@@ -35,6 +89,12 @@ class RepositorySchema(Schema):
     scm = fields.String(required=True)
     config = fields.Dict(required=True)
 
+    #: Whether or not the repository is synchronized before others.
+    critical = fields.Boolean()
+
+    #: The names of the repositories that must be set up before this one.
+    depends_on = fields.List(fields.String())
+
     @validates_schema
     def _validate_scm(self, data):
         """Validate the given SCM is known and its config is valid.
@@ -45,21 +105,481 @@ class RepositorySchema(Schema):
         """
         scm_name = data["scm"]
 
-        try:
-            scm = get_scm_tools()[scm_name]
-        except KeyError:
-            raise ValidationError(f"Unknown SCM: `{scm_name}'", field_names=("scm",))
+        with span("validate_scm", "config", scm=scm_name):
+            try:
+                scm = get_scm_tools()[scm_name]
+            except KeyError:
+                raise ValidationError(f"Unknown SCM: `{scm_name}'", field_names=("scm",))
 
-        if scm_name != "Git":
-            assert False
+            if scm_name != "Git":
+                assert False
 
-        data["config"] = scm.schema().load(data["config"])
+            data["config"] = scm.load_config(data["config"])
 
 
 class ConfigSchema(Schema):
     """A schema representing the entirety of the configuration."""
 
     directories = fields.Nested(DirectoriesSchema, required=True)
+    mirrors = fields.Nested(MirrorsSchema)
+    hosts = fields.Dict(keys=fields.String(), values=fields.Nested(HostSchema))
     repositories = fields.Dict(
         required=True, keys=fields.String(), values=fields.Nested(RepositorySchema)
     )
+
+    @validates_schema
+    def _validate_dependencies(self, data):
+        """Validate the dependencies between repositories.
+
+        Raises:
+            marshmallow.exceptions.ValidationError:
+                A repository depends on an unknown repository or on itself, possibly indirectly.
+        """
+        _validate_dependencies(get_dependencies(data["repositories"]))
+
+    def load(self, data, *args, **kwargs):
+        """Load and validate a configuration.
+
+        This is traced as a single span.
+        """
+        with span("ConfigSchema.load", "config"):
+            return super().load(data, *args, **kwargs)
+
+
+def _validate_dependencies(dependencies: Mapping[str, List[str]]) -> None:
+    """Validate the dependencies between repositories.
+
+    Raises:
+        marshmallow.exceptions.ValidationError:
+            A repository depends on an unknown repository or on itself, possibly indirectly. The
+            error messages have the structure of those for the repositories section.
+    """
+    errors = dependency_errors(dependencies)
+
+    if errors:
+        raise ValidationError(
+            {name: {"value": {"depends_on": messages}} for name, messages in errors.items()},
+            field_names=("repositories",),
+        )
+
+
+def dump_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Dump a validated configuration into its raw form.
+
+    Loading the result with :py:meth:`ConfigSchema.load` produces the original configuration.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`ConfigSchema`.
+
+    Returns:
+        The raw configuration, which can be serialized as JSON.
+    """
+    scm_tools = get_scm_tools()
+    data = ConfigSchema(exclude=("repositories",)).dump(config)
+
+    data["repositories"] = {
+        name: {
+            **RepositorySchema(exclude=("config",)).dump(repository),
+            "config": scm_tools[repository["scm"]].schema().dump(repository["config"]),
+        }
+        for name, repository in config["repositories"].items()
+    }
+
+    return data
+
+
+class IncrementalConfigLoader:
+    """A loader that only revalidates the repositories that changed since its last load.
+
+    The raw configuration of each repository is compared against the one from the previous
+    successful load of that repository. Unchanged repositories reuse their previously validated
+    data, so the validated data returned by successive loads may share objects and must not be
+    modified.
+    """
+
+    def __init__(self):
+        """Initialize the loader."""
+        self._raw_repositories: Dict[str, Any] = {}
+        self._repositories: Dict[str, Any] = {}
+
+    def load(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Load and validate a configuration.
+
+        Args:
+            data:
+                The raw configuration.
+
+        Returns:
+            The validated configuration, identical to the result of
+            :py:meth:`ConfigSchema.load`.
+
+        Raises:
+            marshmallow.exceptions.ValidationError:
+                The configuration is invalid. The error messages are identical to those of
+                :py:meth:`ConfigSchema.load`.
+        """
+        raw_repositories = data.get("repositories") if isinstance(data, dict) else None
+
+        if not isinstance(raw_repositories, dict) or not all(
+            isinstance(name, str) for name in raw_repositories
+        ):
+            # There is nothing to diff, so defer to the schema to report the error.
+            self._raw_repositories.clear()
+            self._repositories.clear()
+
+            return ConfigSchema().load(data)
+
+        messages: Dict[str, Any] = {}
+
+        try:
+            config = ConfigSchema().load({**data, "repositories": {}})
+        except ValidationError as e:
+            config = None
+            messages.update(e.messages)
+
+        repositories = {}
+        repository_errors = {}
+
+        for name, raw_repository in raw_repositories.items():
+            if name in self._repositories and self._raw_repositories[name] == raw_repository:
+                repositories[name] = self._repositories[name]
+                continue
+
+            self._raw_repositories.pop(name, None)
+            self._repositories.pop(name, None)
+
+            try:
+                repository = RepositorySchema().load(raw_repository)
+            except ValidationError as e:
+                repository_errors[name] = {"value": e.messages}
+            else:
+                self._raw_repositories[name] = deepcopy(raw_repository)
+                self._repositories[name] = repositories[name] = repository
+
+        for name in self._repositories.keys() - raw_repositories.keys():
+            del self._raw_repositories[name]
+            del self._repositories[name]
+
+        if repository_errors:
+            messages["repositories"] = repository_errors
+        else:
+            try:
+                _validate_dependencies(get_dependencies(repositories))
+            except ValidationError as e:
+                messages["repositories"] = e.messages
+
+        if messages:
+            raise ValidationError(messages)
+
+        config["repositories"] = repositories
+        return config
+
+
+class StreamingConfigLoader:
+    """A loader that validates a JSON configuration while it is being read.
+
+    Iterating over the loader yields each validated repository as soon as it has been parsed, so
+    neither the raw nor the validated configuration is ever held in memory in its entirety. The
+    validated directories, mirrors, and hosts sections are available as :py:attr:`directories`,
+    :py:attr:`mirrors`, and :py:attr:`hosts` once they have been read, which is before the first
+    repository if they appear first in the document.
+
+    Unlike :py:meth:`ConfigSchema.load`, validation stops at the first error.
+    """
+
+    def __init__(self, fp: TextIO):
+        """Initialize the loader.
+
+        Args:
+            fp:
+                The file to read the configuration from.
+        """
+        self._fp = fp
+
+        #: The validated directories section.
+        #:
+        #: This will be ``None`` until the section has been read.
+        self.directories: Optional[Dict[str, Any]] = None
+
+        #: The validated mirrors section.
+        #:
+        #: This will be ``None`` until the section has been read, or if there is none.
+        self.mirrors: Optional[Dict[str, Any]] = None
+
+        #: The validated hosts section.
+        #:
+        #: This will be ``None`` until the section has been read, or if there is none.
+        self.hosts: Optional[Dict[str, Any]] = None
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over the validated repositories.
+
+        Yields:
+            Pairs of repository names and validated repositories.
+
+        Raises:
+            json.JSONDecodeError:
+                The configuration is not valid JSON.
+
+            marshmallow.exceptions.ValidationError:
+                The configuration is invalid. The error messages have the same structure as
+                those of :py:meth:`ConfigSchema.load`.
+        """
+        reader = JsonStreamReader(self._fp)
+        seen_repositories = False
+
+        # Dependencies can only be validated once every repository has been read.
+        dependencies: Dict[str, List[str]] = {}
+
+        if reader.peek() not in {"{", ""}:
+            # Only objects can be streamed, so the schema reports the error for anything else.
+            ConfigSchema().load(reader.read_value())
+
+        for key in reader.iter_object():
+            if key == "directories":
+                try:
+                    self.directories = DirectoriesSchema().load(reader.read_value())
+                except ValidationError as e:
+                    raise ValidationError({"directories": e.messages})
+            elif key == "mirrors":
+                try:
+                    self.mirrors = MirrorsSchema().load(reader.read_value())
+                except ValidationError as e:
+                    raise ValidationError({"mirrors": e.messages})
+            elif key == "hosts":
+                try:
+                    self.hosts = ConfigSchema().fields["hosts"].deserialize(reader.read_value())
+                except ValidationError as e:
+                    raise ValidationError({"hosts": e.messages})
+            elif key == "repositories":
+                seen_repositories = True
+
+                if reader.peek() != "{":
+                    try:
+                        ConfigSchema().fields["repositories"].deserialize(reader.read_value())
+                    except ValidationError as e:
+                        raise ValidationError({"repositories": e.messages})
+
+                for name in reader.iter_object():
+                    try:
+                        repository = RepositorySchema().load(reader.read_value())
+                    except ValidationError as e:
+                        raise ValidationError({"repositories": {name: {"value": e.messages}}})
+
+                    dependencies[name] = repository.get("depends_on", [])
+                    yield name, repository
+            else:
+                raise ValidationError({key: ["Unknown field."]})
+
+        reader.end()
+
+        messages = {}
+
+        if self.directories is None:
+            messages["directories"] = ["Missing data for required field."]
+
+        if not seen_repositories:
+            messages["repositories"] = ["Missing data for required field."]
+
+        if messages:
+            raise ValidationError(messages)
+
+        try:
+            _validate_dependencies(dependencies)
+        except ValidationError as e:
+            raise ValidationError({"repositories": e.messages})
+
+
+class ValidationReport(NamedTuple):
+    """The result of validating many repositories."""
+
+    #: A mapping of repository names to their validated configuration.
+    #:
+    #: Repositories that failed validation are not present.
+    repositories: Dict[str, Any]
+
+    #: A mapping of repository names to their validation error messages.
+    errors: Dict[str, Any]
+
+
+def _validate_repositories_chunk(chunk: List[Tuple[str, Any]]) -> ValidationReport:
+    """Validate a chunk of repositories.
+
+    This is run in the worker processes of :py:func:`validate_repositories`.
+    """
+    schema = RepositorySchema()
+    report = ValidationReport({}, {})
+
+    for name, raw_repository in chunk:
+        try:
+            report.repositories[name] = schema.load(raw_repository)
+        except ValidationError as e:
+            report.errors[name] = e.messages
+
+    return report
+
+
+def _merge_validation_reports(reports: Iterator[ValidationReport]) -> ValidationReport:
+    """Merge the reports of each chunk into a single report."""
+    merged = ValidationReport({}, {})
+
+    for report in reports:
+        merged.repositories.update(report.repositories)
+        merged.errors.update(report.errors)
+
+    return merged
+
+
+def validate_repositories(
+    repositories: Mapping[str, Any],
+    *,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_VALIDATION_CHUNK_SIZE,
+) -> ValidationReport:
+    """Validate many repositories across a pool of processes.
+
+    The repositories are split into chunks, each of which is validated with
+    :py:class:`RepositorySchema` in a worker process. Every error is collected, rather than
+    stopping at the first invalid repository.
+
+    Args:
+        repositories:
+            A mapping of repository names to raw repository configurations.
+
+        max_workers:
+            The maximum number of worker processes. Defaults to the number of CPUs.
+
+            If this is ``1`` or there is only a single chunk, validation happens in the current
+            process.
+
+        chunk_size:
+            The number of repositories validated by each task.
+
+    Returns:
+        The validated repositories and the errors, keyed by repository name.
+
+    Raises:
+        ValueError:
+            ``chunk_size`` is not a positive number.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive; got {chunk_size}")
+
+    items = iter(repositories.items())
+    chunks = iter(lambda: list(islice(items, chunk_size)), [])
+
+    if max_workers == 1 or len(repositories) <= chunk_size:
+        reports = map(_validate_repositories_chunk, chunks)
+        return _merge_validation_reports(reports)
+
+    # This is only imported when needed, since it takes as long to import as the rest of Projector.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return _merge_validation_reports(executor.map(_validate_repositories_chunk, chunks))
+
+
+def _config_cache_key(data: bytes) -> str:
+    """Return the cache key for a raw configuration.
+
+    The key covers the raw configuration and the versions of Projector and every registered SCM
+    tool, since any of them can change the result of validation. SCM tools registered without a
+    version (i.e., when :py:func:`~projector.scm_tools.get_scm_tools` returns a plain mapping) are
+    identified by where they are defined instead.
+    """
+    scm_tools = get_scm_tools()
+    h = hashlib.sha256()
+
+    h.update(f"cache={CONFIG_CACHE_VERSION}\0projector={__version__}\0".encode())
+
+    # Looking up the version in the registry avoids importing every SCM tool.
+    spec = getattr(scm_tools, "spec", None)
+
+    for name in sorted(scm_tools):
+        if spec is not None:
+            version = spec(name).version
+        else:
+            scm_tool = scm_tools[name]
+            version = f"{scm_tool.__module__}.{scm_tool.__qualname__}"
+
+        h.update(f"{name}={version}\0".encode())
+
+    h.update(data)
+
+    return h.hexdigest()
+
+
+def _prune_config_cache(cache_dir: Path) -> None:
+    """Remove all but the most recently used cached configurations."""
+    try:
+        entries = sorted(cache_dir.glob("*.pickle"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+        for entry in entries[MAX_CACHED_CONFIGS:]:
+            entry.unlink()
+    except OSError:
+        pass
+
+
+def load_config(path: Path, *, use_cache: bool = True) -> Dict[str, Any]:
+    """Load and validate a JSON configuration file.
+
+    The validated configuration is cached in the :py:func:`cache directory
+    <projector.cache.get_cache_dir>`, keyed by a hash of the file contents and the versions of
+    Projector and the registered SCM tools. Loading an unchanged configuration only has to
+    read it back from the cache.
+
+    Args:
+        path:
+            The path to the configuration file.
+
+        use_cache:
+            Whether or not to use the cache.
+
+    Returns:
+        The validated configuration.
+
+    Raises:
+        ValueError:
+            The configuration is not valid JSON.
+
+        marshmallow.exceptions.ValidationError:
+            The configuration is invalid.
+    """
+    with span("load_config", "config", path=str(path)):
+        return _load_config(path, use_cache)
+
+
+def _load_config(path: Path, use_cache: bool) -> Dict[str, Any]:
+    """Load and validate a JSON configuration file.
+
+    This is the implementation of :py:func:`load_config`.
+    """
+    data = path.read_bytes()
+    cache_dir = get_cache_dir() if use_cache else None
+    cache_path: Optional[Path] = None
+
+    if cache_dir is not None:
+        cache_path = cache_dir / "configs" / f"{_config_cache_key(data)}.pickle"
+
+        try:
+            with cache_path.open("rb") as f:
+                config = pickle.load(f)
+        except Exception:
+            # A missing, truncated, or otherwise unloadable entry is just a miss.
+            pass
+        else:
+            try:
+                cache_path.touch()
+            except OSError:
+                pass
+
+            return config
+
+    config = ConfigSchema().load(json.loads(data.decode("utf-8")))
+
+    if cache_path is not None:
+        if write_atomic(cache_path, pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL)):
+            _prune_config_cache(cache_path.parent)
+
+    return config
@@ -0,0 +1,168 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Dependencies between repositories."""
+
+from typing import Dict, Iterable, List, Mapping
+
+
+class DependencyError(Exception):
+    """An error raised when a repository cannot be set up because its dependencies failed."""
+
+    def __init__(self, name: str, dependencies: Iterable[str]):
+        """Initialize the error.
+
+        Args:
+            name:
+                The name of the repository.
+
+            dependencies:
+                The names of the dependencies that failed.
+        """
+        #: The name of the repository.
+        self.name = name
+
+        #: The names of the dependencies that failed.
+        self.dependencies = list(dependencies)
+
+        names = ", ".join(f"`{dependency}'" for dependency in self.dependencies)
+        super().__init__(f"Dependencies of `{name}' failed: {names}")
+
+
+def get_dependencies(repositories: Mapping[str, Mapping]) -> Dict[str, List[str]]:
+    """Return the dependencies of each repository.
+
+    Args:
+        repositories:
+            A mapping of repository names to repositories, as loaded by
+            :py:class:`~projector.config.RepositorySchema`.
+
+    Returns:
+        A mapping of repository names to the names of the repositories they depend on.
+    """
+    return {name: repository.get("depends_on", []) for name, repository in repositories.items()}
+
+
+def dependency_errors(dependencies: Mapping[str, List[str]]) -> Dict[str, List[str]]:
+    """Find the unknown dependencies and dependency cycles of repositories.
+
+    Args:
+        dependencies:
+            A mapping of repository names to the names of the repositories they depend on.
+
+    Returns:
+        A mapping of repository names to error messages about their dependencies.
+
+        Each cycle is only reported for the first repository in it.
+    """
+    errors: Dict[str, List[str]] = {}
+
+    for name, names in dependencies.items():
+        for dependency in names:
+            if dependency not in dependencies:
+                errors.setdefault(name, []).append(f"Unknown repository: `{dependency}'")
+
+    visited = set()
+
+    for root in dependencies:
+        if root in visited:
+            continue
+
+        # Depth-first search, where the path holds each repository being visited and an iterator
+        # over its remaining dependencies.
+        path = [(root, iter(dependencies[root]))]
+        on_path = {root: 0}
+        visited.add(root)
+
+        while path:
+            name, remaining = path[-1]
+            dependency = next(remaining, None)
+
+            if dependency is None:
+                path.pop()
+                del on_path[name]
+            elif dependency in on_path:
+                start = on_path[dependency]
+                cycle = [entry[0] for entry in path[start:]]
+                cycle.append(dependency)
+
+                errors.setdefault(dependency, []).append(f"Dependency cycle: {' -> '.join(cycle)}")
+            elif dependency in dependencies and dependency not in visited:
+                on_path[dependency] = len(path)
+                path.append((dependency, iter(dependencies[dependency])))
+                visited.add(dependency)
+
+    return errors
+
+
+def critical_path_lengths(dependencies: Mapping[str, List[str]]) -> Dict[str, int]:
+    """Return the length of the longest chain of dependents of each repository.
+
+    Setting up the repositories with the longest chains first shortens the critical path of
+    setting up all of them.
+
+    Args:
+        dependencies:
+            A mapping of repository names to the names of the repositories they depend on.
+
+    Returns:
+        A mapping of repository names to the number of repositories in the longest chain of
+        repositories that depend on them, including themselves.
+
+    Raises:
+        DependencyError:
+            The dependencies contain a cycle, so no repository in it can be set up first.
+    """
+    dependents: Dict[str, List[str]] = {name: [] for name in dependencies}
+
+    for name, names in dependencies.items():
+        for dependency in names:
+            if dependency in dependents:
+                dependents[dependency].append(name)
+
+    lengths: Dict[str, int] = {}
+
+    # The repositories whose dependents are being visited. Reaching one of them again means that
+    # it depends on itself.
+    visiting = set()
+
+    for root in dependencies:
+        # Depth-first search over dependents, computing each length after those of its dependents.
+        stack = [root]
+
+        while stack:
+            name = stack[-1]
+
+            if name in lengths:
+                stack.pop()
+                continue
+
+            pending = [dependent for dependent in dependents[name] if dependent not in lengths]
+            cycle = [dependent for dependent in pending if dependent in visiting]
+
+            if cycle:
+                raise DependencyError(cycle[0], [name])
+
+            if pending:
+                visiting.add(name)
+                stack.extend(pending)
+            else:
+                lengths[name] = 1 + max((lengths[d] for d in dependents[name]), default=0)
+                visiting.discard(name)
+                stack.pop()
+
+    return lengths
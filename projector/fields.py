@@ -17,8 +17,9 @@
 
 """Custom marshmallow fields for Projector."""
 
+import re
 from pathlib import Path
-from typing import Dict, Type
+from typing import Dict, Optional, Type, Union
 
 from marshmallow import ValidationError, fields
 
@@ -40,36 +41,100 @@ class EitherField(fields.Field):
                 that match will be used. Otherwise, each entry will be checked *in order* for
                 whether it is a :py:func:`isinstance` match. That means that if a value is a
                 subclass of multiple types in ``fields``, the first one that it matches will be
-                used.
+                used. The match for each type is only resolved once.
         """
         super().__init__(**kwargs)
 
         self._fields = fields
 
+        #: A cache of value types to the field that (de)serializes them.
+        #:
+        #: This is seeded with the exact matches and filled in as other types are encountered.
+        #: Types that match no field are cached as ``None``.
+        self._dispatch: Dict[Type, Optional[fields.Field]] = dict(fields)
+
+        self._type_names = ", ".join(t.__name__ for t in fields.keys())
+
     def _deserialize(self, value, attr, obj):
         return self._serde("_deserialize", value, attr, obj)
 
     def _serialize(self, value, attr, obj):
         return self._serde("_serialize", value, attr, obj)
 
+    def _field_for_type(self, value_type: Type) -> Optional[fields.Field]:
+        """Return the field that (de)serializes values of the given type.
+
+        The result is cached, so that each type only has to be resolved once.
+        """
+        try:
+            return self._dispatch[value_type]
+        except KeyError:
+            pass
+
+        for field_type, field in self._fields.items():
+            if issubclass(value_type, field_type):
+                break
+        else:
+            field = None
+
+        self._dispatch[value_type] = field
+
+        return field
+
     def _serde(self, serde_method_name: str, value, attr, obj):
         """Do the actual (de)serialization.
 
         The implementation of serialization and deserialization is identical up to the method
         called on the matching field.
         """
-        field = self._fields.get(type(value))
-        if field is not None:
-            return getattr(field, serde_method_name)(value, attr, obj)
+        field = self._field_for_type(type(value))
 
-        for field_type, field in self._fields.items():
-            if isinstance(value, field_type):
-                return getattr(field, serde_method_name)(value, attr, obj)
+        if field is None:
+            raise ValidationError(
+                f"Expected type of value to be one of {self._type_names}; "
+                f"got {type(value).__name__} instead."
+            )
+
+        return getattr(field, serde_method_name)(value, attr, obj)
+
+
+_SIZE_RE = re.compile(r"^\s*(?P<number>\d+(?:\.\d+)?)\s*(?P<unit>[KMGT]?)i?B?\s*$", re.I)
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+class SizeField(fields.Field):
+    """A field that deserializes a size in bytes.
+
+    Sizes are either integers or strings with an optional binary unit suffix, such as ``"512M"``
+    or ``"20 GiB"``. Sizes are serialized as integers.
+    """
+
+    default_error_messages = {"invalid": "Not a valid size."}
+
+    def _deserialize(self, value: Union[int, str], attr, obj) -> int:
+        if isinstance(value, bool):
+            self.fail("invalid")
+
+        if isinstance(value, int):
+            size = value
+        elif isinstance(value, str):
+            match = _SIZE_RE.match(value)
+
+            if match is None:
+                self.fail("invalid")
+
+            size = int(float(match.group("number")) * _SIZE_UNITS[match.group("unit").upper()])
+        else:
+            self.fail("invalid")
+
+        if size < 0:
+            self.fail("invalid")
+
+        return size
 
-        types = ", ".join(t.__name__ for t in self._fields.keys())
-        raise ValidationError(
-            f"Expected type of value to be one of {types}; got {type(value).__name__} instead."
-        )
+    def _serialize(self, value: int, attr, obj) -> int:
+        return value
 
 
 class PathField(fields.String):
@@ -0,0 +1,199 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Incremental reading of large JSON documents."""
+
+import json
+from typing import Any, Iterator, Optional, TextIO
+
+
+#: The number of characters read from the underlying file at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+# Characters that may continue a number. No complete JSON value is ever followed by one of these.
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+class JsonStreamReader:
+    """A reader that parses a JSON document piece by piece.
+
+    Objects can be iterated over key by key with :py:meth:`iter_object`, with the value for each
+    key read with either :py:meth:`read_value` or a nested :py:meth:`iter_object`. Only the
+    value currently being read is held in memory.
+    """
+
+    def __init__(self, fp: TextIO, *, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Initialize the reader.
+
+        Args:
+            fp:
+                The file to read from.
+
+            chunk_size:
+                The number of characters to read from ``fp`` at a time.
+        """
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        """Read more data into the buffer.
+
+        Args:
+            size:
+                The number of characters to read. Defaults to the chunk size.
+
+        Returns:
+            Whether or not any data was read.
+        """
+        if self._eof:
+            return False
+
+        chunk = self._fp.read(size or self._chunk_size)
+
+        if not chunk:
+            self._eof = True
+            return False
+
+        # Discard everything that has already been consumed.
+        consumed = self._pos
+        self._buf = self._buf[consumed:] + chunk
+        self._pos = 0
+
+        return True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buf, self._pos)
+
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it.
+
+        Returns:
+            The next character, or the empty string at the end of the document.
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+
+            if not self._fill():
+                return ""
+
+    def peek(self) -> str:
+        """Return the first character of the next JSON value without consuming it.
+
+        This can be used to find out what type of value is next, e.g., whether
+        :py:meth:`iter_object` can be used to read it.
+
+        Returns:
+            The first character of the value, or the empty string at the end of the document.
+        """
+        return self._peek()
+
+    def _expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, which must be one of ``chars``."""
+        c = self._peek()
+
+        if not c or c not in chars:
+            expected = " or ".join(f"'{c}'" for c in chars)
+            raise self._error(f"Expecting {expected}")
+
+        self._pos += 1
+        return c
+
+    def read_value(self) -> Any:
+        """Read the next complete JSON value.
+
+        Returns:
+            The decoded value.
+
+        Raises:
+            json.JSONDecodeError:
+                The document is not valid JSON.
+        """
+        self._peek()
+
+        while True:
+            # Every attempt decodes the value from its start, so the unconsumed part of the buffer
+            # is doubled before each retry. This keeps reading a value that spans many chunks
+            # linear in its size.
+            grow_by = max(self._chunk_size, len(self._buf) - self._pos)
+
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill(grow_by):
+                    continue
+
+                raise
+
+            # A number at the end of the buffer may have been truncated (e.g., ``12`` of ``123`` or
+            # ``1`` of ``1.5``), so a value is only known to be complete once we have seen what
+            # follows it. If there is more data, the value is decoded again from the refilled
+            # buffer.
+            complete = end < len(self._buf) and self._buf[end] not in _NUMBER_CHARS
+
+            if complete or not self._fill(grow_by):
+                self._pos = end
+                return value
+
+    def end(self) -> None:
+        """Ensure that nothing but whitespace remains in the document.
+
+        Raises:
+            json.JSONDecodeError:
+                There is trailing data.
+        """
+        if self._peek():
+            raise self._error("Extra data")
+
+    def iter_object(self) -> Iterator[str]:
+        """Iterate over the keys of the next JSON object.
+
+        After each key is yielded, its value must be consumed before iteration continues.
+
+        Yields:
+            The keys of the object.
+
+        Raises:
+            json.JSONDecodeError:
+                The document is not valid JSON.
+        """
+        self._expect("{")
+
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            if self._peek() != '"':
+                raise self._error("Expecting property name enclosed in double quotes")
+
+            key = self.read_value()
+            self._expect(":")
+
+            yield key
+
+            if self._expect(",}") == "}":
+                return
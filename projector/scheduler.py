@@ -0,0 +1,285 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scheduling of SCM operations across hosts."""
+
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+
+#: The default maximum number of operations that talk to remote hosts at once.
+DEFAULT_JOBS = 8
+
+#: The default maximum number of operations that talk to a single host at once.
+DEFAULT_HOST_JOBS = 4
+
+#: The priority of repositories marked as critical.
+PRIORITY_CRITICAL = 0
+
+#: The priority of repositories with a working branch checked out.
+PRIORITY_WORKING = 1
+
+#: The priority of every other repository.
+PRIORITY_NORMAL = 2
+
+
+class HostLimit(NamedTuple):
+    """The limits for operations talking to a single host."""
+
+    #: The maximum number of operations that talk to the host at once.
+    jobs: int = DEFAULT_HOST_JOBS
+
+    #: The maximum number of operations started per second.
+    #:
+    #: If this is ``None``, operations are started as soon as there is capacity.
+    rate: Optional[float] = None
+
+
+def repository_priority(repository: Dict[str, Any]) -> int:
+    """Return the scheduling priority of a repository.
+
+    Critical repositories come first, then those with a working branch (i.e., that are not
+    detached), then everything else.
+
+    Args:
+        repository:
+            The repository, as loaded by :py:class:`~projector.config.RepositorySchema`.
+
+    Returns:
+        The priority. Lower priorities are scheduled first.
+    """
+    if repository.get("critical"):
+        return PRIORITY_CRITICAL
+
+    if repository["config"].get("detach") is False:
+        return PRIORITY_WORKING
+
+    return PRIORITY_NORMAL
+
+
+class _Ticket(NamedTuple):
+    """A pending operation."""
+
+    priority: int
+    sequence: int
+    future: asyncio.Future
+
+
+class Scheduler:
+    """A scheduler of operations that respects global and per-host limits.
+
+    Each operation declares the hosts it talks to. Operations that talk to no hosts only use
+    local resources and are limited by the number of CPUs, while all other operations are limited
+    by the number of jobs and the limits of each of their hosts. Operations with unknown hosts
+    count against the jobs, but no host.
+
+    Whenever there is capacity, the pending operation with the lowest priority that can start is
+    started, so operations waiting on a busy or rate-limited host never hold up others.
+    """
+
+    def __init__(
+        self,
+        *,
+        jobs: int = DEFAULT_JOBS,
+        local_jobs: Optional[int] = None,
+        host_limits: Optional[Dict[str, HostLimit]] = None,
+        default_host_limit: HostLimit = HostLimit(),
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            jobs:
+                The maximum number of operations that talk to remote hosts at once.
+
+            local_jobs:
+                The maximum number of operations that only use local resources at once. Defaults
+                to the number of CPUs.
+
+            host_limits:
+                Limits for specific hosts, keyed by lower-cased host name.
+
+            default_host_limit:
+                The limits for every other host.
+
+        Raises:
+            ValueError:
+                A limit is not a positive number.
+        """
+        if local_jobs is None:
+            local_jobs = os.cpu_count() or 1
+
+        self._host_limits = {host.lower(): limit for host, limit in (host_limits or {}).items()}
+        self._default_host_limit = default_host_limit
+
+        for limit in (jobs, local_jobs):
+            if limit < 1:
+                raise ValueError(f"jobs must be positive; got {limit}")
+
+        for host_limit in (default_host_limit, *self._host_limits.values()):
+            if host_limit.jobs < 1 or (host_limit.rate is not None and host_limit.rate <= 0):
+                raise ValueError(f"host limits must be positive; got {host_limit}")
+
+        # Pending operations are queued by the hosts they talk to, so that finding the best
+        # operation that can start only has to look at the head of each queue.
+        self._queues: Dict[Optional[FrozenSet[str]], List[_Ticket]] = {}
+        self._sequence = itertools.count()
+
+        self._capacity = {True: jobs, False: local_jobs}
+        self._running = {True: 0, False: 0}
+        self._host_running: Dict[str, int] = {}
+        self._host_next_start: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def host_limit(self, host: str) -> HostLimit:
+        """Return the limits for a host.
+
+        Args:
+            host:
+                The host name.
+
+        Returns:
+            The limits.
+        """
+        return self._host_limits.get(host.lower(), self._default_host_limit)
+
+    @asynccontextmanager
+    async def slot(
+        self, *, hosts: Optional[Iterable[str]] = None, priority: int = PRIORITY_NORMAL
+    ) -> AsyncIterator[None]:
+        """Wait for the capacity to run an operation.
+
+        Args:
+            hosts:
+                The hosts the operation talks to. If this is ``None``, the hosts are unknown.
+
+            priority:
+                The priority of the operation. Lower priorities are scheduled first.
+        """
+        key = frozenset(host.lower() for host in hosts) if hosts is not None else None
+        ticket = _Ticket(
+            priority, next(self._sequence), asyncio.get_running_loop().create_future()
+        )
+
+        heapq.heappush(self._queues.setdefault(key, []), ticket)
+        self._dispatch()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if not ticket.future.cancelled():
+                # The slot was granted just before cancellation.
+                self._release(key)
+
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(key)
+
+    def _remote(self, key: Optional[FrozenSet[str]]) -> bool:
+        """Return whether or not operations with the given hosts talk to remote hosts."""
+        return key is None or bool(key)
+
+    def _release(self, key: Optional[FrozenSet[str]]) -> None:
+        """Release the capacity held by an operation."""
+        self._running[self._remote(key)] -= 1
+
+        for host in key or ():
+            self._host_running[host] -= 1
+
+        self._dispatch()
+
+    def _start_time(self, key: Optional[FrozenSet[str]], now: float) -> Optional[float]:
+        """Return when an operation with the given hosts may start.
+
+        Returns:
+            The loop time the operation may start at, or ``None`` if it must wait for another
+            operation to finish.
+        """
+        if self._running[self._remote(key)] >= self._capacity[self._remote(key)]:
+            return None
+
+        start = now
+
+        for host in key or ():
+            limit = self.host_limit(host)
+
+            if self._host_running.get(host, 0) >= limit.jobs:
+                return None
+
+            start = max(start, self._host_next_start.get(host, now))
+
+        return start
+
+    def _dispatch(self) -> None:
+        """Start every pending operation that can start."""
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        wakeup_at = None
+
+        while True:
+            best = None
+
+            for key, queue in self._queues.items():
+                while queue and queue[0].future.cancelled():
+                    heapq.heappop(queue)
+
+                if not queue or (best is not None and queue[0] >= best[1][0]):
+                    continue
+
+                start = self._start_time(key, now)
+
+                if start is None:
+                    continue
+
+                if start > now:
+                    wakeup_at = start if wakeup_at is None else min(wakeup_at, start)
+                    continue
+
+                best = (key, queue)
+
+            if best is None:
+                break
+
+            key, queue = best
+            ticket = heapq.heappop(queue)
+
+            self._running[self._remote(key)] += 1
+
+            for host in key or ():
+                self._host_running[host] = self._host_running.get(host, 0) + 1
+                rate = self.host_limit(host).rate
+
+                if rate is not None:
+                    self._host_next_start[host] = now + 1 / rate
+
+            ticket.future.set_result(None)
+
+        for key in [key for key, queue in self._queues.items() if not queue]:
+            del self._queues[key]
+
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        if wakeup_at is not None:
+            self._wakeup = loop.call_at(wakeup_at, self._dispatch)
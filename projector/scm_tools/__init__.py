@@ -18,10 +18,12 @@
 """SCM tool utilities."""
 
 from functools import lru_cache
-from pkg_resources import iter_entry_points
-from typing import Dict
+from typing import Mapping, Type
 
+from projector.cache import get_cache_dir
 from projector.scm_tools.base import ScmTool
+from projector.scm_tools.registry import ScmToolRegistry
+from projector.trace import span
 
 
 # This really only exists so we can spy on it with kgb.
@@ -29,21 +31,25 @@ from projector.scm_tools.base import ScmTool
 # We cannot spy on `get_scm_tools` becuase some Python dsitributions have a native module for the
 # wrapper that lru_cache uses to wrap functions. This wrapper is not a proper function, but a C
 # object.
-def _get_scm_tools_uncached() -> Dict[str, ScmTool]:
-    return {
-        tool.name: tool
-        for tool in (
-            entry_point.load() for entry_point in iter_entry_points("projector.scm_tools")
-        )
-    }
+def _get_scm_tools_uncached() -> Mapping[str, Type[ScmTool]]:
+    cache_dir = get_cache_dir()
+    index_path = cache_dir / "entry_points.json" if cache_dir is not None else None
+
+    with span("discover_scm_tools", "scm_tools"):
+        return ScmToolRegistry.discover(index_path)
 
 
 @lru_cache(None)
-def get_scm_tools() -> Dict[str, ScmTool]:
+def get_scm_tools() -> Mapping[str, Type[ScmTool]]:
     """Return registered SCM Tools.
 
-    Supported SCM tools are registered with the ``projector.scm_tools`` entry point. The results
-    will be cached for future use.
+    Supported SCM tools are registered with the ``projector.scm_tools`` entry point, under the
+    same name as their :py:attr:`~projector.scm_tools.base.ScmTool.name`. The results will be
+    cached for future use.
+
+    Discovered entry points are recorded in an index in the :py:func:`cache directory
+    <projector.cache.get_cache_dir>` so that later invocations do not have to scan every
+    installed distribution. Each SCM tool is only imported when it is first looked up.
 
     Returns:
         The registered SCM tools.
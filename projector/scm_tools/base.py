@@ -17,9 +17,42 @@
 
 """Base classes for SCM tools."""
 
-from typing import Type
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, NamedTuple, Optional, Set, Tuple, Type
 
-from marshmallow import Schema
+if TYPE_CHECKING:  # Avoid importing marshmallow just to discover SCM tools.
+    from marshmallow import Schema
+
+    from projector.state import RepositoryState
+    from projector.status import RepositoryStatus
+    from projector.sync import SyncContext
+
+
+class Operation(Enum):
+    """An operation an SCM tool performs on a repository."""
+
+    CLONE = "clone"
+    FETCH = "fetch"
+    CHECKOUT = "checkout"
+
+
+class OperationResult(NamedTuple):
+    """The result of an operation on a repository."""
+
+    #: The operation that was performed.
+    operation: Operation
+
+    #: The path to the repository.
+    path: Path
+
+    #: Whether or not the operation changed the repository's refs or what is checked out.
+    changed: bool
+
+    #: The commit ID checked out after the operation.
+    #:
+    #: This is ``None`` if the operation does not determine it.
+    head: Optional[str] = None
 
 
 class ScmTool:
@@ -27,7 +60,284 @@ class ScmTool:
 
     Subclasses of this class represent a specific SCM tool, such as :py:class:`git
     <projector.scm_tools.Git>`.
+
+    Every operation is a coroutine, so that operations on many repositories can run concurrently
+    in a single event loop. Operations that take a long time must not block the event loop, e.g.,
+    they should run subprocesses with :py:func:`asyncio.create_subprocess_exec`.
     """
 
     name: str = None
-    schema: Type[Schema] = None
+    schema: Type["Schema"] = None
+
+    @classmethod
+    def load_config(cls, data: Any) -> Dict[str, Any]:
+        """Load and validate the configuration of a repository.
+
+        Tools may override this with a faster equivalent of loading with :py:attr:`schema`.
+
+        Args:
+            data:
+                The raw configuration.
+
+        Returns:
+            The validated configuration.
+
+        Raises:
+            marshmallow.exceptions.ValidationError:
+                The configuration is invalid.
+        """
+        return cls.schema().load(data)
+
+    @classmethod
+    async def prepare(
+        cls, context: "SyncContext", repositories: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Prepare to synchronize repositories.
+
+        This is called once per run, before any of the repositories using this tool are
+        synchronized. Raising an exception fails all of them.
+
+        Args:
+            context:
+                The context of the run.
+
+            repositories:
+                A mapping of repository names to their configuration, as loaded by
+                :py:attr:`schema`, for every repository using this tool.
+        """
+
+    @classmethod
+    async def finish(cls, context: "SyncContext") -> None:
+        """Clean up after synchronizing repositories.
+
+        This is called once per run for every tool that was :py:meth:`prepared <prepare>`, after
+        all of its repositories have been synchronized, even if preparing failed. It should not
+        raise.
+
+        Args:
+            context:
+                The context of the run.
+        """
+
+    @classmethod
+    async def sync(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> OperationResult:
+        """Synchronize a repository with its remotes.
+
+        If the repository does not exist at ``path``, it will be :py:meth:`cloned <clone>`.
+        Otherwise, its remotes will be :py:meth:`fetched <fetch>`.
+
+        Args:
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            context:
+                The context of the run.
+
+        Returns:
+            The result of the operation that was performed.
+        """
+        if path.exists():
+            return await cls.fetch(path, config, context)
+
+        return await cls.clone(path, config, context)
+
+    @classmethod
+    def hosts(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> Optional[Set[str]]:
+        """Return the hosts that synchronizing a repository will talk to.
+
+        This is called after :py:meth:`prepare`, and is used to schedule the synchronization
+        within the limits of each host.
+
+        Args:
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            context:
+                The context of the run.
+
+        Returns:
+            The lower-cased host names, which are empty if the repository is synchronized from
+            local copies only, or ``None`` if they are unknown.
+        """
+        return None
+
+    @classmethod
+    async def clone(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> OperationResult:
+        """Clone a repository and check out the configured ref.
+
+        Args:
+            path:
+                The path to clone the repository to. This does not exist.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            context:
+                The context of the run.
+
+        Returns:
+            The result of the clone.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def fetch(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> OperationResult:
+        """Fetch the remotes of an existing repository.
+
+        Args:
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            context:
+                The context of the run.
+
+        Returns:
+            The result of the fetch.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def checkout(
+        cls, path: Path, config: Dict[str, Any], ref: Optional[str] = None
+    ) -> OperationResult:
+        """Check out a ref in an existing repository.
+
+        Args:
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            ref:
+                The ref to check out. Defaults to the configured ref.
+
+        Returns:
+            The result of the checkout.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def export_bundle(cls, path: Path, config: Dict[str, Any], out: BinaryIO) -> None:
+        """Write a bundle of every ref and object of a repository.
+
+        The bundle is written as it is generated, without being staged on disk.
+
+        Args:
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            out:
+                The file to write the bundle to.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def clone_bundle(
+        cls, path: Path, config: Dict[str, Any], bundle: Path
+    ) -> OperationResult:
+        """Clone a repository from a bundle written by :py:meth:`export_bundle`.
+
+        The remotes are configured as if the repository had been :py:meth:`cloned <clone>`, but
+        nothing is fetched from them. If cloning fails, nothing must be left at ``path``.
+
+        Args:
+            path:
+                The path to clone the repository to. This does not exist.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            bundle:
+                The path to the bundle.
+
+        Returns:
+            The result of the clone.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def status(
+        cls,
+        name: str,
+        path: Path,
+        config: Dict[str, Any],
+        recorded: Optional["RepositoryState"] = None,
+    ) -> "RepositoryStatus":
+        """Determine the status of a repository that exists on disk.
+
+        Args:
+            name:
+                The name of the repository.
+
+            path:
+                The path to the repository.
+
+            config:
+                The repository configuration, as loaded by :py:attr:`schema`.
+
+            recorded:
+                The previously recorded state of the repository, if it is still valid.
+
+                Anything that only depends on the repository's refs may be taken from this
+                instead of being queried again.
+
+        Returns:
+            The status of the repository.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def fingerprint(cls, path: Path) -> Optional[str]:
+        """Return a fingerprint of the refs of a repository.
+
+        The fingerprint must change whenever the repository's refs (including what is checked
+        out) change. It is used to decide whether state recorded in the
+        :py:class:`~projector.state.StateIndex` is still valid.
+
+        Args:
+            path:
+                The path to the repository.
+
+        Returns:
+            The fingerprint, or ``None`` if it cannot be determined. Recorded state is never
+            reused for a repository without a fingerprint.
+        """
+        return None
+
+    @classmethod
+    def watch_directories(cls, path: Path) -> List[Tuple[Path, bool]]:
+        """Return the directories to watch for changes to the status of a repository.
+
+        This is used by the :py:class:`~projector.watch.RepositoryWatcher`. Changes to files in
+        these directories cause the repository's status to be refreshed.
+
+        Args:
+            path:
+                The path to the repository.
+
+        Returns:
+            Pairs of directories and whether or not their subdirectories should be watched too.
+            Repositories using tools that return no directories are never refreshed by a watcher.
+        """
+        return []
@@ -17,15 +17,156 @@
 
 """Support for the Git SCM tool."""
 
-from dataclasses import dataclass
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Any, Dict, Union
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    BinaryIO,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from marshmallow import Schema, ValidationError, fields, post_load, pre_dump, validate
 from more_itertools import ilen
 
 from projector.fields import EitherField
-from projector.scm_tools.base import ScmTool
+from projector.scm_tools.base import Operation, OperationResult, ScmTool
+from projector.trace import span
+from projector.urls import normalize_url, url_host
+
+if TYPE_CHECKING:
+    from projector.scm_tools.git_fetch import FetchPlan
+    from projector.state import RepositoryState
+    from projector.status import RepositoryStatus
+    from projector.sync import SyncContext
+
+
+class GitError(Exception):
+    """An error that occurred while running Git."""
+
+    def __init__(self, command: tuple, returncode: int, stderr: str):
+        """Initialize the error.
+
+        Args:
+            command:
+                The arguments passed to Git.
+
+            returncode:
+                The exit status of Git.
+
+            stderr:
+                The standard error output of Git.
+        """
+        super().__init__(f"`git {' '.join(command)}' exited with status {returncode}: {stderr}")
+
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+#: The size of the chunks that :py:func:`stream_git` copies output in.
+STREAM_CHUNK_SIZE = 1 << 20
+
+
+async def run_git(
+    *args: str, cwd: Optional[Path] = None, env: Optional[Dict[str, str]] = None
+) -> str:
+    """Run Git as a subprocess.
+
+    Args:
+        *args:
+            The arguments to pass to Git.
+
+        cwd:
+            The directory to run Git in.
+
+        env:
+            Environment variables to set for Git, in addition to those of this process.
+
+    Returns:
+        The standard output of Git.
+
+    Raises:
+        GitError:
+            Git exited with a non-zero status.
+    """
+    command = next(arg for arg in args if not arg.startswith("-"))
+
+    with span(f"git {command}", "git", args=list(args), cwd=str(cwd)):
+        proc = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=cwd,
+            env={**os.environ, **env} if env else None,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+
+    if proc.returncode != 0:
+        raise GitError(args, proc.returncode, stderr.decode().strip())
+
+    return stdout.decode()
+
+
+async def stream_git(*args: str, out: BinaryIO, cwd: Optional[Path] = None) -> None:
+    """Run Git as a subprocess, writing its standard output to a file as it is produced.
+
+    Args:
+        *args:
+            The arguments to pass to Git.
+
+        out:
+            The file to write the standard output of Git to.
+
+        cwd:
+            The directory to run Git in.
+
+    Raises:
+        GitError:
+            Git exited with a non-zero status.
+    """
+    command = next(arg for arg in args if not arg.startswith("-"))
+
+    with span(f"git {command}", "git", args=list(args), cwd=str(cwd)):
+        proc = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        async def copy_stdout() -> None:
+            while True:
+                chunk = await proc.stdout.read(STREAM_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                out.write(chunk)
+
+        # Standard error is read concurrently, so that Git never blocks on a full pipe.
+        _, stderr = await asyncio.gather(copy_stdout(), proc.stderr.read())
+        await proc.wait()
+
+    if proc.returncode != 0:
+        raise GitError(args, proc.returncode, stderr.decode().strip())
 
 
 class RemoteKind(Enum):
@@ -38,28 +179,48 @@ class RemoteKind(Enum):
     EXPLICIT = "explicit"
 
 
-@dataclass
 class Remote:
     """A Git remote.
 
+    Remotes are stored in a normalized form regardless of their kind, so that large numbers of
+    them are cheap to hold in memory. The raw form of the remote is reconstructed by
+    :py:attr:`inner`.
+
     See Also:
         :py:class:`RemoteKind`:
             A description of the kinds of remotes.
     """
 
+    __slots__ = ("kind", "url", "default")
+
     #: The kind of remote this is.
     kind: RemoteKind
 
-    #: The contents of this remote.
-    inner: Union[str, Dict[str, Any]]
+    #: The URL of the remote.
+    url: str
 
     #: Whether or not the remote is the default.
     #:
-    #: This is only used by :py:attr:`implicit <RemoteKind.IMPLICIT>` remotes, since they
-    #: otherwise would not have a location to store their status as a default.
-    #:
-    #: This value is not serialized.
-    _default: bool = False
+    #: For :py:attr:`implicit <RemoteKind.IMPLICIT>` remotes, this value is not serialized,
+    #: since they have no location to store their status as a default.
+    default: bool
+
+    def __init__(self, kind: RemoteKind, url: str, default: bool = False):
+        """Initialize the remote.
+
+        Args:
+            kind:
+                The kind of remote this is.
+
+            url:
+                The URL of the remote.
+
+            default:
+                Whether or not the remote is the default.
+        """
+        self.kind = kind
+        self.url = url
+        self.default = default
 
     @classmethod
     def from_raw(cls, value: Union[str, Dict[str, Any]]) -> "Remote":
@@ -69,37 +230,27 @@ class Remote:
             Remote:
             The created remote.
         """
-        kind = RemoteKind.IMPLICIT if isinstance(value, str) else RemoteKind.EXPLICIT
+        if isinstance(value, str):
+            return cls(RemoteKind.IMPLICIT, value)
 
-        return cls(kind=kind, inner=value)
+        return cls(RemoteKind.EXPLICIT, value["url"], value.get("default", False))
 
     @property
-    def url(self):
+    def inner(self) -> Union[str, Dict[str, Any]]:
+        """The raw representation of this remote."""
         if self.kind == RemoteKind.IMPLICIT:
-            return self.inner
-        elif self.kind == RemoteKind.EXPLICIT:
-            return self.inner["url"]
+            return self.url
 
-    @url.setter
-    def url(self, value: str):
-        if self.kind == RemoteKind.IMPLICIT:
-            self.inner = value
-        elif self.kind == RemoteKind.EXPLICIT:
-            self.inner["url"] = value
+        return {"url": self.url, "default": self.default}
 
-    @property
-    def default(self) -> bool:
-        if self.kind == RemoteKind.IMPLICIT:
-            return self._default
-        elif self.kind == RemoteKind.EXPLICIT:
-            return self.inner["default"]
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Remote):
+            return NotImplemented
 
-    @default.setter
-    def default(self, value: bool):
-        if self.kind == RemoteKind.IMPLICIT:
-            self._default = value
-        elif self.kind == RemoteKind.EXPLICIT:
-            self.inner["default"] = value
+        return (self.kind, self.url, self.default) == (other.kind, other.url, other.default)
+
+    def __repr__(self) -> str:
+        return f"Remote(kind={self.kind}, url={self.url!r}, default={self.default!r})"
 
 
 class GitRemoteSchema(Schema):
@@ -109,6 +260,37 @@ class GitRemoteSchema(Schema):
     default = fields.Boolean(missing=False)
 
 
+#: The partial clone filters that repositories may use.
+#:
+#: ``blob:none`` omits file contents and ``tree:0`` additionally omits directory listings. Omitted
+#: objects are downloaded on demand.
+CLONE_FILTERS = ("blob:none", "tree:0")
+
+#: The options that limit how much of a repository is cloned and fetched.
+#:
+#: These are only present in loaded data when they are configured.
+CLONE_OPTIONS = ("depth", "filter", "single_branch")
+
+#: A full or abbreviated commit ID.
+COMMIT_ID_RE = re.compile(r"[0-9a-fA-F]{7,64}")
+
+
+def is_commit_id(ref: str) -> bool:
+    """Return whether or not a ref looks like a commit ID.
+
+    Branches and tags may be named like commit IDs as well, so this does not guarantee that the
+    ref is a commit.
+
+    Args:
+        ref:
+            The ref.
+
+    Returns:
+        Whether or not the ref looks like a full or abbreviated commit ID.
+    """
+    return COMMIT_ID_RE.fullmatch(ref) is not None
+
+
 class GitRepositorySchema(Schema):
     """The schema for a Git repository."""
 
@@ -121,6 +303,17 @@ class GitRepositorySchema(Schema):
         validate=validate.Length(min=1, error="Repository has no remotes."),
     )
 
+    #: The number of commits of history to clone and fetch.
+    depth = fields.Integer(validate=validate.Range(min=1))
+
+    #: The partial clone filter to use for the default remote.
+    filter = fields.String(validate=validate.OneOf(CLONE_FILTERS))
+
+    #: Whether or not to only clone and fetch ``ref`` from the default remote.
+    #:
+    #: All branches of other remotes are still fetched.
+    single_branch = fields.Boolean()
+
     @post_load
     def _post_load(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Pre-process remotes into Remote objects."""
@@ -147,18 +340,24 @@ class GitRepositorySchema(Schema):
                 "A repository cannot have multiple default remotes.", field_names="remotes"
             )
 
-        return {"remotes": remotes, "ref": data["ref"], "detach": data["detach"]}
+        result = {"remotes": remotes, "ref": data["ref"], "detach": data["detach"]}
+        result.update((key, data[key]) for key in CLONE_OPTIONS if key in data)
+
+        return result
 
     @pre_dump
     def _pre_dump(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Unwrap remotes into their raw representation prior to serialization."""
-        return {
+        result = {
             "ref": data["ref"],
             "detach": data["detach"],
             "remotes": {
                 remote_name: remote.inner for remote_name, remote in data["remotes"].items()
             },
         }
+        result.update((key, data[key]) for key in CLONE_OPTIONS if key in data)
+
+        return result
 
 
 class Git(ScmTool):
@@ -166,3 +365,682 @@ class Git(ScmTool):
 
     name = "Git"
     schema = GitRepositorySchema
+
+    @classmethod
+    def load_config(cls, data: Any) -> Dict[str, Any]:
+        """Load and validate the configuration of a repository.
+
+        Plain configurations are validated without marshmallow. See
+        :py:mod:`projector.scm_tools.git_validate`.
+        """
+        from projector.scm_tools.git_validate import load_git_config
+
+        return load_git_config(data)
+
+    @classmethod
+    async def prepare(
+        cls, context: "SyncContext", repositories: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Prepare to synchronize repositories.
+
+        If any repository has a remote accessed over SSH, a pool of multiplexed SSH connections
+        is opened for the run, unless Git is configured to use ``$GIT_SSH``.
+
+        If the ``objects`` directory is configured, the shared object store of every upstream
+        that is used by more than one repository is brought up to date, so that those
+        repositories can borrow its objects instead of downloading their own copies.
+
+        If mirrors are configured, the mirror of every other remote URL is brought up to date.
+        Repositories are cloned and fetched from the mirrors instead of the network.
+
+        Every other URL that is shared by more than one remote is then fetched once, into the
+        first repository that already exists and uses it. Existing repositories fetch shared
+        remotes from these local copies (or the object stores) instead of the network.
+        """
+        from projector.scm_tools.git_fetch import (
+            FetchPlan,
+            FetchSource,
+            index_remote_urls,
+            is_complete_copy,
+        )
+        from projector.scm_tools.git_ssh import SshConnectionPool, get_ssh_command, ssh_host
+        from projector.scm_tools.git_store import (
+            MirrorCache,
+            SharedObjectStore,
+            plan_object_stores,
+        )
+
+        references: Dict[Path, Path] = {}
+        fetch_plan = FetchPlan()
+        state = context.state[cls.name] = {
+            "references": references,
+            "ssh": None,
+            "fetch_plan": fetch_plan,
+        }
+
+        if any(
+            ssh_host(remote.url)
+            for config in repositories.values()
+            for remote in config["remotes"].values()
+        ):
+            ssh_command = await get_ssh_command()
+
+            # Connections cannot be multiplexed through $GIT_SSH.
+            if ssh_command is not None:
+                state["ssh"] = SshConnectionPool(ssh_command=ssh_command)
+
+        source = context.directories["source"]
+        objects_dir = context.directories.get("objects")
+
+        if objects_dir is not None:
+            store = SharedObjectStore(objects_dir)
+            plan = plan_object_stores(repositories)
+
+            async def update(url: str) -> Optional[Path]:
+                async with cls._scheduled(context, url), cls._ssh_session(context, [url]) as env:
+                    try:
+                        return await store.update(url, env=env)
+                    except GitError:
+                        # Repositories using this store will be cloned without it.
+                        return None
+
+            urls = list(set(plan.values()))
+            store_paths = dict(zip(urls, await asyncio.gather(*(update(url) for url in urls))))
+
+            for name, url in plan.items():
+                if store_paths[url] is not None:
+                    references[source / name] = store_paths[url]
+
+            for url, store_path in store_paths.items():
+                if store_path is not None:
+                    fetch_plan.sources[normalize_url(url)] = FetchSource(store_path, "refs/heads/")
+
+        mirrors = context.config.get("mirrors")
+
+        if mirrors is not None:
+            cache = state["mirrors"] = MirrorCache(mirrors["directory"], mirrors.get("max_size"))
+            mirror_paths = state["mirror_paths"] = set()
+            urls = {}
+
+            for config in repositories.values():
+                for remote in config["remotes"].values():
+                    urls.setdefault(normalize_url(remote.url), remote.url)
+
+            async def update_mirror(normalized: str, url: str) -> None:
+                async with cls._scheduled(context, url), cls._ssh_session(context, [url]) as env:
+                    try:
+                        mirror_path = await cache.update(url, env=env)
+                    except GitError:
+                        # Repositories using this URL will talk to it directly.
+                        return
+
+                mirror_paths.add(mirror_path)
+                fetch_plan.sources[normalized] = FetchSource(mirror_path, "refs/heads/")
+
+            await asyncio.gather(
+                *(
+                    update_mirror(normalized, url)
+                    for normalized, url in urls.items()
+                    if normalized not in fetch_plan.sources
+                )
+            )
+
+        async def prefetch(normalized: str, users: List[Tuple[str, str]]) -> None:
+            for name, remote_name in users:
+                path = source / name
+
+                config = repositories[name]
+
+                if not (path / ".git").is_dir() or not is_complete_copy(config, remote_name):
+                    continue
+
+                url = config["remotes"][remote_name].url
+
+                async with cls._scheduled(context, url), cls._ssh_session(context, [url]) as env:
+                    try:
+                        await run_git(
+                            "fetch", "--quiet", "--prune", remote_name, cwd=path, env=env
+                        )
+                    except GitError:
+                        # Every repository will fetch this URL from the network itself.
+                        return
+
+                fetch_plan.sources[normalized] = FetchSource(path, f"refs/remotes/{remote_name}/")
+                fetch_plan.fetched.add((path, remote_name))
+                return
+
+        await asyncio.gather(
+            *(
+                prefetch(normalized, users)
+                for normalized, users in index_remote_urls(repositories).items()
+                if len(users) > 1 and normalized not in fetch_plan.sources
+            )
+        )
+
+    @classmethod
+    async def finish(cls, context: "SyncContext") -> None:
+        """Close the pool of SSH connections and evict unused mirrors."""
+        state = context.state.get(cls.name, {})
+        pool = state.get("ssh")
+        cache = state.get("mirrors")
+
+        if pool is not None:
+            await pool.close()
+
+        if cache is not None:
+            cache.evict(keep=state["mirror_paths"])
+
+    @classmethod
+    async def clone(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> OperationResult:
+        """Clone a repository and add its remotes.
+
+        The repository is built next to ``path`` and only moved into place once it is complete.
+        """
+        state = context.state.get(cls.name, {})
+        urls = [remote.url for remote in config["remotes"].values()]
+        building = path.with_name(f".{path.name}.cloning")
+        shutil.rmtree(str(building), ignore_errors=True)
+
+        async with cls._ssh_session(context, urls) as env:
+            try:
+                await cls._clone(
+                    building,
+                    config,
+                    reference=state.get("references", {}).get(path),
+                    plan=state.get("fetch_plan"),
+                    env=env,
+                )
+            except BaseException:
+                shutil.rmtree(str(building), ignore_errors=True)
+                raise
+
+        os.rename(str(building), str(path))
+
+        return OperationResult(Operation.CLONE, path, changed=True, head=await cls._head(path))
+
+    @classmethod
+    async def fetch(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> OperationResult:
+        urls = [remote.url for remote in config["remotes"].values()]
+        plan = context.state.get(cls.name, {}).get("fetch_plan")
+        before = cls.fingerprint(path)
+
+        async with cls._ssh_session(context, urls) as env:
+            await cls._fetch(path, config, plan=plan, env=env)
+
+        after = cls.fingerprint(path)
+
+        # Remotes fetched while preparing may already have changed the refs.
+        prefetched = plan is not None and any(
+            (path, remote_name) in plan.fetched for remote_name in config["remotes"]
+        )
+
+        return OperationResult(
+            Operation.FETCH, path, changed=prefetched or before is None or before != after
+        )
+
+    @classmethod
+    async def checkout(
+        cls, path: Path, config: Dict[str, Any], ref: Optional[str] = None
+    ) -> OperationResult:
+        before = await cls._head(path)
+        detach_args = ("--detach",) if config["detach"] else ()
+
+        await run_git("checkout", "--quiet", *detach_args, ref or config["ref"], cwd=path)
+
+        head = await cls._head(path)
+
+        return OperationResult(Operation.CHECKOUT, path, changed=head != before, head=head)
+
+    @classmethod
+    async def export_bundle(cls, path: Path, config: Dict[str, Any], out: BinaryIO) -> None:
+        await stream_git("bundle", "create", "--quiet", "-", "--all", out=out, cwd=path)
+
+    @classmethod
+    async def clone_bundle(
+        cls, path: Path, config: Dict[str, Any], bundle: Path
+    ) -> OperationResult:
+        """Clone a repository from a bundle written by :py:meth:`export_bundle`.
+
+        Every ref in the bundle, including the remote-tracking branches, is copied as-is. The
+        repository is built next to ``path`` and only moved into place once it is complete.
+        """
+        building = path.with_name(f".{path.name}.importing")
+        shutil.rmtree(str(building), ignore_errors=True)
+
+        try:
+            await cls._clone_bundle(building, config, bundle)
+        except BaseException:
+            shutil.rmtree(str(building), ignore_errors=True)
+            raise
+
+        os.rename(str(building), str(path))
+
+        return OperationResult(Operation.CLONE, path, changed=True, head=await cls._head(path))
+
+    @classmethod
+    def hosts(
+        cls, path: Path, config: Dict[str, Any], context: "SyncContext"
+    ) -> Optional[Set[str]]:
+        """Return the hosts that synchronizing a repository will talk to.
+
+        Remotes that were fetched while preparing, or that have a local copy (i.e., an object
+        store, mirror, or another repository) are fetched without talking to their hosts. When
+        cloning, the default remote is only cloned from a local copy with every branch.
+        """
+        plan = context.state.get(cls.name, {}).get("fetch_plan")
+        cloning = not path.exists()
+        hosts = set()
+
+        for remote_name, remote in config["remotes"].items():
+            if plan is not None:
+                if (path, remote_name) in plan.fetched:
+                    continue
+
+                fetch_source = plan.source_for(remote.url)
+
+                if fetch_source is not None and not (
+                    cloning and remote.default and fetch_source.prefix != "refs/heads/"
+                ):
+                    continue
+
+            host = url_host(remote.url)
+
+            if host is not None:
+                hosts.add(host)
+
+        return hosts
+
+    @staticmethod
+    def _scheduled(context: "SyncContext", url: str) -> AsyncContextManager[None]:
+        """Wait for the capacity to talk to the host of a URL while preparing."""
+        host = url_host(url)
+
+        return context.scheduler.slot(hosts={host} if host is not None else ())
+
+    @classmethod
+    @asynccontextmanager
+    async def _ssh_session(
+        cls, context: "SyncContext", urls: List[str]
+    ) -> AsyncIterator[Optional[Dict[str, str]]]:
+        """Reserve SSH sessions to the hosts of the given URLs, if there is a pool.
+
+        This yields the environment variables to run Git with.
+        """
+        pool = context.state.get(cls.name, {}).get("ssh")
+
+        if pool is None:
+            yield None
+        else:
+            async with pool.session(urls) as env:
+                yield env
+
+    @classmethod
+    async def _clone_bundle(cls, path: Path, config: Dict[str, Any], bundle: Path) -> None:
+        """Clone a repository from a bundle into ``path``."""
+        await run_git("init", "--quiet", str(path))
+
+        # HEAD points at a branch that does not exist yet, which the bundle may contain.
+        await run_git(
+            "fetch", "--quiet", "--update-head-ok", str(bundle), "+refs/*:refs/*", cwd=path
+        )
+
+        remotes = config["remotes"]
+
+        for remote_name, remote in remotes.items():
+            await run_git("remote", "add", remote_name, remote.url, cwd=path)
+
+        detach_args = ("--detach",) if config["detach"] else ()
+
+        # The work tree is empty, so the checkout must be forced to populate it.
+        await run_git("checkout", "--quiet", "--force", *detach_args, config["ref"], cwd=path)
+
+        if not config["detach"]:
+            default_name = next(name for name, remote in remotes.items() if remote.default)
+            ref = config["ref"]
+
+            await run_git("config", f"branch.{ref}.remote", default_name, cwd=path)
+            await run_git("config", f"branch.{ref}.merge", f"refs/heads/{ref}", cwd=path)
+
+    @classmethod
+    async def _clone(
+        cls,
+        path: Path,
+        config: Dict[str, Any],
+        *,
+        reference: Optional[Path] = None,
+        plan: Optional["FetchPlan"] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Clone a repository from its default remote and add the remaining remotes.
+
+        If ``reference`` is provided, the repository will borrow objects from it. If the ``plan``
+        has a mirror of the default remote, the repository is cloned from the mirror and then
+        pointed at the remote. Git is run with the environment variables in ``env`` when talking
+        to remotes.
+        """
+        remotes = config["remotes"]
+        default_name = next(name for name, remote in remotes.items() if remote.default)
+        url = remotes[default_name].url
+        clone_url = url
+        fetch_source = plan.source_for(url) if plan is not None else None
+
+        if fetch_source is not None and fetch_source.prefix == "refs/heads/":
+            # Local clones hard link objects, but ignore --depth and --filter.
+            if "depth" in config or "filter" in config:
+                clone_url = fetch_source.path.as_uri()
+            else:
+                clone_url = str(fetch_source.path)
+
+        reference_args = ("--reference-if-able", str(reference)) if reference else ()
+        single_branch_args = ("--single-branch",) if config.get("single_branch") else ()
+
+        # Git records the filter for the default remote, so later fetches from it honour the
+        # filter without it being passed again.
+        filter_args = (f"--filter={config['filter']}",) if "filter" in config else ()
+
+        # --branch only accepts branch and tag names, so commits are checked out afterwards.
+        pinned = await cls._is_pinned(clone_url, config["ref"], env=env)
+        branch_args = ("--no-checkout",) if pinned else ("--branch", config["ref"])
+
+        await run_git(
+            "clone",
+            "--quiet",
+            *reference_args,
+            *cls._depth_args(config),
+            *filter_args,
+            *single_branch_args,
+            "--origin",
+            default_name,
+            *branch_args,
+            clone_url,
+            str(path),
+            env=env,
+        )
+
+        # Shallow and single-branch clones only have the history of a branch, which may not
+        # contain the commit.
+        if pinned and not await cls._has_commit(path, config["ref"]):
+            await run_git(
+                "fetch",
+                "--quiet",
+                *cls._depth_args(config),
+                default_name,
+                config["ref"],
+                cwd=path,
+                env=env,
+            )
+
+        if clone_url != url:
+            await run_git("remote", "set-url", default_name, url, cwd=path)
+
+        others = [name for name in remotes if name != default_name]
+
+        for remote_name in others:
+            await run_git("remote", "add", remote_name, remotes[remote_name].url, cwd=path)
+
+        if others:
+            await cls._fetch(path, config, remote_names=others, plan=plan, env=env)
+
+        if pinned or config["detach"]:
+            await cls.checkout(path, config)
+
+    @classmethod
+    async def _fetch(
+        cls,
+        path: Path,
+        config: Dict[str, Any],
+        *,
+        remote_names: Optional[List[str]] = None,
+        plan: Optional["FetchPlan"] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Fetch the remotes of an existing repository.
+
+        Only the remotes in ``remote_names`` are fetched, if it is provided. Remotes that the
+        ``plan`` has a local copy of are fetched from that copy, and remotes it has already
+        fetched are skipped.
+        """
+        from projector.scm_tools.git_fetch import tracks_single_branch
+
+        if remote_names is None:
+            remote_names = list(config["remotes"])
+
+        network = []
+
+        for remote_name in remote_names:
+            remote = config["remotes"][remote_name]
+
+            if plan is None:
+                network.append(remote_name)
+            elif (path, remote_name) not in plan.fetched:
+                fetch_source = plan.source_for(remote.url)
+
+                if fetch_source is None:
+                    network.append(remote_name)
+                    continue
+
+                branch = None
+
+                if tracks_single_branch(config, remote_name):
+                    branch = await cls._tracked_branch(path, remote_name)
+
+                if branch is not None:
+                    refspec = fetch_source.refspec(remote_name, branch)
+                else:
+                    refspec = fetch_source.refspec(remote_name)
+
+                await run_git(
+                    "fetch",
+                    "--quiet",
+                    "--prune",
+                    *cls._depth_args(config),
+                    str(fetch_source.path),
+                    refspec,
+                    cwd=path,
+                )
+
+        if network:
+            await run_git(
+                "fetch",
+                "--quiet",
+                "--prune",
+                *cls._depth_args(config),
+                "--multiple",
+                *network,
+                cwd=path,
+                env=env,
+            )
+
+    @classmethod
+    async def status(
+        cls,
+        name: str,
+        path: Path,
+        config: Dict[str, Any],
+        recorded: Optional["RepositoryState"] = None,
+    ) -> "RepositoryStatus":
+        from projector.status import RepositoryStatus
+
+        # Without --no-optional-locks, git status may rewrite the index, which would wake up any
+        # watcher of the repository.
+        status = run_git(
+            "--no-optional-locks",
+            "status",
+            "--porcelain=v2",
+            "--branch",
+            "--untracked-files=no",
+            cwd=path,
+        )
+
+        if recorded is not None and recorded.has_status:
+            # The refs are unchanged, so only the working tree has to be inspected.
+            status_output = await status
+            counts = (recorded.ahead, recorded.behind)
+        else:
+            default_name = next(
+                remote_name for remote_name, remote in config["remotes"].items() if remote.default
+            )
+            upstream = f"refs/remotes/{default_name}/{config['ref']}"
+
+            status_output, counts = await asyncio.gather(status, cls._ahead_behind(path, upstream))
+
+        head = None
+        ref = None
+        dirty = False
+
+        for line in status_output.splitlines():
+            if not line.startswith("# "):
+                dirty = True
+                continue
+
+            key, _, value = line[2:].partition(" ")
+
+            if key == "branch.oid":
+                head = value if value != "(initial)" else None
+            elif key == "branch.head":
+                ref = value if value != "(detached)" else None
+
+        ahead, behind = counts if counts is not None else (None, None)
+
+        return RepositoryStatus(
+            name=name,
+            present=True,
+            configured_ref=config["ref"],
+            ref=ref,
+            head=head,
+            dirty=dirty,
+            ahead=ahead,
+            behind=behind,
+        )
+
+    @classmethod
+    def fingerprint(cls, path: Path) -> Optional[str]:
+        """Return a fingerprint of the refs of a repository.
+
+        Git updates ``HEAD`` and refs by renaming a lock file into place, so the modification
+        times of ``HEAD``, ``packed-refs``, ``shallow`` and every directory under ``refs`` change
+        whenever anything they record does. ``FETCH_HEAD`` is rewritten by every fetch, even one
+        that changes nothing, so it is not included.
+        """
+        git_dir = path / ".git"
+        parts = []
+
+        try:
+            for file_name in ("HEAD", "packed-refs", "shallow"):
+                try:
+                    mtime = os.stat(str(git_dir / file_name)).st_mtime_ns
+                except FileNotFoundError:
+                    mtime = None
+
+                parts.append(f"{file_name}:{mtime}")
+
+            pending = ["refs"]
+
+            while pending:
+                refs_dir = pending.pop()
+
+                with os.scandir(str(git_dir / refs_dir)) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(f"{refs_dir}/{entry.name}")
+
+                parts.append(f"{refs_dir}:{os.stat(str(git_dir / refs_dir)).st_mtime_ns}")
+        except OSError:
+            return None
+
+        return hashlib.sha1("\n".join(sorted(parts)).encode()).hexdigest()
+
+    @classmethod
+    def watch_directories(cls, path: Path) -> List[Tuple[Path, bool]]:
+        """Return the directories to watch for changes to the status of a repository.
+
+        ``HEAD``, the index and the packed refs live directly in the Git directory, while loose
+        refs may be nested arbitrarily deep under ``refs``.
+        """
+        git_dir = path / ".git"
+
+        return [(git_dir, False), (git_dir / "refs", True)]
+
+    @staticmethod
+    async def _head(path: Path) -> Optional[str]:
+        """Return the commit ID of HEAD, or ``None`` if there are no commits."""
+        try:
+            return (await run_git("rev-parse", "--verify", "--quiet", "HEAD", cwd=path)).strip()
+        except GitError:
+            return None
+
+    @staticmethod
+    async def _has_commit(path: Path, ref: str) -> bool:
+        """Return whether or not a repository has the commit a ref points to."""
+        try:
+            await run_git("cat-file", "-e", f"{ref}^{{commit}}", cwd=path)
+        except GitError:
+            return False
+
+        return True
+
+    @staticmethod
+    async def _tracked_branch(path: Path, remote_name: str) -> Optional[str]:
+        """Return the only branch that a remote of a repository fetches.
+
+        Single-branch clones of a commit track the default branch of the remote, rather than the
+        configured ref.
+
+        Returns:
+            The name of the branch, or ``None`` if the remote does not fetch a single branch.
+        """
+        try:
+            output = await run_git("config", "--get-all", f"remote.{remote_name}.fetch", cwd=path)
+        except GitError:
+            return None
+
+        match = re.fullmatch(
+            rf"\+refs/heads/([^*]+):refs/remotes/{re.escape(remote_name)}/\1", output.strip()
+        )
+
+        return match.group(1) if match else None
+
+    @staticmethod
+    async def _is_pinned(url: str, ref: str, env: Optional[Dict[str, str]] = None) -> bool:
+        """Return whether or not a ref is a commit ID, rather than a branch or tag of a remote.
+
+        Branches and tags can be named like commit IDs, so refs that look like one are looked up
+        on the remote.
+        """
+        if not is_commit_id(ref):
+            return False
+
+        output = await run_git("ls-remote", "--heads", "--tags", url, ref, env=env)
+        names = {f"refs/heads/{ref}", f"refs/tags/{ref}"}
+
+        return not any(line.split("\t")[-1] in names for line in output.splitlines())
+
+    @staticmethod
+    async def _ahead_behind(path: Path, upstream: str) -> Optional[Tuple[int, int]]:
+        """Return the number of commits HEAD is ahead of and behind another ref.
+
+        Returns:
+            The counts, or ``None`` if either ref does not exist.
+        """
+        try:
+            output = await run_git(
+                "rev-list", "--left-right", "--count", f"HEAD...{upstream}", "--", cwd=path
+            )
+        except GitError:
+            return None
+
+        ahead, behind = output.split()
+
+        return int(ahead), int(behind)
+
+    @staticmethod
+    def _depth_args(config: Dict[str, Any]) -> List[str]:
+        """Return the arguments limiting the depth of history that is cloned or fetched."""
+        if "depth" in config:
+            return [f"--depth={config['depth']}"]
+
+        return []
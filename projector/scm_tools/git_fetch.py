@@ -0,0 +1,144 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Planning of fetches shared between Git repositories."""
+
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from projector.urls import normalize_url
+
+
+def tracks_single_branch(config: Dict[str, Any], remote_name: str) -> bool:
+    """Return whether or not a remote of a repository only tracks the configured ref.
+
+    This is the case for the default remote of repositories cloned with ``single_branch``.
+
+    Args:
+        config:
+            The repository configuration, as loaded by
+            :py:class:`~projector.scm_tools.git.GitRepositorySchema`.
+
+        remote_name:
+            The name of the remote.
+
+    Returns:
+        Whether or not the remote only tracks the configured ref.
+    """
+    return bool(config.get("single_branch")) and config["remotes"][remote_name].default
+
+
+def is_complete_copy(config: Dict[str, Any], remote_name: str) -> bool:
+    """Return whether or not a remote of a repository has every branch and object of its URL.
+
+    Only complete copies can provide a URL to other repositories: Git refuses to update refs from
+    a shallow repository and quietly leaves them behind, a partial clone is missing objects, and
+    a single-branch remote is missing the other branches.
+
+    Args:
+        config:
+            The repository configuration, as loaded by
+            :py:class:`~projector.scm_tools.git.GitRepositorySchema`.
+
+        remote_name:
+            The name of the remote.
+
+    Returns:
+        Whether or not the remote is a complete copy of its URL.
+    """
+    if "depth" in config or "filter" in config:
+        return False
+
+    return not tracks_single_branch(config, remote_name)
+
+
+def index_remote_urls(repositories: Dict[str, Dict[str, Any]]) -> Dict[str, List[Tuple[str, str]]]:
+    """Index the remotes of every repository by URL.
+
+    Args:
+        repositories:
+            A mapping of repository names to their configuration, as loaded by
+            :py:class:`~projector.scm_tools.git.GitRepositorySchema`.
+
+    Returns:
+        A mapping of :py:func:`normalized <projector.urls.normalize_url>` URLs to the repository
+        and remote names that use them, in configuration order.
+    """
+    index: Dict[str, List[Tuple[str, str]]] = {}
+
+    for name, config in repositories.items():
+        for remote_name, remote in config["remotes"].items():
+            index.setdefault(normalize_url(remote.url), []).append((name, remote_name))
+
+    return index
+
+
+class FetchSource(NamedTuple):
+    """A local repository that already has the refs of a remote."""
+
+    #: The path to the local repository.
+    path: Path
+
+    #: The prefix of the remote's branches in the local repository.
+    #:
+    #: This is ``refs/heads/`` for shared object stores and ``refs/remotes/<remote>/`` for
+    #: working repositories.
+    prefix: str
+
+    def refspec(self, remote_name: str, branch: str = "*") -> str:
+        """Return the refspec that fetches the remote's branches from this source.
+
+        Args:
+            remote_name:
+                The name of the remote in the repository fetching from this source.
+
+            branch:
+                The branch to fetch. Defaults to every branch.
+
+        Returns:
+            The refspec.
+        """
+        return f"+{self.prefix}{branch}:refs/remotes/{remote_name}/{branch}"
+
+
+class FetchPlan:
+    """The plan for fetching each distinct remote URL only once per run.
+
+    Every URL that is shared by more than one remote is fetched from the network once, either into
+    a shared object store or into one of the repositories that uses it. Every other remote with
+    that URL is then fetched from that local copy.
+    """
+
+    def __init__(self):
+        """Initialize the plan."""
+        #: The local copy of each shared URL, keyed by normalized URL.
+        self.sources: Dict[str, FetchSource] = {}
+
+        #: The repository paths and remote names that have already been fetched this run.
+        self.fetched: Set[Tuple[Path, str]] = set()
+
+    def source_for(self, url: str) -> Optional[FetchSource]:
+        """Return the local copy of a remote URL.
+
+        Args:
+            url:
+                The URL of the remote.
+
+        Returns:
+            The local copy, or ``None`` if the URL must be fetched from the network.
+        """
+        return self.sources.get(normalize_url(url))
@@ -0,0 +1,205 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Multiplexed SSH connections for Git."""
+
+import asyncio
+import os
+import shlex
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from projector.urls import parse_url
+
+
+#: The URL schemes that Git uses SSH for.
+SSH_SCHEMES = {"ssh", "git+ssh", "ssh+git"}
+
+#: The default maximum number of concurrent sessions multiplexed over each host's connection.
+#:
+#: This matches the default ``MaxSessions`` of OpenSSH's sshd.
+DEFAULT_MAX_SESSIONS = 10
+
+#: The default number of seconds an idle control connection is kept open for.
+DEFAULT_CONTROL_PERSIST = 60
+
+
+def ssh_host(url: str) -> Optional[str]:
+    """Return the host Git connects to over SSH for a URL.
+
+    Args:
+        url:
+            The URL of the repository.
+
+    Returns:
+        The lower-cased host name, or ``None`` if Git does not use SSH for the URL.
+    """
+    parsed = parse_url(url)
+
+    if parsed.scheme not in SSH_SCHEMES:
+        return None
+
+    return parsed.host
+
+
+async def get_ssh_command() -> Optional[str]:
+    """Return the SSH command that Git runs, if its options can be extended.
+
+    Git runs ``$GIT_SSH_COMMAND``, then the ``core.sshCommand`` configuration, then ``$GIT_SSH``,
+    and finally ``ssh``. Unlike the others, ``$GIT_SSH`` is a program rather than a shell
+    command, so no options can be added to it.
+
+    Returns:
+        The SSH command, or ``None`` if Git runs ``$GIT_SSH``.
+    """
+    command = os.environ.get("GIT_SSH_COMMAND")
+
+    if command:
+        return command
+
+    proc = await asyncio.create_subprocess_exec(
+        "git",
+        "config",
+        "--get",
+        "core.sshCommand",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await proc.communicate()
+    command = stdout.decode().strip()
+
+    if command:
+        return command
+
+    if os.environ.get("GIT_SSH"):
+        return None
+
+    return "ssh"
+
+
+class SshConnectionPool:
+    """A pool of persistent, multiplexed SSH connections.
+
+    Git runs a new SSH client for every clone or fetch. Through OpenSSH's ``ControlMaster``, the
+    first client for a host leaves behind a control connection that later clients for the same
+    host reuse, so only the first pays for the SSH handshake. The number of sessions that run
+    over each host's connection at once is capped, since servers limit how many they accept.
+
+    The pool must be :py:meth:`closed <close>` when it is no longer needed.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        persist: int = DEFAULT_CONTROL_PERSIST,
+        ssh_command: Optional[str] = None,
+    ):
+        """Initialize the pool.
+
+        Args:
+            max_sessions:
+                The maximum number of concurrent sessions per host.
+
+            persist:
+                The number of seconds an idle control connection is kept open for.
+
+            ssh_command:
+                The SSH command to run. Defaults to ``$GIT_SSH_COMMAND`` or ``ssh``.
+
+                This overrides the ``core.sshCommand`` configuration and ``$GIT_SSH``, so it
+                should be the result of :py:func:`get_ssh_command`.
+
+        Raises:
+            ValueError:
+                ``max_sessions`` is not a positive number.
+        """
+        if max_sessions < 1:
+            raise ValueError(f"max_sessions must be positive; got {max_sessions}")
+
+        if ssh_command is None:
+            ssh_command = os.environ.get("GIT_SSH_COMMAND") or "ssh"
+
+        self.max_sessions = max_sessions
+        self.ssh_command = ssh_command
+
+        #: The directory containing the control sockets.
+        #:
+        #: Socket paths are limited to around 100 bytes, so this is always a short temporary
+        #: directory.
+        self.control_dir = Path(tempfile.mkdtemp(prefix="projector-ssh-"))
+
+        #: The environment variables that make Git use the pool.
+        self.env: Dict[str, str] = {
+            "GIT_SSH_COMMAND": (
+                f"{ssh_command} -o ControlMaster=auto"
+                f" -o ControlPath={shlex.quote(str(self.control_dir / '%C'))}"
+                f" -o ControlPersist={persist}"
+            )
+        }
+
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def session(self, urls: Iterable[str]) -> AsyncIterator[Optional[Dict[str, str]]]:
+        """Reserve sessions to every SSH host of the given URLs.
+
+        Args:
+            urls:
+                The URLs a Git command will connect to.
+
+        Yields:
+            The environment variables to run Git with, or ``None`` if none of the URLs use SSH.
+        """
+        hosts = sorted({host for host in map(ssh_host, urls) if host is not None})
+
+        if not hosts:
+            yield None
+            return
+
+        # Hosts are always acquired in the same order so that sessions needing several hosts
+        # cannot deadlock.
+        acquired = []
+
+        try:
+            for host in hosts:
+                limit = self._limits.setdefault(host, asyncio.Semaphore(self.max_sessions))
+                await limit.acquire()
+                acquired.append(limit)
+
+            yield self.env
+        finally:
+            for limit in acquired:
+                limit.release()
+
+    async def close(self) -> None:
+        """Close every control connection and remove the control directory."""
+        for socket_path in self.control_dir.iterdir():
+            proc = await asyncio.create_subprocess_shell(
+                f"{self.ssh_command} -o ControlPath={shlex.quote(str(socket_path))} "
+                f"-O exit projector",
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            await proc.wait()
+
+        shutil.rmtree(str(self.control_dir), ignore_errors=True)
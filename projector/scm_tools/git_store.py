@@ -0,0 +1,253 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Shared storage for Git repositories."""
+
+import os
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from projector.scm_tools.git import run_git
+from projector.urls import normalize_url, url_slug
+
+
+def plan_object_stores(repositories: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Determine which repositories should share an object store.
+
+    Repositories share an object store when they have remotes with the same (normalized) URL,
+    as forks of the same upstream usually do. Each repository uses the store for the first of its
+    remotes that is shared with another repository.
+
+    Args:
+        repositories:
+            A mapping of repository names to their configuration, as loaded by
+            :py:class:`~projector.scm_tools.git.GitRepositorySchema`.
+
+    Returns:
+        A mapping of repository names to the URL of the object store they should use.
+
+        Repositories that share no remotes with others are not present.
+    """
+    users = defaultdict(set)
+    first_urls = {}
+
+    for name, config in repositories.items():
+        for remote in config["remotes"].values():
+            normalized = normalize_url(remote.url)
+            users[normalized].add(name)
+            first_urls.setdefault(normalized, remote.url)
+
+    plan = {}
+
+    for name, config in repositories.items():
+        for remote in config["remotes"].values():
+            normalized = normalize_url(remote.url)
+
+            if len(users[normalized]) > 1:
+                plan[name] = first_urls[normalized]
+                break
+
+    return plan
+
+
+class SharedObjectStore:
+    """A directory of bare repositories whose objects are shared with working repositories.
+
+    Working repositories borrow objects from a store through Git alternates (i.e., they are
+    cloned with ``--reference``). Objects are therefore never pruned from a store, since
+    working repositories may depend on objects that are no longer reachable from its refs.
+    """
+
+    #: Git configuration set in each new bare repository.
+    #:
+    #: Objects must never be pruned, since working repositories may depend on them.
+    repository_config = (
+        ("remote.origin.fetch", "+refs/heads/*:refs/heads/*"),
+        ("gc.auto", "0"),
+        ("gc.pruneExpire", "never"),
+    )
+
+    #: Whether or not refs deleted from the upstream repository are deleted when updating.
+    prune = False
+
+    def __init__(self, root: Path):
+        """Initialize the store.
+
+        Args:
+            root:
+                The directory containing the bare repositories.
+        """
+        self.root = root
+
+    def path_for(self, url: str) -> Path:
+        """Return the path of the bare repository for a URL.
+
+        Args:
+            url:
+                The URL of the upstream repository.
+
+        Returns:
+            The path to the bare repository.
+        """
+        return self.root / f"{url_slug(url)}.git"
+
+    async def update(self, url: str, *, env: Optional[Dict[str, str]] = None) -> Path:
+        """Create or update the bare repository for a URL.
+
+        Args:
+            url:
+                The URL of the upstream repository.
+
+            env:
+                Environment variables to run Git with when talking to the upstream repository.
+
+        Returns:
+            The path to the bare repository.
+
+        Raises:
+            projector.scm_tools.git.GitError:
+                The repository could not be cloned or fetched.
+        """
+        path = self.path_for(url)
+
+        if path.exists():
+            prune_args = ("--prune",) if self.prune else ()
+            await run_git("fetch", "--quiet", *prune_args, "--tags", "origin", cwd=path, env=env)
+            return path
+
+        # Clone into a temporary location so that an interrupted clone never leaves behind a
+        # store that looks valid.
+        tmp_path = path.with_name(f"{path.name}.tmp")
+
+        if tmp_path.exists():
+            shutil.rmtree(str(tmp_path))
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        await run_git("clone", "--quiet", "--bare", url, str(tmp_path), env=env)
+
+        for key, value in self.repository_config:
+            await run_git("config", key, value, cwd=tmp_path)
+
+        os.rename(str(tmp_path), str(path))
+
+        return path
+
+
+class MirrorCache(SharedObjectStore):
+    """A size-bounded cache of bare mirrors of remote repositories.
+
+    Working repositories are cloned and fetched from mirrors, rather than borrowing objects from
+    them, so mirrors can be evicted at any time. When the mirrors use more than the disk budget,
+    the least recently used are evicted until they fit.
+    """
+
+    repository_config = (("remote.origin.fetch", "+refs/heads/*:refs/heads/*"),)
+    prune = True
+
+    def __init__(self, root: Path, max_size: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            root:
+                The directory containing the mirrors.
+
+            max_size:
+                The disk space the mirrors may use, in bytes. If this is not provided, mirrors
+                are never evicted.
+        """
+        super().__init__(root)
+
+        self.max_size = max_size
+
+    async def update(self, url: str, *, env: Optional[Dict[str, str]] = None) -> Path:
+        """Create or update the mirror of a URL and mark it as recently used.
+
+        Args:
+            url:
+                The URL of the remote repository.
+
+            env:
+                Environment variables to run Git with when talking to the remote repository.
+
+        Returns:
+            The path to the mirror.
+
+        Raises:
+            projector.scm_tools.git.GitError:
+                The mirror could not be cloned or fetched.
+        """
+        path = await super().update(url, env=env)
+        os.utime(str(path))
+
+        return path
+
+    def evict(self, keep: Iterable[Path] = ()) -> List[Path]:
+        """Evict the least recently used mirrors until the cache fits in its budget.
+
+        Args:
+            keep:
+                The paths of mirrors that must not be evicted, such as those in use.
+
+        Returns:
+            The paths of the evicted mirrors.
+        """
+        if self.max_size is None:
+            return []
+
+        keep = set(keep)
+
+        try:
+            mirrors = [path for path in self.root.iterdir() if path.suffix == ".git"]
+        except FileNotFoundError:
+            return []
+
+        sizes = {path: _disk_usage(path) for path in mirrors}
+        total = sum(sizes.values())
+        evicted = []
+
+        for path in sorted(mirrors, key=lambda path: path.stat().st_mtime):
+            if total <= self.max_size:
+                break
+
+            if path in keep:
+                continue
+
+            # Rename first, so that a partially deleted mirror is never mistaken for a valid one.
+            doomed = path.with_name(f"{path.name}.evicted")
+            os.rename(str(path), str(doomed))
+            shutil.rmtree(str(doomed), ignore_errors=True)
+
+            total -= sizes[path]
+            evicted.append(path)
+
+        return evicted
+
+
+def _disk_usage(path: Path) -> int:
+    """Return the disk space used by a directory tree, in bytes."""
+    total = 0
+
+    for dir_path, dir_names, file_names in os.walk(str(path)):
+        for file_name in file_names:
+            try:
+                total += os.lstat(os.path.join(dir_path, file_name)).st_blocks * 512
+            except FileNotFoundError:
+                pass
+
+    return total
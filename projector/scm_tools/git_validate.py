@@ -0,0 +1,151 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A fast path for loading Git repository configurations.
+
+Loading with :py:class:`~projector.scm_tools.git.GitRepositorySchema` goes through marshmallow's
+general machinery for every field of every remote, which dominates the time it takes to load
+large configurations. Nearly all configurations are plain JSON, though: strings, booleans, and
+integers of exactly the expected types. :py:func:`load_git_config` validates those directly and
+only falls back to the schema for anything else, so that invalid or unusual configurations
+produce exactly the same results and error messages.
+"""
+
+from typing import Any, Dict, Optional
+
+from projector.scm_tools.git import CLONE_FILTERS, CLONE_OPTIONS, GitRepositorySchema, Remote
+
+#: The fields of a Git repository configuration.
+REPOSITORY_FIELDS = frozenset(("ref", "detach", "remotes", *CLONE_OPTIONS))
+
+#: The fields of an explicit Git remote.
+REMOTE_FIELDS = frozenset(("url", "default"))
+
+
+def load_git_config(data: Any) -> Dict[str, Any]:
+    """Load and validate a Git repository configuration.
+
+    The result is identical to that of :py:meth:`GitRepositorySchema.load
+    <projector.scm_tools.git.GitRepositorySchema.load>`.
+
+    Args:
+        data:
+            The raw configuration.
+
+    Returns:
+        The validated configuration.
+
+    Raises:
+        marshmallow.exceptions.ValidationError:
+            The configuration is invalid.
+    """
+    result = load_git_config_fast(data)
+
+    if result is None:
+        result = GitRepositorySchema().load(data)
+
+    return result
+
+
+def load_git_config_fast(data: Any) -> Optional[Dict[str, Any]]:
+    """Load a valid, plain Git repository configuration without marshmallow.
+
+    Args:
+        data:
+            The raw configuration.
+
+    Returns:
+        The validated configuration, or ``None`` if the configuration is not plain or is invalid.
+        Those configurations must be loaded with the schema.
+    """
+    # Exact type checks are used throughout, since marshmallow coerces values of other types
+    # (e.g., "true" for booleans and "1" for integers) or rejects them with its own messages.
+    if type(data) is not dict or not REPOSITORY_FIELDS.issuperset(data):
+        return None
+
+    ref = data.get("ref", "master")
+    detach = data.get("detach", False)
+    raw_remotes = data.get("remotes")
+
+    if type(ref) is not str or type(detach) is not bool:
+        return None
+
+    if type(raw_remotes) is not dict or not raw_remotes:
+        return None
+
+    remotes = {}
+    default_count = 0
+
+    for remote_name, raw_remote in raw_remotes.items():
+        if type(remote_name) is not str:
+            return None
+
+        if type(raw_remote) is str:
+            remote = Remote.from_raw(raw_remote)
+        elif type(raw_remote) is dict and REMOTE_FIELDS.issuperset(raw_remote):
+            url = raw_remote.get("url")
+            default = raw_remote.get("default", False)
+
+            if type(url) is not str or type(default) is not bool:
+                return None
+
+            remote = Remote.from_raw({"url": url, "default": default})
+            default_count += default
+        else:
+            return None
+
+        remotes[remote_name] = remote
+
+    if default_count == 0:
+        if len(remotes) == 1:
+            default_remote = next(iter(remotes))
+        elif "origin" in remotes:
+            default_remote = "origin"
+        else:
+            default_remote = None
+
+        # The schema rejects a sole remote with an empty name, too.
+        if not default_remote:
+            return None
+
+        remotes[default_remote].default = True
+    elif default_count > 1:
+        return None
+
+    result = {"remotes": remotes, "ref": ref, "detach": detach}
+
+    if "depth" in data:
+        depth = data["depth"]
+
+        if type(depth) is not int or depth < 1:
+            return None
+
+        result["depth"] = depth
+
+    if "filter" in data:
+        if type(data["filter"]) is not str or data["filter"] not in CLONE_FILTERS:
+            return None
+
+        result["filter"] = data["filter"]
+
+    if "single_branch" in data:
+        if type(data["single_branch"]) is not bool:
+            return None
+
+        result["single_branch"] = data["single_branch"]
+
+    return result
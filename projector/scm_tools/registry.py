@@ -0,0 +1,278 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A lazily-loading registry of SCM tools.
+
+SCM tools are registered with the ``projector.scm_tools`` entry point group. Discovering them
+only requires reading entry point metadata: the module implementing a tool is not imported
+until a configuration names that tool.
+"""
+
+import json
+import os
+import sys
+from importlib import import_module
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Type
+
+from projector.cache import write_atomic
+from projector.scm_tools.base import ScmTool
+
+
+#: The entry point group that SCM tools are registered under.
+ENTRY_POINT_GROUP = "projector.scm_tools"
+
+#: The version of the on-disk entry point index format.
+INDEX_VERSION = 1
+
+
+class EntryPointSpec(NamedTuple):
+    """An unresolved SCM tool entry point."""
+
+    #: The name of the entry point.
+    #:
+    #: This is the name that configurations refer to the SCM tool by.
+    name: str
+
+    #: The object reference of the entry point, in ``module:attr`` form.
+    value: str
+
+    #: The name of the distribution that registered the entry point.
+    distribution: str
+
+    #: The version of the distribution that registered the entry point.
+    version: str
+
+    def load(self) -> Type[ScmTool]:
+        """Import the SCM tool the entry point refers to.
+
+        Returns:
+            The SCM tool.
+        """
+        module_name, _, attrs = self.value.partition(":")
+        obj = import_module(module_name.strip())
+
+        for attr in filter(None, attrs.strip().split(".")):
+            obj = getattr(obj, attr)
+
+        return obj
+
+
+def discover_entry_points(group: str = ENTRY_POINT_GROUP) -> Dict[str, EntryPointSpec]:
+    """Discover the entry points registered in a group.
+
+    Only distributions whose ``entry_points.txt`` mentions the group have their metadata parsed.
+    If multiple distributions register the same name, the one that appears first on
+    :py:data:`sys.path` takes precedence.
+
+    Args:
+        group:
+            The entry point group.
+
+    Returns:
+        A mapping of entry point names to their specifications.
+    """
+    # Importing the metadata machinery is not free, so it is deferred until an index misses.
+    try:
+        from importlib import metadata as importlib_metadata
+    except ImportError:  # Python < 3.8
+        import importlib_metadata
+
+    header = f"[{group}]"
+    specs = {}
+
+    for dist in importlib_metadata.distributions():
+        text = dist.read_text("entry_points.txt")
+
+        if not text or header not in text:
+            continue
+
+        for entry_point in dist.entry_points:
+            if entry_point.group == group and entry_point.name not in specs:
+                specs[entry_point.name] = EntryPointSpec(
+                    name=entry_point.name,
+                    value=entry_point.value,
+                    distribution=dist.metadata["Name"],
+                    version=dist.version,
+                )
+
+    return specs
+
+
+def path_fingerprint(paths: Iterable[str]) -> List[List]:
+    """Return a fingerprint of the import path.
+
+    Installing, upgrading, or removing a distribution modifies the directory it is installed in,
+    so the modification times of every directory on the import path change whenever the set of
+    available entry points may have changed. The empty path refers to the current directory.
+
+    Args:
+        paths:
+            The import path.
+
+    Returns:
+        A JSON-serializable fingerprint.
+    """
+    fingerprint = []
+
+    for path in paths:
+        path = path or os.getcwd()
+
+        try:
+            mtime = Path(path).stat().st_mtime_ns
+        except OSError:
+            mtime = None
+
+        fingerprint.append([path, mtime])
+
+    return fingerprint
+
+
+class EntryPointIndex:
+    """An on-disk index of discovered entry points.
+
+    The index is invalidated whenever the :py:func:`fingerprint <path_fingerprint>` of
+    :py:data:`sys.path` changes.
+    """
+
+    def __init__(self, path: Path, group: str = ENTRY_POINT_GROUP):
+        """Initialize the index.
+
+        Args:
+            path:
+                The path of the index file.
+
+            group:
+                The entry point group that is indexed.
+        """
+        self.path = path
+        self.group = group
+
+    def load(self) -> Optional[Dict[str, EntryPointSpec]]:
+        """Load the index.
+
+        Returns:
+            The indexed entry points, or ``None`` if the index is missing or stale.
+        """
+        try:
+            with self.path.open("rb") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        expected = {
+            "version": INDEX_VERSION,
+            "group": self.group,
+            "fingerprint": path_fingerprint(sys.path),
+        }
+
+        if not isinstance(index, dict) or any(index.get(k) != v for k, v in expected.items()):
+            return None
+
+        try:
+            return {spec[0]: EntryPointSpec(*spec) for spec in index["entry_points"]}
+        except (KeyError, TypeError):
+            return None
+
+    def store(self, specs: Mapping[str, EntryPointSpec]) -> None:
+        """Write the index.
+
+        Args:
+            specs:
+                The discovered entry points.
+        """
+        index = {
+            "version": INDEX_VERSION,
+            "group": self.group,
+            "fingerprint": path_fingerprint(sys.path),
+            "entry_points": list(specs.values()),
+        }
+
+        write_atomic(self.path, json.dumps(index).encode())
+
+
+class ScmToolRegistry(Mapping[str, Type[ScmTool]]):
+    """A mapping of SCM tool names to lazily-loaded SCM tools."""
+
+    @classmethod
+    def discover(cls, index_path: Optional[Path] = None) -> "ScmToolRegistry":
+        """Discover the registered SCM tools.
+
+        Args:
+            index_path:
+                The path to an on-disk :py:class:`EntryPointIndex`.
+
+                If provided, the index will be used when it is valid and rebuilt when it is not.
+
+        Returns:
+            The registry.
+        """
+        if index_path is None:
+            return cls(discover_entry_points())
+
+        index = EntryPointIndex(index_path)
+        specs = index.load()
+
+        if specs is None:
+            specs = discover_entry_points()
+            index.store(specs)
+
+        return cls(specs)
+
+    def __init__(self, specs: Mapping[str, EntryPointSpec]):
+        """Initialize the registry.
+
+        Args:
+            specs:
+                A mapping of SCM tool names to their entry points.
+        """
+        self._specs = dict(specs)
+        self._tools = {}
+
+    def __getitem__(self, name: str) -> Type[ScmTool]:
+        try:
+            return self._tools[name]
+        except KeyError:
+            pass
+
+        tool = self._tools[name] = self._specs[name].load()
+        return tool
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._specs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def spec(self, name: str) -> EntryPointSpec:
+        """Return the entry point of an SCM tool without loading it.
+
+        Args:
+            name:
+                The name of the SCM tool.
+
+        Returns:
+            The entry point.
+
+        Raises:
+            KeyError:
+                No such SCM tool is registered.
+        """
+        return self._specs[name]
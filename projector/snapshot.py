@@ -0,0 +1,253 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Copy-on-write snapshots of development environments.
+
+A snapshot is a copy of the source directory. Files are reflinked where the filesystem supports
+it (e.g., btrfs and XFS), so that the copy shares its data with the original until either is
+modified. Otherwise, the object stores of repositories are hard linked, since Git never modifies
+objects in place, and every other file is copied.
+"""
+
+import errno
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+
+#: The names of the directories holding loose objects.
+LOOSE_OBJECT_DIR_RE = re.compile(r"[0-9a-f]{2}")
+
+#: The ``FICLONE`` ioctl, which reflinks a whole file on Linux.
+FICLONE = 0x40049409
+
+#: The errors that indicate reflinks are not supported between two files.
+REFLINK_UNSUPPORTED_ERRNOS = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EXDEV,
+}
+
+
+class SnapshotStats(NamedTuple):
+    """How the files of a snapshot were copied."""
+
+    #: The number of files that were reflinked.
+    reflinked: int = 0
+
+    #: The number of files that were hard linked.
+    hardlinked: int = 0
+
+    #: The number of files that were copied.
+    copied: int = 0
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    """Reflink a file.
+
+    Raises:
+        OSError:
+            The file could not be reflinked. The destination does not exist.
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported", str(src))
+
+    import fcntl
+
+    with src.open("rb") as src_file, dst.open("xb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            dst.unlink()
+            raise
+
+
+def _is_object(relative: Path) -> bool:
+    """Return whether or not a file is an object or pack of a repository.
+
+    Only loose objects (in ``objects/[0-9a-f]{2}``) and packs (in ``objects/pack``) are never
+    modified in place. Everything else in the object store, such as ``objects/info/alternates``,
+    may be rewritten and must be copied.
+    """
+    parts = relative.parts
+
+    if ".git" not in parts or len(parts) < 3 or parts[-3] != "objects":
+        return False
+
+    return parts.index(".git") < len(parts) - 3 and (
+        parts[-2] == "pack" or LOOSE_OBJECT_DIR_RE.fullmatch(parts[-2]) is not None
+    )
+
+
+class _Copier:
+    """A copier of directory trees, using the cheapest method the filesystem supports."""
+
+    def __init__(self):
+        """Initialize the copier."""
+        self.reflink = True
+        self.hardlink = True
+        self.stats = {"reflinked": 0, "hardlinked": 0, "copied": 0}
+
+    def copy_tree(self, src: Path, dst: Path, relative: Path = Path()) -> None:
+        """Copy a directory tree into an existing, empty directory."""
+        for entry in os.scandir(str(src)):
+            entry_src = src / entry.name
+            entry_dst = dst / entry.name
+            entry_relative = relative / entry.name
+
+            if entry.is_symlink():
+                os.symlink(os.readlink(str(entry_src)), str(entry_dst))
+            elif entry.is_dir():
+                entry_dst.mkdir()
+                self.copy_tree(entry_src, entry_dst, entry_relative)
+            else:
+                self.copy_file(entry_src, entry_dst, entry_relative)
+
+        shutil.copystat(str(src), str(dst))
+
+    def copy_file(self, src: Path, dst: Path, relative: Path) -> None:
+        """Copy a file."""
+        if self.reflink:
+            try:
+                _reflink(src, dst)
+            except OSError as e:
+                if e.errno not in REFLINK_UNSUPPORTED_ERRNOS:
+                    raise
+
+                # The rest of the tree is on the same filesystems, so don't try again.
+                self.reflink = False
+            else:
+                shutil.copystat(str(src), str(dst))
+                self.stats["reflinked"] += 1
+                return
+
+        if self.hardlink and _is_object(relative):
+            try:
+                os.link(str(src), str(dst))
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+
+                self.hardlink = False
+            else:
+                self.stats["hardlinked"] += 1
+                return
+
+        shutil.copy2(str(src), str(dst))
+        self.stats["copied"] += 1
+
+
+def copy_tree(src: Path, dst: Path) -> SnapshotStats:
+    """Copy a directory tree, sharing data with the original where possible.
+
+    Args:
+        src:
+            The directory to copy.
+
+        dst:
+            The path to copy the directory to. This must not exist.
+
+    Returns:
+        How the files were copied.
+
+    Raises:
+        OSError:
+            The directory could not be copied. The partial copy is removed.
+    """
+    copier = _Copier()
+    dst.mkdir(parents=True)
+
+    try:
+        copier.copy_tree(src, dst)
+    except BaseException:
+        shutil.rmtree(str(dst), ignore_errors=True)
+        raise
+
+    return SnapshotStats(**copier.stats)
+
+
+def create_snapshot(config: Dict[str, Any], snapshot: Path) -> SnapshotStats:
+    """Snapshot the source directory.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        snapshot:
+            The path to create the snapshot at. This must not exist.
+
+            The snapshot is itself a usable source directory, e.g., for a fork of the environment.
+
+    Returns:
+        How the files were copied.
+
+    Raises:
+        OSError:
+            The snapshot could not be created.
+    """
+    return copy_tree(config["directories"]["source"], snapshot)
+
+
+def restore_snapshot(
+    config: Dict[str, Any], snapshot: Path, *, source: Optional[Path] = None
+) -> SnapshotStats:
+    """Restore the source directory from a snapshot.
+
+    The snapshot is copied next to the source directory, which is then replaced, so the source
+    directory is left untouched if the copy fails. The snapshot can be restored again.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        snapshot:
+            The path to the snapshot.
+
+        source:
+            The directory to restore to. Defaults to the configured source directory.
+
+    Returns:
+        How the files were copied.
+
+    Raises:
+        OSError:
+            The snapshot could not be restored.
+    """
+    if source is None:
+        source = config["directories"]["source"]
+
+    restoring = source.with_name(f".{source.name}.restoring")
+    replaced = source.with_name(f".{source.name}.replaced")
+
+    for path in (restoring, replaced):
+        shutil.rmtree(str(path), ignore_errors=True)
+
+    stats = copy_tree(snapshot, restoring)
+
+    if source.exists():
+        os.rename(str(source), str(replaced))
+
+    os.rename(str(restoring), str(source))
+    shutil.rmtree(str(replaced), ignore_errors=True)
+
+    return stats
@@ -0,0 +1,217 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent index of the state of checked out repositories.
+
+The index records what was last learned about each repository, along with a fingerprint of its
+refs at the time. As long as the fingerprint and the repository's configuration are unchanged,
+the recorded state is still valid and does not need to be rediscovered.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+
+#: The name of the index file, which is kept in the source directory.
+STATE_INDEX_NAME = ".projector-state.sqlite3"
+
+#: The version of the index schema.
+#:
+#: Indices with a different version are discarded.
+STATE_INDEX_VERSION = 1
+
+
+class RepositoryState(NamedTuple):
+    """The recorded state of a repository."""
+
+    #: The name of the repository.
+    name: str
+
+    #: The fingerprint of the repository's refs when this state was recorded.
+    #:
+    #: See :py:meth:`ScmTool.fingerprint <projector.scm_tools.base.ScmTool.fingerprint>`.
+    fingerprint: Optional[str]
+
+    #: The configured ref when this state was recorded.
+    configured_ref: Optional[str]
+
+    #: The configured remote URLs, keyed by remote name, when this state was recorded.
+    remotes: Dict[str, str]
+
+    #: When the repository was last synchronized, in seconds since the epoch.
+    synced_at: Optional[float] = None
+
+    #: The commit ID of ``HEAD``.
+    head: Optional[str] = None
+
+    #: The checked out branch.
+    ref: Optional[str] = None
+
+    #: The number of commits ``HEAD`` was ahead of the configured ref on the default remote.
+    ahead: Optional[int] = None
+
+    #: The number of commits ``HEAD`` was behind the configured ref on the default remote.
+    behind: Optional[int] = None
+
+    @property
+    def has_status(self) -> bool:
+        """Whether or not the status of the repository was recorded."""
+        return self.head is not None
+
+    def is_valid(self, fingerprint: Optional[str], config: Dict[str, Any]) -> bool:
+        """Return whether or not this state still describes a repository.
+
+        Args:
+            fingerprint:
+                The current fingerprint of the repository's refs.
+
+            config:
+                The current repository configuration.
+
+        Returns:
+            Whether or not the state is valid.
+        """
+        if fingerprint is None or fingerprint != self.fingerprint:
+            return False
+
+        return self.configured_ref == config.get("ref") and self.remotes == remote_urls(config)
+
+
+def remote_urls(config: Dict[str, Any]) -> Dict[str, str]:
+    """Return the remote URLs of a repository configuration, keyed by remote name.
+
+    Args:
+        config:
+            The repository configuration.
+
+    Returns:
+        The remote URLs.
+    """
+    return {name: remote.url for name, remote in config.get("remotes", {}).items()}
+
+
+class StateIndex:
+    """A SQLite index of repository state."""
+
+    _COLUMNS = RepositoryState._fields
+
+    @classmethod
+    def for_source(cls, source: Path) -> "StateIndex":
+        """Open the index for a source directory.
+
+        The source directory will be created if it does not exist.
+
+        Args:
+            source:
+                The source directory.
+
+        Returns:
+            The index.
+        """
+        source.mkdir(parents=True, exist_ok=True)
+
+        return cls(source / STATE_INDEX_NAME)
+
+    def __init__(self, path: Path):
+        """Open the index, creating it if necessary.
+
+        Args:
+            path:
+                The path to the index.
+        """
+        self.path = path
+        self._db = sqlite3.connect(str(path))
+
+        with self._db:
+            (version,) = self._db.execute("PRAGMA user_version").fetchone()
+
+            if version != STATE_INDEX_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS repositories")
+                self._db.execute(f"PRAGMA user_version = {STATE_INDEX_VERSION}")
+
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS repositories ("
+                "  name TEXT PRIMARY KEY,"
+                "  fingerprint TEXT,"
+                "  configured_ref TEXT,"
+                "  remotes TEXT NOT NULL,"
+                "  synced_at REAL,"
+                "  head TEXT,"
+                "  ref TEXT,"
+                "  ahead INTEGER,"
+                "  behind INTEGER"
+                ")"
+            )
+
+    def close(self) -> None:
+        """Close the index."""
+        self._db.close()
+
+    def __enter__(self) -> "StateIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_all(self) -> Dict[str, RepositoryState]:
+        """Return the recorded state of every repository.
+
+        Returns:
+            A mapping of repository names to their recorded state.
+        """
+        rows = self._db.execute(f"SELECT {', '.join(self._COLUMNS)} FROM repositories")
+        states = {}
+
+        for row in rows:
+            state = RepositoryState(*row)
+            states[state.name] = state._replace(remotes=json.loads(state.remotes))
+
+        return states
+
+    def update(self, states: Iterable[RepositoryState]) -> None:
+        """Record the state of repositories, replacing what was previously recorded.
+
+        Args:
+            states:
+                The states to record.
+        """
+        placeholders = ", ".join("?" for column in self._COLUMNS)
+
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO repositories ({', '.join(self._COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                (state._replace(remotes=json.dumps(state.remotes)) for state in states),
+            )
+
+    def prune(self, names: Iterable[str]) -> None:
+        """Forget every repository that is not named.
+
+        Args:
+            names:
+                The names of the repositories to keep.
+        """
+        names = set(names)
+        recorded = [row[0] for row in self._db.execute("SELECT name FROM repositories")]
+
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM repositories WHERE name = ?",
+                ((name,) for name in recorded if name not in names),
+            )
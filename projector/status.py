@@ -0,0 +1,212 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Bulk status of configured repositories."""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Set
+
+from projector.scm_tools import get_scm_tools
+from projector.state import RepositoryState, StateIndex, remote_urls
+from projector.trace import span
+
+
+#: The default maximum number of repositories to query concurrently.
+DEFAULT_STATUS_JOBS = 16
+
+
+class RepositoryStatus(NamedTuple):
+    """The status of a repository."""
+
+    #: The name of the repository.
+    name: str
+
+    #: Whether or not the repository exists in the source directory.
+    present: bool
+
+    #: The ref the repository is configured to check out.
+    configured_ref: Optional[str] = None
+
+    #: The currently checked out branch, or ``None`` if ``HEAD`` is detached or the repository
+    #: is missing.
+    ref: Optional[str] = None
+
+    #: The commit ID of ``HEAD``.
+    head: Optional[str] = None
+
+    #: Whether or not there are uncommitted changes to tracked files.
+    dirty: Optional[bool] = None
+
+    #: The number of commits ``HEAD`` is ahead of the configured ref on the default remote.
+    #:
+    #: This is ``None`` if it could not be determined.
+    ahead: Optional[int] = None
+
+    #: The number of commits ``HEAD`` is behind the configured ref on the default remote.
+    #:
+    #: This is ``None`` if it could not be determined.
+    behind: Optional[int] = None
+
+    #: A description of the error that prevented the status from being determined, if any.
+    error: Optional[str] = None
+
+
+def scan_source(source: Path) -> Set[str]:
+    """Return the names of every directory in the source directory.
+
+    This is done in a single pass over the directory, rather than checking for each repository
+    individually.
+
+    Args:
+        source:
+            The source directory.
+
+    Returns:
+        The names of the directories. This is empty if the source directory does not exist.
+    """
+    try:
+        with os.scandir(str(source)) as entries:
+            return {entry.name for entry in entries if entry.is_dir()}
+    except FileNotFoundError:
+        return set()
+
+
+async def get_status_async(
+    config: Dict[str, Any], *, jobs: int = DEFAULT_STATUS_JOBS
+) -> Dict[str, RepositoryStatus]:
+    """Determine the status of every configured repository concurrently.
+
+    What is learned about each repository is recorded in the
+    :py:class:`~projector.state.StateIndex` of the source directory. While a repository's recorded
+    state is still valid, only its working tree has to be inspected.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        jobs:
+            The maximum number of repositories to query at once.
+
+    Returns:
+        A mapping of repository names to their status, in configuration order.
+
+    Raises:
+        ValueError:
+            ``jobs`` is not a positive number.
+    """
+    if jobs < 1:
+        raise ValueError(f"jobs must be positive; got {jobs}")
+
+    semaphore = asyncio.Semaphore(jobs)
+    scm_tools = get_scm_tools()
+    source = config["directories"]["source"]
+    present = scan_source(source)
+
+    if not present:
+        return {
+            name: RepositoryStatus(
+                name=name, present=False, configured_ref=repository["config"].get("ref")
+            )
+            for name, repository in config["repositories"].items()
+        }
+
+    with StateIndex.for_source(source) as index:
+        recorded = index.get_all()
+        updated = []
+
+        async def status_one(name: str, repository: Dict[str, Any]) -> RepositoryStatus:
+            path = source / name
+            repository_config = repository["config"]
+
+            # Names containing a path separator are not covered by the scan.
+            if name not in present and (os.sep not in name or not path.is_dir()):
+                return RepositoryStatus(
+                    name=name, present=False, configured_ref=repository_config.get("ref")
+                )
+
+            try:
+                scm = scm_tools[repository["scm"]]
+
+                # The fingerprint is taken before querying so that changes made while the query
+                # runs invalidate what is recorded.
+                fingerprint = scm.fingerprint(path)
+                previous = recorded.get(name)
+                state = previous
+
+                if state is not None and not state.is_valid(fingerprint, repository_config):
+                    state = None
+
+                async with semaphore:
+                    with span("status", "status", repository=name, scm=repository["scm"]):
+                        status = await scm.status(name, path, repository_config, state)
+            except Exception as e:
+                return RepositoryStatus(
+                    name=name,
+                    present=True,
+                    configured_ref=repository_config.get("ref"),
+                    error=str(e),
+                )
+
+            if fingerprint is None:
+                return status
+
+            updated.append(
+                RepositoryState(
+                    name=name,
+                    fingerprint=fingerprint,
+                    configured_ref=repository_config.get("ref"),
+                    remotes=remote_urls(repository_config),
+                    synced_at=previous.synced_at if previous is not None else None,
+                    head=status.head,
+                    ref=status.ref,
+                    ahead=status.ahead,
+                    behind=status.behind,
+                )
+            )
+
+            return status
+
+        names = list(config["repositories"])
+        statuses = await asyncio.gather(
+            *(status_one(name, config["repositories"][name]) for name in names)
+        )
+
+        index.update(updated)
+
+    return dict(zip(names, statuses))
+
+
+def get_status(
+    config: Dict[str, Any], *, jobs: int = DEFAULT_STATUS_JOBS
+) -> Dict[str, RepositoryStatus]:
+    """Determine the status of every configured repository concurrently.
+
+    This is a blocking wrapper around :py:func:`get_status_async`.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        jobs:
+            The maximum number of repositories to query at once.
+
+    Returns:
+        A mapping of repository names to their status, in configuration order.
+    """
+    return asyncio.run(get_status_async(config, jobs=jobs))
@@ -0,0 +1,271 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Concurrent synchronization of configured repositories."""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from projector.dependencies import DependencyError, critical_path_lengths, get_dependencies
+from projector.scheduler import HostLimit, Scheduler, repository_priority
+from projector.scm_tools import get_scm_tools
+from projector.state import RepositoryState, StateIndex, remote_urls
+from projector.trace import span
+
+
+#: The default maximum number of repositories to synchronize concurrently.
+DEFAULT_JOBS = 8
+
+
+class SyncContext:
+    """State shared by every repository synchronized in a single run."""
+
+    def __init__(
+        self, config: Dict[str, Any], *, jobs: int = DEFAULT_JOBS, local_jobs: Optional[int] = None
+    ):
+        """Initialize the context.
+
+        Args:
+            config:
+                The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+            jobs:
+                The maximum number of SCM operations that talk to remote hosts to run at once.
+
+            local_jobs:
+                The maximum number of SCM operations that only use local copies to run at once.
+                Defaults to the number of CPUs.
+        """
+        #: The configuration.
+        self.config = config
+
+        #: The validated directories section of the configuration.
+        self.directories: Dict[str, Any] = config["directories"]
+
+        #: The scheduler limiting the SCM operations that run at once.
+        #:
+        #: Operations are limited per host by the ``hosts`` section of the configuration.
+        self.scheduler = Scheduler(
+            jobs=jobs,
+            local_jobs=local_jobs,
+            host_limits={
+                host: HostLimit(**limits) for host, limits in config.get("hosts", {}).items()
+            },
+        )
+
+        #: State for each SCM tool, keyed by tool name.
+        #:
+        #: SCM tools may store anything they compute in :py:meth:`ScmTool.prepare
+        #: <projector.scm_tools.base.ScmTool.prepare>` here.
+        self.state: Dict[str, Any] = {}
+
+
+async def sync_repositories_async(
+    config: Dict[str, Any], *, jobs: int = DEFAULT_JOBS, max_age: Optional[float] = None
+) -> Dict[str, Exception]:
+    """Synchronize every configured repository concurrently.
+
+    Repositories that do not exist in the source directory are cloned and those that do are
+    fetched. A failure to synchronize one repository does not prevent the others from being
+    synchronized.
+
+    Synchronizations are scheduled by a :py:class:`~projector.scheduler.Scheduler` within the
+    limits of each host they talk to. Critical repositories and those with a working branch
+    checked out are synchronized first.
+
+    Repositories are only synchronized once the repositories they depend on have been, and fail
+    with a :py:class:`~projector.dependencies.DependencyError` if any of those failed.
+    Repositories that were skipped count as synchronized.
+
+    Each SCM tool is given the chance to :py:meth:`prepare
+    <projector.scm_tools.base.ScmTool.prepare>` for its repositories before any of them are
+    synchronized, and to :py:meth:`finish <projector.scm_tools.base.ScmTool.finish>` once all of
+    them have been.
+
+    When each repository is synchronized is recorded in the :py:class:`~projector.state.StateIndex`
+    of the source directory.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        jobs:
+            The maximum number of repositories to synchronize at once.
+
+        max_age:
+            If provided, repositories that were synchronized within this many seconds are
+            skipped, as long as their recorded state is still valid.
+
+    Returns:
+        A mapping of repository names to the errors that occurred while synchronizing them.
+
+        Repositories that synchronized successfully or were skipped are not present.
+
+    Raises:
+        ValueError:
+            ``jobs`` is not a positive number.
+    """
+    if jobs < 1:
+        raise ValueError(f"jobs must be positive; got {jobs}")
+
+    context = SyncContext(config, jobs=jobs)
+    scm_tools = get_scm_tools()
+    source = config["directories"]["source"]
+    errors: Dict[str, Exception] = {}
+
+    with StateIndex.for_source(source) as index:
+        recorded = index.get_all()
+        fresh_after = time.time() - max_age if max_age is not None else None
+
+        by_scm = defaultdict(dict)
+
+        for name, repository in config["repositories"].items():
+            scm_name = repository["scm"]
+
+            if scm_name not in scm_tools:
+                errors[name] = KeyError(f"Unknown SCM: `{scm_name}'")
+                continue
+
+            state = recorded.get(name)
+
+            if fresh_after is not None and state is not None and state.synced_at is not None:
+                fingerprint = scm_tools[scm_name].fingerprint(source / name)
+
+                if state.synced_at >= fresh_after and state.is_valid(
+                    fingerprint, repository["config"]
+                ):
+                    continue
+
+            by_scm[scm_name][name] = repository["config"]
+
+        async def prepare_one(scm_name: str) -> None:
+            with span("prepare", "sync", scm=scm_name):
+                await scm_tools[scm_name].prepare(context, by_scm[scm_name])
+
+        scm_names = list(by_scm)
+        prepare_results = await asyncio.gather(
+            *(prepare_one(scm_name) for scm_name in scm_names), return_exceptions=True
+        )
+
+        try:
+            for scm_name, result in zip(scm_names, prepare_results):
+                if isinstance(result, Exception):
+                    errors.update((name, result) for name in by_scm.pop(scm_name))
+
+            dependencies = get_dependencies(config["repositories"])
+            lengths = critical_path_lengths(dependencies)
+            failed = set(errors)
+            finished = {name: asyncio.Event() for name in config["repositories"]}
+
+            async def sync_one(
+                scm_name: str, name: str, repository_config: Dict[str, Any]
+            ) -> None:
+                try:
+                    for dependency in dependencies[name]:
+                        await finished[dependency].wait()
+
+                    failed_dependencies = [d for d in dependencies[name] if d in failed]
+
+                    if failed_dependencies:
+                        raise DependencyError(name, failed_dependencies)
+
+                    scm = scm_tools[scm_name]
+                    path = source / name
+
+                    async with context.scheduler.slot(
+                        hosts=scm.hosts(path, repository_config, context),
+                        priority=repository_priority(config["repositories"][name]),
+                    ):
+                        with span("sync", "sync", repository=name, scm=scm_name):
+                            await scm.sync(path, repository_config, context)
+                except Exception:
+                    failed.add(name)
+                    raise
+                finally:
+                    finished[name].set()
+
+            # Repositories with the longest chains of dependents are started first, since they
+            # are on the critical path.
+            work = sorted(
+                (
+                    (scm_name, name, repository_config)
+                    for scm_name, repositories in by_scm.items()
+                    for name, repository_config in repositories.items()
+                ),
+                key=lambda job: -lengths[job[1]],
+            )
+
+            for name in finished.keys() - {name for _, name, _ in work}:
+                finished[name].set()
+
+            results = await asyncio.gather(
+                *(sync_one(*job) for job in work), return_exceptions=True
+            )
+
+            synced = []
+
+            for (scm_name, name, repository_config), result in zip(work, results):
+                if isinstance(result, Exception):
+                    errors[name] = result
+                else:
+                    # Anything else that was recorded is stale now that the refs have changed.
+                    synced.append(
+                        RepositoryState(
+                            name=name,
+                            fingerprint=scm_tools[scm_name].fingerprint(source / name),
+                            configured_ref=repository_config.get("ref"),
+                            remotes=remote_urls(repository_config),
+                            synced_at=time.time(),
+                        )
+                    )
+
+            index.update(synced)
+            index.prune(config["repositories"])
+        finally:
+            # Tools must not raise here, but one that does should not hide the results.
+            await asyncio.gather(
+                *(scm_tools[scm_name].finish(context) for scm_name in scm_names),
+                return_exceptions=True,
+            )
+
+    return errors
+
+
+def sync_repositories(
+    config: Dict[str, Any], *, jobs: int = DEFAULT_JOBS, max_age: Optional[float] = None
+) -> Dict[str, Exception]:
+    """Synchronize every configured repository concurrently.
+
+    This is a blocking wrapper around :py:func:`sync_repositories_async`.
+
+    Args:
+        config:
+            The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+        jobs:
+            The maximum number of repositories to synchronize at once.
+
+        max_age:
+            If provided, repositories that were synchronized within this many seconds are
+            skipped, as long as their recorded state is still valid.
+
+    Returns:
+        A mapping of repository names to the errors that occurred while synchronizing them.
+    """
+    return asyncio.run(sync_repositories_async(config, jobs=jobs, max_age=max_age))
@@ -0,0 +1,270 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tracing of where time is spent.
+
+Code is instrumented with :py:func:`span`, which costs next to nothing unless tracing has been
+enabled with :py:func:`enable_tracing` or :py:func:`tracing`. Recorded spans can be exported as
+JSON or as a Chrome ``trace_event`` file, which can be viewed in ``chrome://tracing`` or
+Perfetto.
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, MutableMapping, NamedTuple, Optional
+
+
+class Span(NamedTuple):
+    """A recorded span."""
+
+    #: The name of the span.
+    name: str
+
+    #: The category of the span, such as ``config`` or ``git``.
+    category: str
+
+    #: When the span started, in nanoseconds since the tracer was enabled.
+    start: int
+
+    #: How long the span lasted, in nanoseconds.
+    duration: int
+
+    #: The thread or asyncio task the span ran in.
+    #:
+    #: Spans with the same track never overlap unless one is nested in the other.
+    track: int
+
+    #: Arguments describing the span, such as the repository it concerns.
+    args: Dict[str, Any]
+
+
+class Tracer:
+    """A collector of spans."""
+
+    def __init__(self):
+        """Initialize the tracer."""
+        #: The recorded spans, in the order they ended.
+        self.spans: List[Span] = []
+
+        self._origin = time.perf_counter_ns()
+        self._next_track = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Tracks are attached to the tasks and threads themselves, rather than keyed by their IDs,
+        # since IDs are reused once a task or thread is gone.
+        self._task_tracks: MutableMapping[Any, int] = weakref.WeakKeyDictionary()
+        self._thread_tracks = threading.local()
+
+    def _track(self) -> int:
+        """Return the track for the current asyncio task or thread."""
+        # No task can be running if asyncio has not been imported, and importing it is slow.
+        asyncio = sys.modules.get("asyncio")
+        task = None
+
+        if asyncio is not None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                pass
+
+        if task is None:
+            track = getattr(self._thread_tracks, "track", None)
+
+            if track is None:
+                with self._lock:
+                    track = self._thread_tracks.track = next(self._next_track)
+
+            return track
+
+        with self._lock:
+            track = self._task_tracks.get(task)
+
+            if track is None:
+                track = self._task_tracks[task] = next(self._next_track)
+
+            return track
+
+    @contextmanager
+    def span(self, name: str, category: str, args: Dict[str, Any]) -> Iterator[None]:
+        """Record a span around the body of a ``with`` statement.
+
+        Args:
+            name:
+                The name of the span.
+
+            category:
+                The category of the span.
+
+            args:
+                Arguments describing the span.
+        """
+        track = self._track()
+        start = time.perf_counter_ns()
+
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.spans.append(Span(name, category, start - self._origin, end - start, track, args))
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        """Return the spans as JSON-serializable data.
+
+        Returns:
+            A list of spans, with times in seconds.
+        """
+        return [
+            {
+                "name": span.name,
+                "category": span.category,
+                "start": span.start / 1e9,
+                "duration": span.duration / 1e9,
+                "track": span.track,
+                "args": span.args,
+            }
+            for span in self.spans
+        ]
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Return the spans in the Chrome ``trace_event`` format.
+
+        Each span is a complete (``X``) event. Each asyncio task or thread is shown as its own
+        thread.
+
+        Returns:
+            The trace, as JSON-serializable data.
+        """
+        pid = os.getpid()
+
+        return {
+            "displayTimeUnit": "ms",
+            "traceEvents": [
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start / 1000,
+                    "dur": span.duration / 1000,
+                    "pid": pid,
+                    "tid": span.track,
+                    "args": span.args,
+                }
+                for span in self.spans
+            ],
+        }
+
+    def write_json(self, path: Path) -> None:
+        """Write the spans to a JSON file.
+
+        Args:
+            path:
+                The path to write to.
+        """
+        path.write_text(json.dumps(self.to_json(), default=str))
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Write the spans to a Chrome ``trace_event`` file.
+
+        Args:
+            path:
+                The path to write to.
+        """
+        path.write_text(json.dumps(self.to_chrome_trace(), default=str))
+
+
+_tracer: Optional[Tracer] = None
+_disabled = nullcontext()
+
+
+def span(name: str, category: str = "projector", **args: Any) -> ContextManager[None]:
+    """Return a context manager that records a span if tracing is enabled.
+
+    Args:
+        name:
+            The name of the span.
+
+        category:
+            The category of the span.
+
+        **args:
+            Arguments describing the span. These should be JSON-serializable.
+
+    Returns:
+        The context manager.
+    """
+    if _tracer is None:
+        return _disabled
+
+    return _tracer.span(name, category, args)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the active tracer.
+
+    Returns:
+        The active tracer, or ``None`` if tracing is disabled.
+    """
+    return _tracer
+
+
+def enable_tracing(tracer: Optional[Tracer] = None) -> Tracer:
+    """Enable tracing.
+
+    Args:
+        tracer:
+            The tracer to record spans with. A new tracer is created if this is not provided.
+
+    Returns:
+        The active tracer.
+    """
+    global _tracer
+
+    _tracer = tracer if tracer is not None else Tracer()
+
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """Disable tracing."""
+    global _tracer
+
+    _tracer = None
+
+
+@contextmanager
+def tracing() -> Iterator[Tracer]:
+    """Enable tracing for the body of a ``with`` statement.
+
+    Yields:
+        The tracer recording spans. Tracing is restored to its previous state afterwards.
+    """
+    previous = _tracer
+
+    try:
+        yield enable_tracing()
+    finally:
+        if previous is None:
+            disable_tracing()
+        else:
+            enable_tracing(previous)
@@ -0,0 +1,139 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Utilities for repository URLs."""
+
+import hashlib
+import os
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+
+# Git treats ``[user@]host:path`` as an SSH URL as long as there is no slash before the colon.
+_SCP_LIKE_RE = re.compile(r"^(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+):(?P<path>.*)$")
+
+
+class ParsedUrl(NamedTuple):
+    """The parts of a repository URL that identify it."""
+
+    #: The URL scheme.
+    #:
+    #: SCP-like URLs have the ``ssh`` scheme and local paths have the ``file`` scheme.
+    scheme: str
+
+    #: The user, if any.
+    user: Optional[str]
+
+    #: The lower-cased host name, including a port if one was specified.
+    #:
+    #: This is ``None`` for local repositories.
+    host: Optional[str]
+
+    #: The path of the repository on the host.
+    path: str
+
+
+def parse_url(url: str) -> ParsedUrl:
+    """Parse a repository URL in any of the forms that Git accepts.
+
+    Args:
+        url:
+            The URL.
+
+    Returns:
+        The parsed URL.
+    """
+    if "://" not in url:
+        match = _SCP_LIKE_RE.match(url)
+
+        if match and not os.path.isabs(url):
+            return ParsedUrl(
+                "ssh", match.group("user"), match.group("host").lower(), match.group("path")
+            )
+
+        return ParsedUrl("file", None, None, os.path.abspath(url))
+
+    parts = urlsplit(url)
+
+    if parts.scheme == "file":
+        return ParsedUrl("file", None, None, parts.path)
+
+    host = (parts.hostname or "").lower()
+
+    if parts.port is not None:
+        host = f"{host}:{parts.port}"
+
+    return ParsedUrl(parts.scheme, parts.username, host or None, parts.path)
+
+
+def url_host(url: str) -> Optional[str]:
+    """Return the host of a repository URL.
+
+    Args:
+        url:
+            The URL.
+
+    Returns:
+        The lower-cased host name, or ``None`` for local repositories.
+    """
+    return parse_url(url).host
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a repository URL.
+
+    URLs that refer to the same repository over different transports (e.g.,
+    ``git@example.com:foo.git`` and ``https://example.com/foo``) normalize to the same value.
+
+    Args:
+        url:
+            The URL.
+
+    Returns:
+        The normalized URL. This is not itself a valid URL.
+    """
+    parsed = parse_url(url)
+    path = parsed.path.rstrip("/")
+
+    if path.endswith(".git"):
+        path = path[: -len(".git")]
+
+    if parsed.host is None:
+        return f"file:{path}"
+
+    return f"{parsed.host}/{path.lstrip('/')}"
+
+
+def url_slug(url: str) -> str:
+    """Return a filesystem-safe name that uniquely identifies a repository URL.
+
+    The name is derived from the :py:func:`normalized <normalize_url>` URL, so equivalent URLs
+    share a name.
+
+    Args:
+        url:
+            The URL.
+
+    Returns:
+        The name.
+    """
+    normalized = normalize_url(url)
+    digest = hashlib.sha256(normalized.encode()).hexdigest()[:16]
+    basename = re.sub(r"[^A-Za-z0-9._-]", "_", normalized.rsplit("/", 1)[-1]) or "repo"
+
+    return f"{basename}-{digest}"
@@ -0,0 +1,466 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Watching repositories for changes with Linux's inotify API."""
+
+import asyncio
+import ctypes
+import os
+import struct
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from projector.scm_tools import get_scm_tools
+from projector.status import DEFAULT_STATUS_JOBS, RepositoryStatus, get_status_async
+
+
+#: The default number of seconds to wait for a burst of changes to settle before refreshing.
+DEFAULT_WATCH_DELAY = 0.1
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+#: The events that are watched for.
+#:
+#: Git replaces files by renaming a lock file into place, so modifications within a file are not
+#: interesting.
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@lru_cache(maxsize=None)
+def _get_libc() -> Optional[ctypes.CDLL]:
+    """Return the C library if it provides inotify."""
+    if not sys.platform.startswith("linux"):
+        return None
+
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    if not hasattr(libc, "inotify_init1"):
+        return None
+
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_init1.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_add_watch.restype = ctypes.c_int
+
+    return libc
+
+
+def _errno_error(path: Optional[Path] = None) -> OSError:
+    """Return an error for the current value of errno."""
+    err = ctypes.get_errno()
+
+    if path is None:
+        return OSError(err, os.strerror(err))
+
+    return OSError(err, os.strerror(err), str(path))
+
+
+def is_supported() -> bool:
+    """Return whether or not inotify is available.
+
+    Returns:
+        Whether or not inotify is available.
+    """
+    return _get_libc() is not None
+
+
+class InotifyEvent(NamedTuple):
+    """An event read from an inotify instance."""
+
+    #: The watch descriptor the event occurred on.
+    wd: int
+
+    #: The mask describing the event.
+    mask: int
+
+    #: The cookie associating the two halves of a rename.
+    cookie: int
+
+    #: The name of the file in the watched directory that the event occurred on.
+    #:
+    #: This is empty for events on the watched directory itself.
+    name: str
+
+
+class Inotify:
+    """A non-blocking inotify instance."""
+
+    def __init__(self):
+        """Create the instance.
+
+        Raises:
+            OSError:
+                inotify is not supported or the instance could not be created.
+        """
+        libc = _get_libc()
+
+        if libc is None:
+            raise OSError("inotify is not supported on this platform")
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if fd < 0:
+            raise _errno_error()
+
+        #: The file descriptor of the instance.
+        self.fd = fd
+
+    def fileno(self) -> int:
+        """Return the file descriptor of the instance.
+
+        Returns:
+            The file descriptor.
+        """
+        return self.fd
+
+    def add_watch(self, path: Path, mask: int = WATCH_MASK) -> int:
+        """Watch a path.
+
+        Watching a path that is already watched replaces the mask of the existing watch.
+
+        Args:
+            path:
+                The path to watch.
+
+            mask:
+                The events to watch for.
+
+        Returns:
+            The watch descriptor.
+
+        Raises:
+            OSError:
+                The path could not be watched. If too many paths are watched, the error will be
+                ``ENOSPC`` and the ``fs.inotify.max_user_watches`` sysctl must be raised.
+        """
+        wd = _get_libc().inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+
+        if wd < 0:
+            raise _errno_error(path)
+
+        return wd
+
+    def read_events(self) -> List[InotifyEvent]:
+        """Read every pending event without blocking.
+
+        Returns:
+            The events.
+        """
+        events = []
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                start = offset + _EVENT_HEADER.size
+                offset = start + length
+                name = os.fsdecode(data[start:offset].rstrip(b"\0"))
+
+                events.append(InotifyEvent(wd, mask, cookie, name))
+
+        return events
+
+    def close(self) -> None:
+        """Close the instance, removing every watch."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _Watch(NamedTuple):
+    """A watched directory."""
+
+    #: The name of the repository the directory belongs to.
+    #:
+    #: This is ``None`` for the source directory.
+    name: Optional[str]
+
+    #: The watched directory.
+    path: Path
+
+    #: Whether or not the directory is the working tree of the repository.
+    worktree: bool = False
+
+    #: Whether or not subdirectories are watched too.
+    recursive: bool = False
+
+
+class RepositoryWatcher:
+    """Keeps the status of every configured repository current by watching for changes.
+
+    Each repository is watched through the directories returned by its SCM tool's
+    :py:meth:`~projector.scm_tools.base.ScmTool.watch_directories`. When any of them change, the
+    repository's status is refreshed and recorded in the
+    :py:class:`~projector.state.StateIndex`, so that :py:attr:`statuses` can be read at any time
+    without touching the repositories.
+
+    Changes that only affect the working tree, such as editing a tracked file, are not noticed
+    until they are staged.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        *,
+        jobs: int = DEFAULT_STATUS_JOBS,
+        delay: float = DEFAULT_WATCH_DELAY,
+        on_change: Optional[Callable[[RepositoryStatus], None]] = None,
+    ):
+        """Initialize the watcher.
+
+        Args:
+            config:
+                The configuration, as loaded by :py:class:`~projector.config.ConfigSchema`.
+
+            jobs:
+                The maximum number of repositories to query at once.
+
+            delay:
+                The number of seconds to wait for a burst of changes to settle before refreshing.
+
+            on_change:
+                A function to call with the status of a repository whenever it changes,
+                including when it is first determined.
+        """
+        #: The configuration.
+        self.config = config
+
+        #: The most recently determined status of every configured repository.
+        #:
+        #: This is empty until the watcher has been :py:meth:`started <start>`.
+        self.statuses: Dict[str, RepositoryStatus] = {}
+
+        self._jobs = jobs
+        self._delay = delay
+        self._on_change = on_change
+        self._source: Path = config["directories"]["source"]
+        self._inotify: Optional[Inotify] = None
+        self._watches: Dict[int, _Watch] = {}
+
+        # The repositories affected by changes to each entry of the source directory.
+        self._by_entry: Dict[str, List[str]] = {}
+
+        for name in config["repositories"]:
+            self._by_entry.setdefault(Path(name).parts[0], []).append(name)
+
+    async def start(self) -> None:
+        """Start watching the repositories and determine their initial status.
+
+        Raises:
+            OSError:
+                inotify is not supported or the repositories could not be watched.
+        """
+        self._inotify = Inotify()
+
+        self._source.mkdir(parents=True, exist_ok=True)
+        self._add_watch(_Watch(None, self._source))
+
+        for name in self.config["repositories"]:
+            self._watch_repository(name)
+
+        await self.refresh()
+
+    async def run(self) -> None:
+        """Refresh repositories as they change until cancelled.
+
+        The watcher will be :py:meth:`started <start>` if it has not been already.
+
+        Raises:
+            OSError:
+                inotify is not supported or the repositories could not be watched.
+        """
+        if self._inotify is None:
+            await self.start()
+
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fd = self._inotify.fileno()
+
+        loop.add_reader(fd, readable.set)
+
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+
+                changed = self._read_changes()
+
+                # A single operation, like a fetch, may change many files.
+                await asyncio.sleep(self._delay)
+                changed.update(self._read_changes())
+
+                if changed:
+                    await self.refresh(changed)
+        finally:
+            loop.remove_reader(fd)
+
+    async def refresh(self, names: Optional[Iterable[str]] = None) -> None:
+        """Refresh the status of repositories.
+
+        Args:
+            names:
+                The names of the repositories to refresh. Defaults to every repository.
+        """
+        repositories = self.config["repositories"]
+
+        if names is not None:
+            names = set(names)
+            repositories = {name: repositories[name] for name in repositories if name in names}
+
+        statuses = await get_status_async(
+            {**self.config, "repositories": repositories}, jobs=self._jobs
+        )
+
+        for name, status in statuses.items():
+            changed = self.statuses.get(name) != status
+            self.statuses[name] = status
+
+            if changed and self._on_change is not None:
+                self._on_change(status)
+
+    def close(self) -> None:
+        """Stop watching the repositories."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._watches.clear()
+
+    def __enter__(self) -> "RepositoryWatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _add_watch(self, watch: _Watch) -> None:
+        """Watch a directory, and its subdirectories if the watch is recursive.
+
+        Directories that do not exist are ignored, since the creation of any that matter will be
+        seen by the watch on their parent.
+        """
+        try:
+            wd = self._inotify.add_watch(watch.path)
+        except (FileNotFoundError, NotADirectoryError):
+            return
+
+        self._watches[wd] = watch
+
+        if watch.recursive:
+            try:
+                with os.scandir(str(watch.path)) as entries:
+                    subdirectories = [
+                        entry.name for entry in entries if entry.is_dir(follow_symlinks=False)
+                    ]
+            except FileNotFoundError:
+                return
+
+            for subdirectory in subdirectories:
+                self._add_watch(watch._replace(path=watch.path / subdirectory))
+
+    def _watch_repository(self, name: str) -> None:
+        """Watch every directory of a repository that exists.
+
+        Directories that are already watched keep their watch descriptors, so this can be called
+        whenever new directories may have appeared.
+        """
+        scm = get_scm_tools().get(self.config["repositories"][name]["scm"])
+
+        if scm is None:
+            return
+
+        path = self._source / name
+        directories = scm.watch_directories(path)
+
+        if directories:
+            self._add_watch(_Watch(name, path, worktree=True))
+
+        for directory, recursive in directories:
+            self._add_watch(_Watch(name, directory, recursive=recursive))
+
+    def _read_changes(self) -> Set[str]:
+        """Read pending events and return the names of the repositories they affect."""
+        changed = set()
+
+        for event in self._inotify.read_events():
+            if event.mask & IN_Q_OVERFLOW:
+                # Events were lost, so anything may have changed.
+                for name in self.config["repositories"]:
+                    self._watch_repository(name)
+
+                changed.update(self.config["repositories"])
+                continue
+
+            watch = self._watches.get(event.wd)
+
+            if watch is None:
+                continue
+
+            if event.mask & IN_IGNORED:
+                del self._watches[event.wd]
+            elif watch.name is None:
+                for name in self._by_entry.get(event.name, ()):
+                    self._watch_repository(name)
+                    changed.add(name)
+            elif watch.worktree:
+                if event.name and any(
+                    directory.parent == watch.path and directory.name == event.name
+                    for directory, recursive in self._watch_directories(watch.name)
+                ):
+                    self._watch_repository(watch.name)
+                    changed.add(watch.name)
+            elif not event.name.endswith(".lock"):
+                if event.mask & IN_ISDIR and event.mask & (IN_CREATE | IN_MOVED_TO):
+                    if watch.recursive:
+                        self._add_watch(watch._replace(path=watch.path / event.name))
+                    else:
+                        self._watch_repository(watch.name)
+
+                changed.add(watch.name)
+
+        return changed
+
+    def _watch_directories(self, name: str) -> List[Tuple[Path, bool]]:
+        """Return the directories watched for a repository."""
+        scm = get_scm_tools()[self.config["repositories"][name]["scm"]]
+
+        return scm.watch_directories(self._source / name)
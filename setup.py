@@ -47,8 +47,15 @@ setup(
         "License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)",
         "Programming Language :: Python :: 3.7",
     ],
-    install_requires=["marshmallow == 3.0.0b16", "more-itertools >= 4.3.0, < 4.4"],
-    entry_points={"projector.scm_tools": ["Git = projector.scm_tools.git.Git"]},
+    install_requires=[
+        "importlib-metadata >= 0.7; python_version < '3.8'",
+        "marshmallow == 3.0.0b16",
+        "more-itertools >= 4.3.0, < 4.4",
+    ],
+    entry_points={
+        "console_scripts": ["projector = projector.cli:main"],
+        "projector.scm_tools": ["Git = projector.scm_tools.git:Git"],
+    },
     project_urls={
         "Source": "https://github.com/brennie/projector",
         "Issues": "https://github.com/brennie/projector/issues",
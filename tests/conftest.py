@@ -0,0 +1,69 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Shared test fixtures."""
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+def _git(*args, cwd):
+    return subprocess.run(
+        ["git", "-c", "user.name=Projector", "-c", "user.email=projector@example.com", *args],
+        cwd=str(cwd),
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout.decode()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmpdir, monkeypatch):
+    """Isolate Projector's cache directory for each test."""
+    path = Path(str(tmpdir)) / "cache"
+    monkeypatch.setenv("PROJECTOR_CACHE_DIR", str(path))
+    monkeypatch.delenv("PROJECTOR_NO_CACHE", raising=False)
+
+    return path
+
+
+@pytest.fixture
+def git():
+    """Return a function that runs Git synchronously and returns its output."""
+    return _git
+
+
+@pytest.fixture
+def make_upstream(tmpdir):
+    """Return a factory for upstream Git repositories with a single commit on master."""
+    root = Path(str(tmpdir)) / "upstream"
+
+    def make_upstream(name):
+        path = root / name
+        path.mkdir(parents=True)
+
+        _git("init", "--quiet", cwd=path)
+        _git("symbolic-ref", "HEAD", "refs/heads/master", cwd=path)
+        (path / "README").write_text(f"{name}\n")
+        _git("add", "README", cwd=path)
+        _git("commit", "--quiet", "-m", "Initial commit", cwd=path)
+
+        return path
+
+    return make_upstream
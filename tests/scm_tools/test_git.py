@@ -17,10 +17,18 @@
 
 """Tests for projector.scm_tools.git."""
 
+import asyncio
+import pickle
+from pathlib import Path
+
 import pytest
 from marshmallow import ValidationError
 
-from projector.scm_tools.git import GitRepositorySchema, Remote, RemoteKind
+from projector.scm_tools.base import Operation, OperationResult
+from projector.scm_tools.git import Git, GitRepositorySchema, Remote, RemoteKind
+from projector.scm_tools.git_fetch import FetchPlan, FetchSource
+from projector.sync import SyncContext
+from projector.urls import normalize_url
 
 
 def test_git_repository_schema():
@@ -31,8 +39,7 @@ def test_git_repository_schema():
         "detach": False,
         "remotes": {
             "origin": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "https://example.com/foo.git", "default": True},
+                kind=RemoteKind.EXPLICIT, url="https://example.com/foo.git", default=True
             )
         },
     }
@@ -49,12 +56,10 @@ def test_git_repository_schema():
         "detach": False,
         "remotes": {
             "origin": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "https://example.com/foo.git", "default": True},
+                kind=RemoteKind.EXPLICIT, url="https://example.com/foo.git", default=True
             ),
             "fork": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "http://example.com/bar.git", "default": False},
+                kind=RemoteKind.EXPLICIT, url="http://example.com/bar.git", default=False
             ),
         },
     }
@@ -64,8 +69,7 @@ def test_git_repository_schema():
         "detach": False,
         "remotes": {
             "my-remote": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "https://example.com/bar.git", "default": True},
+                kind=RemoteKind.EXPLICIT, url="https://example.com/bar.git", default=True
             )
         },
     }
@@ -82,12 +86,10 @@ def test_git_repository_schema():
         "detach": False,
         "remotes": {
             "origin": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "https://example.com/foo.git", "default": False},
+                kind=RemoteKind.EXPLICIT, url="https://example.com/foo.git", default=False
             ),
             "fork": Remote(
-                kind=RemoteKind.EXPLICIT,
-                inner={"url": "http://example.com/bar.git", "default": True},
+                kind=RemoteKind.EXPLICIT, url="http://example.com/bar.git", default=True
             ),
         },
     }
@@ -102,9 +104,7 @@ def test_git_repository_schema():
         "ref": "release-1.x",
         "detach": True,
         "remotes": {
-            "origin": Remote(
-                kind=RemoteKind.EXPLICIT, inner={"url": "git@example.com:foo.git", "default": True}
-            )
+            "origin": Remote(kind=RemoteKind.EXPLICIT, url="git@example.com:foo.git", default=True)
         },
     }
 
@@ -115,9 +115,9 @@ def test_git_repository_schema():
         "detach": False,
         "remotes": {
             "origin": Remote(
-                kind=RemoteKind.IMPLICIT, inner="git@example.com:foo.git", _default=True
+                kind=RemoteKind.IMPLICIT, url="git@example.com:foo.git", default=True
             ),
-            "fork": Remote(kind=RemoteKind.IMPLICIT, inner="git@example.com:fork.git"),
+            "fork": Remote(kind=RemoteKind.IMPLICIT, url="git@example.com:fork.git"),
         },
     }
 
@@ -158,3 +158,141 @@ def test_git_repository_schema():
     assert excinfo.value.messages == {
         "remotes": {"origin": {"value": {"url": ["Missing data for required field."]}}}
     }
+
+
+def test_git_repository_schema_round_trip():
+    """Testing GitRepositorySchema dumps remotes in their original form"""
+    schema = GitRepositorySchema()
+
+    data = schema.load(
+        {
+            "remotes": {
+                "origin": "git@example.com:foo.git",
+                "fork": {"url": "git@example.com:fork.git"},
+                "upstream": {"url": "git@example.com:upstream.git", "default": False},
+            }
+        }
+    )
+
+    assert data["remotes"]["origin"].default
+    assert pickle.loads(pickle.dumps(data)) == data
+
+    assert schema.dump(data) == {
+        "ref": "master",
+        "detach": False,
+        "remotes": {
+            "origin": "git@example.com:foo.git",
+            "fork": {"url": "git@example.com:fork.git", "default": False},
+            "upstream": {"url": "git@example.com:upstream.git", "default": False},
+        },
+    }
+
+
+def test_remote_slots():
+    """Testing projector.scm_tools.git.Remote does not have a __dict__"""
+    remote = Remote(kind=RemoteKind.EXPLICIT, url="git@example.com:foo.git")
+
+    assert not hasattr(remote, "__dict__")
+    assert remote.inner == {"url": "git@example.com:foo.git", "default": False}
+
+    remote.default = True
+    assert remote.inner == {"url": "git@example.com:foo.git", "default": True}
+
+
+def test_git_repository_schema_clone_options():
+    """Testing GitRepositorySchema with options limiting what is cloned"""
+    schema = GitRepositorySchema()
+    raw = {
+        "remotes": {"origin": "git@example.com:foo.git"},
+        "depth": 1,
+        "filter": "blob:none",
+        "single_branch": True,
+    }
+
+    data = schema.load(raw)
+    assert data == {
+        "ref": "master",
+        "detach": False,
+        "remotes": {
+            "origin": Remote(kind=RemoteKind.IMPLICIT, url="git@example.com:foo.git", default=True)
+        },
+        "depth": 1,
+        "filter": "blob:none",
+        "single_branch": True,
+    }
+    assert schema.dump(data) == {"ref": "master", "detach": False, **raw}
+
+    with pytest.raises(ValidationError) as excinfo:
+        schema.load({"remotes": {"origin": "git@example.com:foo.git"}, "depth": 0})
+    assert excinfo.value.messages == {"depth": ["Must be at least 1."]}
+
+    with pytest.raises(ValidationError) as excinfo:
+        schema.load({"remotes": {"origin": "git@example.com:foo.git"}, "filter": "blob:limit=1k"})
+    assert excinfo.value.messages == {"filter": ["Not a valid choice."]}
+
+
+def test_git_operations(tmpdir, git, make_upstream):
+    """Testing projector.scm_tools.git.Git clone, fetch and checkout"""
+    root = Path(str(tmpdir))
+    upstream = make_upstream("foo")
+    path = root / "src" / "foo"
+    config = GitRepositorySchema().load({"remotes": {"origin": upstream.as_uri()}})
+    initial = git("rev-parse", "HEAD", cwd=upstream).strip()
+
+    async def main():
+        context = SyncContext({"directories": {"source": root / "src"}, "repositories": {}})
+        results = [await Git.clone(path, config, context), await Git.fetch(path, config, context)]
+
+        git("commit", "--quiet", "--allow-empty", "-m", "Upstream", cwd=upstream)
+        results.append(await Git.sync(path, config, context))
+        results.append(await Git.checkout(path, {**config, "detach": True}, "origin/master"))
+        results.append(await Git.checkout(path, config, "master"))
+
+        return results
+
+    clone, fetch, changed_fetch, detached, attached = asyncio.run(main())
+    latest = git("rev-parse", "HEAD", cwd=upstream).strip()
+
+    assert clone == OperationResult(Operation.CLONE, path, changed=True, head=initial)
+    assert fetch == OperationResult(Operation.FETCH, path, changed=False)
+    assert changed_fetch == OperationResult(Operation.FETCH, path, changed=True)
+    assert detached == OperationResult(Operation.CHECKOUT, path, changed=True, head=latest)
+    assert attached == OperationResult(Operation.CHECKOUT, path, changed=True, head=initial)
+    assert git("symbolic-ref", "--short", "HEAD", cwd=path).strip() == "master"
+
+
+def test_git_hosts(tmpdir):
+    """Testing projector.scm_tools.git.Git.hosts"""
+
+    source = Path(str(tmpdir))
+    config = GitRepositorySchema().load(
+        {
+            "remotes": {
+                "origin": {"url": "https://Example.com/foo.git", "default": True},
+                "mirror": "git@mirror.example:foo.git",
+                "local": "/srv/git/foo.git",
+            }
+        }
+    )
+
+    async def main():
+        context = SyncContext({"directories": {"source": source}})
+
+        assert Git.hosts(source / "foo", config, context) == {"example.com", "mirror.example"}
+
+        plan = FetchPlan()
+        context.state["Git"] = {"fetch_plan": plan}
+        plan.sources[normalize_url("https://example.com/foo.git")] = FetchSource(
+            source / "bar", "refs/remotes/origin/"
+        )
+
+        # The default remote can only be cloned from a copy with every branch.
+        assert Git.hosts(source / "foo", config, context) == {"example.com", "mirror.example"}
+
+        (source / "foo").mkdir()
+        assert Git.hosts(source / "foo", config, context) == {"mirror.example"}
+
+        plan.fetched.add((source / "foo", "mirror"))
+        assert Git.hosts(source / "foo", config, context) == set()
+
+    asyncio.run(main())
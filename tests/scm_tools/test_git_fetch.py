@@ -0,0 +1,202 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scm_tools.git_fetch."""
+
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git, GitRepositorySchema, run_git
+from projector.scm_tools.git_fetch import FetchSource, index_remote_urls, is_complete_copy
+from projector.sync import sync_repositories
+from projector.urls import normalize_url
+
+
+def test_index_remote_urls():
+    """Testing projector.scm_tools.git_fetch.index_remote_urls"""
+    schema = GitRepositorySchema()
+
+    repositories = {
+        "upstream": schema.load({"remotes": {"origin": "https://example.com/project.git"}}),
+        "fork": schema.load(
+            {
+                "remotes": {
+                    "origin": "git@example.com:me/project.git",
+                    "upstream": "git@example.com:project",
+                }
+            }
+        ),
+    }
+
+    assert index_remote_urls(repositories) == {
+        "example.com/project": [("upstream", "origin"), ("fork", "upstream")],
+        "example.com/me/project": [("fork", "origin")],
+    }
+
+
+def test_fetch_source_refspec():
+    """Testing projector.scm_tools.git_fetch.FetchSource.refspec"""
+    store = FetchSource(Path("/objects/project.git"), "refs/heads/")
+    working = FetchSource(Path("/src/project"), "refs/remotes/origin/")
+
+    assert store.refspec("upstream") == "+refs/heads/*:refs/remotes/upstream/*"
+    assert (
+        working.refspec("upstream", "dev") == "+refs/remotes/origin/dev:refs/remotes/upstream/dev"
+    )
+
+
+def _network_fetches(calls, config, source):
+    """Return the normalized URLs fetched from the network by the given run_git calls."""
+    urls = []
+
+    for call in calls:
+        args = call.args
+
+        if args[0] != "fetch" or any(arg.startswith("/") for arg in args):
+            continue
+
+        cwd = Path(call.kwargs["cwd"])
+        if "--multiple" in args:
+            start = args.index("--multiple") + 1
+            remote_names = args[start:]
+        else:
+            remote_names = args[-1:]
+
+        if cwd.parent == source:
+            remotes = config["repositories"][cwd.name]["config"]["remotes"]
+            urls.extend(normalize_url(remotes[remote_name].url) for remote_name in remote_names)
+        else:
+            urls.append(str(cwd))
+
+    return urls
+
+
+@pytest.mark.parametrize("use_objects", [False, True])
+def test_sync_fetches_shared_urls_once(tmpdir, git, make_upstream, use_objects):
+    """Testing projector.sync.sync_repositories fetches each shared URL once"""
+    root = Path(str(tmpdir))
+    source = root / "src"
+    upstream = make_upstream("project")
+    fork = make_upstream("fork")
+
+    directories = {"source": str(source)}
+
+    if use_objects:
+        directories["objects"] = str(root / "objects")
+
+    config = ConfigSchema().load(
+        {
+            "directories": directories,
+            "repositories": {
+                "a": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+                "b": {
+                    "scm": "Git",
+                    "config": {
+                        "remotes": {"origin": fork.as_uri(), "upstream": upstream.as_uri()}
+                    },
+                },
+                "c": {
+                    "scm": "Git",
+                    "config": {
+                        "single_branch": True,
+                        "remotes": {"upstream": {"url": str(upstream), "default": True}},
+                    },
+                },
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+
+            git("commit", "--quiet", "--allow-empty", "-m", "Upstream", cwd=upstream)
+            git("branch", "dev", cwd=upstream)
+
+            with spy_on(run_git) as run_git_spy:
+                assert sync_repositories(config) == {}
+                network_fetches = _network_fetches(run_git_spy.calls, config, source)
+    finally:
+        get_scm_tools.cache_clear()
+
+    upstream_url = normalize_url(upstream.as_uri())
+
+    if use_objects:
+        assert upstream_url not in network_fetches
+    else:
+        assert network_fetches.count(upstream_url) == 1
+
+    assert network_fetches.count(normalize_url(fork.as_uri())) == 1
+
+    head = git("rev-parse", "HEAD", cwd=upstream)
+
+    for name, remote_name in (("a", "origin"), ("b", "upstream"), ("c", "upstream")):
+        assert git("rev-parse", f"{remote_name}/master", cwd=source / name) == head
+
+    assert git("branch", "--remotes", "--list", "*/dev", cwd=source / "a").strip() == "origin/dev"
+    assert git("branch", "--remotes", "--list", "*/dev", cwd=source / "c").strip() == ""
+
+
+def test_sync_shared_url_shallow_first(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories never shares a URL from a shallow clone"""
+    source = Path(str(tmpdir)) / "src"
+    upstream = make_upstream("project")
+    git("commit", "--quiet", "--allow-empty", "-m", "Second commit", cwd=upstream)
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(source)},
+            "repositories": {
+                "shallow": {
+                    "scm": "Git",
+                    "config": {"depth": 1, "remotes": {"origin": upstream.as_uri()}},
+                },
+                "full": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+            assert git("rev-parse", "--is-shallow-repository", cwd=source / "shallow") == "true\n"
+
+            git("commit", "--quiet", "--allow-empty", "-m", "Upstream", cwd=upstream)
+
+            assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    head = git("rev-parse", "HEAD", cwd=upstream)
+
+    for name in ("shallow", "full"):
+        assert git("rev-parse", "origin/master", cwd=source / name) == head
+
+
+def test_is_complete_copy():
+    """Testing projector.scm_tools.git_fetch.is_complete_copy"""
+    remotes = {"origin": "https://example.com/foo.git"}
+
+    assert is_complete_copy(GitRepositorySchema().load({"remotes": remotes}), "origin")
+
+    for options in ({"depth": 1}, {"filter": "blob:none"}, {"single_branch": True}):
+        config = GitRepositorySchema().load({"remotes": remotes, **options})
+        assert not is_complete_copy(config, "origin")
@@ -0,0 +1,234 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scm_tools.git_ssh."""
+
+import asyncio
+import os
+import shlex
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git
+from projector.scm_tools.git_ssh import SshConnectionPool, get_ssh_command, ssh_host
+from projector.sync import sync_repositories
+
+
+#: A stand-in for ssh that logs its arguments and runs the remote command locally.
+FAKE_SSH = """#!/bin/sh
+echo "$@" >> "$FAKE_SSH_LOG"
+for command; do :; done
+exec sh -c "$command"
+"""
+
+
+def test_ssh_host():
+    """Testing projector.scm_tools.git_ssh.ssh_host"""
+    assert ssh_host("git@Example.com:foo/bar.git") == "example.com"
+    assert ssh_host("ssh://git@example.com:2222/foo/bar.git") == "example.com:2222"
+    assert ssh_host("git+ssh://example.com/foo/bar.git") == "example.com"
+    assert ssh_host("https://example.com/foo/bar.git") is None
+    assert ssh_host("/srv/git/foo.git") is None
+
+
+def test_pool_env():
+    """Testing projector.scm_tools.git_ssh.SshConnectionPool.env"""
+    pool = SshConnectionPool(ssh_command="ssh -i key", persist=30)
+
+    try:
+        args = shlex.split(pool.env["GIT_SSH_COMMAND"])
+
+        assert args[:3] == ["ssh", "-i", "key"]
+        assert "ControlMaster=auto" in args
+        assert "ControlPersist=30" in args
+        assert f"ControlPath={pool.control_dir / '%C'}" in args
+    finally:
+        asyncio.run(pool.close())
+
+    assert not pool.control_dir.exists()
+
+    with pytest.raises(ValueError):
+        SshConnectionPool(max_sessions=0)
+
+
+def test_pool_session_limits():
+    """Testing projector.scm_tools.git_ssh.SshConnectionPool.session limits sessions per host"""
+    pool = SshConnectionPool(max_sessions=2)
+    running = {}
+    max_running = {}
+
+    async def session(urls):
+        async with pool.session(urls) as env:
+            hosts = {ssh_host(url) for url in urls} - {None}
+
+            for host in hosts:
+                running[host] = running.get(host, 0) + 1
+                max_running[host] = max(max_running.get(host, 0), running[host])
+
+            await asyncio.sleep(0.01)
+
+            for host in hosts:
+                running[host] -= 1
+
+            return env
+
+    async def main():
+        return await asyncio.gather(
+            *(session([f"git@a.example.com:{i}.git"]) for i in range(5)),
+            *(session([f"git@b.example.com:{i}.git"]) for i in range(5)),
+            session(["git@a.example.com:x.git", "ssh://b.example.com/x.git"]),
+            session(["https://a.example.com/x.git"]),
+        )
+
+    try:
+        envs = asyncio.run(main())
+    finally:
+        asyncio.run(pool.close())
+
+    assert max_running == {"a.example.com": 2, "b.example.com": 2}
+    assert envs[:-1] == [pool.env] * 11
+    assert envs[-1] is None
+
+
+def test_sync_over_ssh(tmpdir, monkeypatch, make_upstream):
+    """Testing projector.scm_tools.git.Git.sync multiplexes SSH connections"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+    fake_ssh = root / "fake-ssh"
+    log = root / "ssh.log"
+
+    fake_ssh.write_text(FAKE_SSH)
+    fake_ssh.chmod(0o755)
+
+    monkeypatch.setenv("GIT_SSH_COMMAND", str(fake_ssh))
+    monkeypatch.setenv("GIT_SSH_VARIANT", "ssh")
+    monkeypatch.setenv("FAKE_SSH_LOG", str(log))
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(root / "src")},
+            "repositories": {
+                "foo": {"scm": "Git", "config": {"remotes": {"origin": f"localhost:{foo}"}}},
+                "bar": {"scm": "Git", "config": {"remotes": {"origin": bar.as_uri()}}},
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            with spy_on(SshConnectionPool.close) as close_spy:
+                assert sync_repositories(config) == {}
+                assert sync_repositories(config) == {}
+                assert len(close_spy.calls) == 2
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert (root / "src" / "foo" / "README").exists()
+    assert (root / "src" / "bar" / "README").exists()
+
+    invocations = log.read_text().splitlines()
+    assert len(invocations) == 2
+
+    for invocation in invocations:
+        assert "-o ControlMaster=auto" in invocation
+        assert "localhost" in invocation
+
+    control_dirs = {
+        Path(arg.split("=", 1)[1]).parent
+        for arg in invocations[0].split()
+        if arg.startswith("ControlPath=")
+    }
+    assert len(control_dirs) == 1
+    assert not os.path.exists(str(control_dirs.pop()))
+
+
+def test_get_ssh_command(tmpdir, monkeypatch):
+    """Testing projector.scm_tools.git_ssh.get_ssh_command follows Git's precedence"""
+    global_config = Path(str(tmpdir)) / "gitconfig"
+    global_config.write_text("")
+
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(global_config))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.delenv("GIT_SSH_COMMAND", raising=False)
+    monkeypatch.delenv("GIT_SSH", raising=False)
+
+    assert asyncio.run(get_ssh_command()) == "ssh"
+
+    monkeypatch.setenv("GIT_SSH", "plink")
+    assert asyncio.run(get_ssh_command()) is None
+
+    global_config.write_text("[core]\n\tsshCommand = ssh -i config-key\n")
+    assert asyncio.run(get_ssh_command()) == "ssh -i config-key"
+
+    monkeypatch.setenv("GIT_SSH_COMMAND", "ssh -i env-key")
+    assert asyncio.run(get_ssh_command()) == "ssh -i env-key"
+
+
+@pytest.mark.parametrize("setting", ["core.sshCommand", "GIT_SSH"])
+def test_sync_over_ssh_configured_command(tmpdir, monkeypatch, make_upstream, setting):
+    """Testing projector.scm_tools.git.Git.sync keeps the configured SSH command"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    fake_ssh = root / "fake-ssh"
+    log = root / "ssh.log"
+    global_config = root / "gitconfig"
+
+    fake_ssh.write_text(FAKE_SSH)
+    fake_ssh.chmod(0o755)
+
+    if setting == "GIT_SSH":
+        global_config.write_text("")
+        monkeypatch.setenv("GIT_SSH", str(fake_ssh))
+    else:
+        global_config.write_text(f"[core]\n\tsshCommand = {fake_ssh}\n")
+        monkeypatch.delenv("GIT_SSH", raising=False)
+
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(global_config))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.delenv("GIT_SSH_COMMAND", raising=False)
+    monkeypatch.setenv("GIT_SSH_VARIANT", "ssh")
+    monkeypatch.setenv("FAKE_SSH_LOG", str(log))
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(root / "src")},
+            "repositories": {
+                "foo": {"scm": "Git", "config": {"remotes": {"origin": f"localhost:{foo}"}}}
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert (root / "src" / "foo" / "README").exists()
+
+    invocations = log.read_text().splitlines()
+    assert len(invocations) == 1
+
+    if setting == "GIT_SSH":
+        assert "ControlMaster" not in invocations[0]
+    else:
+        assert "-o ControlMaster=auto" in invocations[0]
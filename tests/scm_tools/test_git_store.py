@@ -0,0 +1,169 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scm_tools.git_store."""
+
+import os
+from pathlib import Path
+
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git, GitRepositorySchema, run_git
+from projector.scm_tools.git_store import MirrorCache, SharedObjectStore, plan_object_stores
+from projector.sync import sync_repositories
+
+
+def test_plan_object_stores():
+    """Testing projector.scm_tools.git_store.plan_object_stores"""
+    schema = GitRepositorySchema()
+
+    repositories = {
+        "upstream": schema.load({"remotes": {"origin": "https://example.com/project.git"}}),
+        "fork": schema.load(
+            {
+                "remotes": {
+                    "origin": "git@example.com:me/project.git",
+                    "upstream": "git@example.com:project.git",
+                }
+            }
+        ),
+        "unrelated": schema.load({"remotes": {"origin": "https://example.com/other.git"}}),
+    }
+
+    assert plan_object_stores(repositories) == {
+        "upstream": "https://example.com/project.git",
+        "fork": "https://example.com/project.git",
+    }
+
+
+def test_sync_shared_object_store(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories with a shared object store"""
+    root = Path(str(tmpdir))
+    upstream = make_upstream("project")
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(root / "src"), "objects": str(root / "objects")},
+            "repositories": {
+                "project": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+                "fork": {
+                    "scm": "Git",
+                    "config": {
+                        "remotes": {"origin": str(upstream), "upstream": upstream.as_uri()}
+                    },
+                },
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    store_path = SharedObjectStore(root / "objects").path_for(upstream.as_uri())
+    assert store_path.is_dir()
+    assert git("rev-parse", "master", cwd=store_path) == git("rev-parse", "HEAD", cwd=upstream)
+
+    for name in ("project", "fork"):
+        alternates = root / "src" / name / ".git" / "objects" / "info" / "alternates"
+        assert alternates.read_text().strip() == str(store_path / "objects")
+
+
+def test_mirror_cache_evict(tmpdir):
+    """Testing projector.scm_tools.git_store.MirrorCache.evict"""
+    root = Path(str(tmpdir))
+    cache = MirrorCache(root, max_size=3 * 4096)
+    mirrors = []
+
+    for i in range(4):
+        path = root / f"mirror-{i}.git"
+        path.mkdir()
+        (path / "data").write_bytes(b"x" * 4096)
+        os.utime(str(path), (1000 + i, 1000 + i))
+        mirrors.append(path)
+
+    (root / "unrelated").mkdir()
+
+    assert cache.evict(keep=[mirrors[0]]) == [mirrors[1]]
+    assert [path.exists() for path in mirrors] == [True, False, True, True]
+
+    cache.max_size = 0
+    assert cache.evict(keep=[mirrors[3]]) == [mirrors[0], mirrors[2]]
+    assert (root / "unrelated").exists()
+
+    assert MirrorCache(root).evict() == []
+    assert mirrors[3].exists()
+
+
+def test_sync_mirrors(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories with mirrors"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+
+    def make_config(name, upstream):
+        return ConfigSchema().load(
+            {
+                "directories": {"source": str(root / "src")},
+                "mirrors": {"directory": str(root / "mirrors"), "max_size": 1},
+                "repositories": {
+                    name: {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}}
+                },
+            }
+        )
+
+    cache = MirrorCache(root / "mirrors")
+    foo_config = make_config("foo", foo)
+    local_foo = root / "src" / "foo"
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(foo_config) == {}
+
+            assert cache.path_for(foo.as_uri()).is_dir()
+            assert git("remote", "get-url", "origin", cwd=local_foo).strip() == foo.as_uri()
+
+            git("commit", "--quiet", "--allow-empty", "-m", "Upstream", cwd=foo)
+
+            with spy_on(run_git) as run_git_spy:
+                assert sync_repositories(foo_config) == {}
+
+                fetches = [call.args for call in run_git_spy.calls if call.args[0] == "fetch"]
+
+            assert git("rev-parse", "origin/master", cwd=local_foo) == git(
+                "rev-parse", "HEAD", cwd=foo
+            )
+
+            # The working repository was only fetched from the mirror.
+            mirror_fetches = [
+                args for args in fetches if str(cache.path_for(foo.as_uri())) in args
+            ]
+            assert len(fetches) == 2
+            assert len(mirror_fetches) == 1
+
+            # The mirror of foo is over budget, but is only evicted once it is unused.
+            assert sync_repositories(make_config("bar", bar)) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert not cache.path_for(foo.as_uri()).exists()
+    assert cache.path_for(bar.as_uri()).is_dir()
+    assert (root / "src" / "bar" / "README").exists()
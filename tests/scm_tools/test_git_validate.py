@@ -0,0 +1,196 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scm_tools.git_validate."""
+
+import random
+from collections import OrderedDict
+
+import pytest
+from marshmallow import ValidationError
+
+from projector.scm_tools.git import Git, GitRepositorySchema
+from projector.scm_tools.git_validate import load_git_config, load_git_config_fast
+
+
+#: Values for each field of a repository, both valid and invalid.
+FIELD_VALUES = {
+    "ref": ["master", "v1.0", "", "true", 1, None, b"master", ["master"]],
+    "detach": [True, False, "true", "no", 0, 1, 2, None, 1.0],
+    "depth": [1, 50, 0, -1, "1", 1.0, 1.5, True, None],
+    "filter": ["blob:none", "tree:0", "blob:limit=1k", "", 1, None],
+    "single_branch": [True, False, "yes", 0, None],
+    "unknown": [1],
+}
+
+#: Values for remote URLs, both valid and invalid.
+URL_VALUES = ["https://example.com/foo.git", "git@example.com:foo.git", "", 1, None, ["x"]]
+
+#: Values for the default of explicit remotes, both valid and invalid.
+DEFAULT_VALUES = [True, False, "true", "false", 0, 1, None]
+
+#: Names of remotes.
+REMOTE_NAMES = ["origin", "upstream", "fork", "", 1]
+
+
+def _random_remote(rng):
+    kind = rng.random()
+
+    if kind < 0.4:
+        return rng.choice(URL_VALUES)
+
+    if kind < 0.9:
+        remote = {}
+
+        if rng.random() < 0.95:
+            remote["url"] = rng.choice(URL_VALUES)
+
+        if rng.random() < 0.5:
+            remote["default"] = rng.choice(DEFAULT_VALUES)
+
+        if rng.random() < 0.05:
+            remote["extra"] = True
+
+        if rng.random() < 0.05:
+            remote = OrderedDict(remote)
+
+        return remote
+
+    return rng.choice([None, 1, ["https://example.com/foo.git"]])
+
+
+def _random_config(rng):
+    if rng.random() < 0.02:
+        return rng.choice([None, "config", [], 1])
+
+    config = {}
+
+    for field, values in FIELD_VALUES.items():
+        if rng.random() < (0.05 if field == "unknown" else 0.3):
+            config[field] = rng.choice(values)
+
+    if rng.random() < 0.97:
+        if rng.random() < 0.95:
+            config["remotes"] = {
+                rng.choice(REMOTE_NAMES): _random_remote(rng) for _ in range(rng.randint(0, 4))
+            }
+        else:
+            config["remotes"] = rng.choice([None, [], "origin"])
+
+    return config
+
+
+def _load_with_schema(data):
+    try:
+        return GitRepositorySchema().load(data), None
+    except ValidationError as e:
+        return None, e.messages
+
+
+def _assert_same(data):
+    expected, expected_messages = _load_with_schema(data)
+
+    try:
+        result, messages = load_git_config(data), None
+    except ValidationError as e:
+        result, messages = None, e.messages
+
+    assert messages == expected_messages
+
+    if expected is not None:
+        assert result == expected
+        assert list(result) == list(expected)
+        assert list(result["remotes"]) == list(expected["remotes"])
+        assert [remote.kind for remote in result["remotes"].values()] == [
+            remote.kind for remote in expected["remotes"].values()
+        ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"remotes": {"origin": "git@example.com:foo.git"}},
+        {"remotes": {"upstream": {"url": "https://example.com/foo.git"}}},
+        {
+            "ref": "develop",
+            "detach": True,
+            "depth": 1,
+            "filter": "blob:none",
+            "single_branch": True,
+            "remotes": {
+                "origin": "git@example.com:foo.git",
+                "fork": {"url": "git@example.com:fork.git", "default": False},
+            },
+        },
+        {
+            "remotes": {
+                "fork": "git@example.com:fork.git",
+                "upstream": {"url": "git@example.com:upstream.git", "default": True},
+            }
+        },
+    ],
+)
+def test_load_git_config_fast(data):
+    """Testing projector.scm_tools.git_validate.load_git_config_fast with plain configurations"""
+    assert load_git_config_fast(data) is not None
+    _assert_same(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {},
+        {"remotes": {}},
+        {"remotes": {"a": "x", "b": "y"}},
+        {"remotes": {"a": {"url": "x", "default": True}, "b": {"url": "y", "default": True}}},
+        {"remotes": {"origin": "x"}, "depth": 0},
+        {"remotes": {"origin": "x"}, "filter": "blob:limit=1k"},
+        {"remotes": {"origin": "x"}, "detach": "true"},
+        {"remotes": {"origin": {"default": True}}},
+        {"remotes": {"origin": "x"}, "unknown": 1},
+    ],
+)
+def test_load_git_config_fallback(data):
+    """Testing projector.scm_tools.git_validate.load_git_config falls back to the schema"""
+    assert load_git_config_fast(data) is None
+    _assert_same(data)
+
+
+def test_load_git_config_differential():
+    """Testing projector.scm_tools.git_validate.load_git_config matches the schema"""
+    rng = random.Random(0)
+    fast = 0
+
+    for _ in range(5000):
+        data = _random_config(rng)
+        _assert_same(data)
+
+        if load_git_config_fast(data) is not None:
+            fast += 1
+
+    # Make sure the corpus exercises both paths.
+    assert 50 < fast < 4950
+
+
+def test_git_load_config():
+    """Testing projector.scm_tools.git.Git.load_config"""
+    data = {"remotes": {"origin": "git@example.com:foo.git"}}
+
+    assert Git.load_config(data) == GitRepositorySchema().load(data)
+
+    with pytest.raises(ValidationError):
+        Git.load_config({"remotes": {}})
@@ -0,0 +1,112 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scm_tools.registry."""
+
+import json
+import sys
+
+import pytest
+from kgb import spy_on
+
+import projector.scm_tools
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools, registry
+from projector.scm_tools.git import Git
+from projector.scm_tools.registry import (
+    EntryPointIndex,
+    EntryPointSpec,
+    ScmToolRegistry,
+    discover_entry_points,
+)
+
+
+def test_discover_entry_points():
+    """Testing projector.scm_tools.registry.discover_entry_points"""
+    specs = discover_entry_points()
+
+    assert specs["Git"].value == "projector.scm_tools.git:Git"
+    assert specs["Git"].distribution == "projector"
+    assert specs["Git"].load() is Git
+
+
+def test_scm_tool_registry_lazy():
+    """Testing projector.scm_tools.registry.ScmToolRegistry only loads tools on lookup"""
+    tools = ScmToolRegistry(
+        {
+            "Git": EntryPointSpec("Git", "projector.scm_tools.git:Git", "projector", "0"),
+            "Broken": EntryPointSpec("Broken", "projector_missing_module:Tool", "broken", "0"),
+        }
+    )
+
+    assert list(tools) == ["Git", "Broken"]
+    assert len(tools) == 2
+    assert "Broken" in tools
+    assert tools.spec("Broken").distribution == "broken"
+    assert tools["Git"] is Git
+
+    with pytest.raises(ImportError):
+        tools["Broken"]
+
+    with pytest.raises(KeyError):
+        tools["Unknown"]
+
+
+def test_entry_point_index(cache_dir):
+    """Testing projector.scm_tools.registry.EntryPointIndex"""
+    index_path = cache_dir / "entry_points.json"
+
+    with spy_on(registry.discover_entry_points) as discover_spy:
+        tools = ScmToolRegistry.discover(index_path)
+        assert tools["Git"] is Git
+        assert discover_spy.called
+        assert index_path.exists()
+
+        discover_spy.reset_calls()
+
+        tools = ScmToolRegistry.discover(index_path)
+        assert tools["Git"] is Git
+        assert not discover_spy.called
+
+        with spy_on(registry.path_fingerprint, call_fake=lambda paths: [["/changed", 0]]):
+            assert EntryPointIndex(index_path).load() is None
+
+            ScmToolRegistry.discover(index_path)
+            assert discover_spy.called
+
+    discover_spy.reset_calls()
+
+    with index_path.open("w") as f:
+        json.dump({"version": 0}, f)
+
+    assert EntryPointIndex(index_path).load() is None
+
+
+def test_get_scm_tools_lazy_import(cache_dir):
+    """Testing projector.scm_tools.get_scm_tools does not import SCM tools"""
+    git_module = sys.modules.pop("projector.scm_tools.git")
+
+    try:
+        tools = _get_scm_tools_uncached()
+        assert "Git" in tools
+        assert "projector.scm_tools.git" not in sys.modules
+
+        assert tools["Git"].name == "Git"
+        assert "projector.scm_tools.git" in sys.modules
+    finally:
+        sys.modules["projector.scm_tools.git"] = git_module
+        projector.scm_tools.git = git_module
+        get_scm_tools.cache_clear()
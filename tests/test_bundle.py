@@ -0,0 +1,216 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.bundle."""
+
+import asyncio
+import json
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector.bundle import (
+    BUNDLE_CONFIG_NAME,
+    BUNDLE_MANIFEST_NAME,
+    export_environment,
+    export_environment_async,
+    import_environment,
+)
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git
+from projector.sync import sync_repositories
+
+
+class UnseekableBuffer(BytesIO):
+    """A buffer that cannot be seeked, like a pipe."""
+
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise OSError("unseekable")
+
+    def tell(self):
+        raise OSError("unseekable")
+
+
+def test_export_import_environment(tmpdir, git, make_upstream):
+    """Testing projector.bundle.export_environment and import_environment"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+
+    git("branch", "feature", cwd=foo)
+
+    data = {
+        "directories": {"source": str(root / "src")},
+        "repositories": {
+            "foo": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+            "bar": {
+                "scm": "Git",
+                "config": {
+                    "detach": True,
+                    "remotes": {
+                        "upstream": {"url": bar.as_uri(), "default": True},
+                        "fork": foo.as_uri(),
+                    },
+                },
+            },
+            "missing": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            config = ConfigSchema().load(data)
+            sync_config = {**config, "repositories": dict(config["repositories"])}
+            del sync_config["repositories"]["missing"]
+
+            assert sync_repositories(sync_config) == {}
+
+            bundle_path = root / "environment.zip"
+            assert export_environment(config, bundle_path) == {}
+
+            with zipfile.ZipFile(str(bundle_path)) as archive:
+                assert json.loads(archive.read(BUNDLE_MANIFEST_NAME).decode())["bundles"] == {
+                    "foo": "repositories/foo.bundle",
+                    "bar": "repositories/bar.bundle",
+                }
+                exported = json.loads(archive.read(BUNDLE_CONFIG_NAME).decode())
+                assert ConfigSchema().load(exported) == config
+
+            imported, errors = import_environment(bundle_path, source=root / "imported")
+
+            assert errors == {}
+            assert imported == {**config, "directories": {"source": root / "imported"}}
+
+            for name in ("foo", "bar"):
+                src = root / "src" / name
+                dst = root / "imported" / name
+
+                assert git("rev-parse", "HEAD", cwd=dst) == git("rev-parse", "HEAD", cwd=src)
+                assert git("remote", "-v", cwd=dst) == git("remote", "-v", cwd=src)
+                assert git("status", "--porcelain", cwd=dst) == ""
+
+            assert sorted(root.glob("imported/.*.bundle")) == []
+            assert not (root / "imported" / "missing").exists()
+
+            foo_dst = root / "imported" / "foo"
+            assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=foo_dst) == "master\n"
+            assert git("rev-parse", "--abbrev-ref", "@{upstream}", cwd=foo_dst) == (
+                "origin/master\n"
+            )
+            assert "origin/feature" in git("branch", "--remotes", cwd=foo_dst)
+            assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=root / "imported" / "bar") == (
+                "HEAD\n"
+            )
+
+            # Existing repositories are left alone.
+            git("commit", "--quiet", "--allow-empty", "-m", "Local", cwd=foo_dst)
+            head = git("rev-parse", "HEAD", cwd=foo_dst)
+
+            assert import_environment(bundle_path, source=root / "imported")[1] == {}
+            assert git("rev-parse", "HEAD", cwd=foo_dst) == head
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_export_environment_streaming(tmpdir, make_upstream):
+    """Testing projector.bundle.export_environment_async streams bundles and omits failures"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    (root / "src" / "empty").mkdir(parents=True)
+
+    data = {
+        "directories": {"source": str(root / "src")},
+        "repositories": {
+            "foo": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+            "empty": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            config = ConfigSchema().load(data)
+            foo_config = {**config, "repositories": {"foo": config["repositories"]["foo"]}}
+            assert sync_repositories(foo_config) == {}
+
+            out = UnseekableBuffer()
+            errors = asyncio.run(export_environment_async(config, out))
+
+            assert list(errors) == ["empty"]
+
+            with zipfile.ZipFile(BytesIO(out.getvalue())) as archive:
+                manifest = json.loads(archive.read(BUNDLE_MANIFEST_NAME).decode())
+                assert manifest["bundles"] == {"foo": "repositories/foo.bundle"}
+                assert archive.getinfo("repositories/foo.bundle").compress_type == (
+                    zipfile.ZIP_STORED
+                )
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_import_environment_version(tmpdir):
+    """Testing projector.bundle.import_environment rejects unsupported versions"""
+    bundle_path = Path(str(tmpdir)) / "environment.zip"
+
+    with zipfile.ZipFile(str(bundle_path), "w") as archive:
+        archive.writestr(BUNDLE_MANIFEST_NAME, json.dumps({"version": 0, "bundles": {}}))
+
+    with pytest.raises(ValueError):
+        import_environment(bundle_path)
+
+
+def test_import_environment_corrupt_bundle(tmpdir):
+    """Testing projector.bundle.import_environment leaves nothing behind for corrupt bundles"""
+    root = Path(str(tmpdir))
+    bundle_path = root / "environment.zip"
+    source = root / "src"
+
+    with zipfile.ZipFile(str(bundle_path), "w") as archive:
+        archive.writestr(
+            BUNDLE_CONFIG_NAME,
+            json.dumps(
+                {
+                    "directories": {"source": str(source)},
+                    "repositories": {
+                        "repo": {
+                            "scm": "Git",
+                            "config": {"remotes": {"origin": "https://example.com/repo.git"}},
+                        }
+                    },
+                }
+            ),
+        )
+        archive.writestr("repositories/repo.bundle", b"# v2 git bundle\ncorrupt\n")
+        archive.writestr(
+            BUNDLE_MANIFEST_NAME,
+            json.dumps({"version": 1, "bundles": {"repo": "repositories/repo.bundle"}}),
+        )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            _, errors = import_environment(bundle_path)
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert list(errors) == ["repo"]
+    assert sorted(path.name for path in source.iterdir()) == []
@@ -0,0 +1,169 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.cli."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector import __version__
+from projector.cli import main
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git
+from projector.watch import RepositoryWatcher, is_supported
+
+
+#: Modules that must not be imported to show the version.
+HEAVY_MODULES = {
+    "asyncio",
+    "concurrent.futures",
+    "importlib_metadata",
+    "marshmallow",
+    "more_itertools",
+    "pkg_resources",
+    "projector.config",
+    "projector.fields",
+    "projector.scm_tools",
+}
+
+#: The budget for importing the command-line interface, in microseconds.
+IMPORT_TIME_BUDGET = 100000
+
+
+def test_version(capsys):
+    """Testing projector.cli.main --version"""
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--version"])
+
+    assert excinfo.value.code == 0
+    assert capsys.readouterr().out == f"projector {__version__}\n"
+
+
+def test_import_time():
+    """Testing projector.cli imports quickly and lazily"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "projector", "--version"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+    assert result.stdout.decode() == f"projector {__version__}\n"
+
+    cumulative = {}
+
+    for line in result.stderr.decode().splitlines():
+        if line.startswith("import time:") and not line.endswith("| imported package"):
+            _, _, times = line.partition(":")
+            _, total, module = times.split("|")
+            cumulative[module.strip()] = int(total)
+
+    assert "projector.cli" in cumulative
+    assert HEAVY_MODULES.isdisjoint(cumulative)
+    assert cumulative["projector.cli"] + cumulative["projector"] < IMPORT_TIME_BUDGET
+
+
+def test_sync_status(tmpdir, capsys, make_upstream):
+    """Testing projector.cli.main sync and status"""
+    root = Path(str(tmpdir))
+    upstream = make_upstream("upstream")
+    config_path = root / "projector.json"
+    trace_path = root / "trace.json"
+
+    config_path.write_text(
+        json.dumps(
+            {
+                "directories": {"source": str(root / "src")},
+                "repositories": {
+                    "repo": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+                    "missing": {
+                        "scm": "Git",
+                        "config": {"remotes": {"origin": (root / "missing").as_uri()}},
+                    },
+                },
+            }
+        )
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert main(["-c", str(config_path), "--trace", str(trace_path), "sync"]) == 1
+            assert capsys.readouterr().err.startswith("missing: ")
+            assert json.loads(trace_path.read_text())["traceEvents"]
+
+            assert main(["--config", str(config_path), "status"]) == 0
+            assert capsys.readouterr().out == "repo: master\nmissing: missing\n"
+    finally:
+        get_scm_tools.cache_clear()
+
+
+@pytest.mark.skipif(not is_supported(), reason="inotify is not supported")
+def test_watch(tmpdir, capsys, monkeypatch, make_upstream):
+    """Testing projector.cli.main watch"""
+    root = Path(str(tmpdir))
+    upstream = make_upstream("upstream")
+    config_path = root / "projector.json"
+
+    config_path.write_text(
+        json.dumps(
+            {
+                "directories": {"source": str(root / "src")},
+                "repositories": {
+                    "repo": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+                    "other": {"scm": "Git", "config": {"remotes": {"origin": upstream.as_uri()}}},
+                },
+            }
+        )
+    )
+
+    async def run_once(watcher):
+        await watcher.start()
+        await watcher.refresh()
+
+    # Watching never ends on its own, so stop once the initial status has been determined.
+    monkeypatch.setattr(RepositoryWatcher, "run", run_once)
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert main(["-c", str(config_path), "sync"]) == 0
+            capsys.readouterr()
+
+            assert main(["-c", str(config_path), "watch", "--delay", "0"]) == 0
+            assert capsys.readouterr().out == "repo: master\nother: master\n"
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_invalid_config(tmpdir, capsys):
+    """Testing projector.cli.main with an invalid configuration"""
+    config_path = Path(str(tmpdir)) / "projector.json"
+
+    assert main(["--config", str(config_path), "sync"]) == 2
+    assert "could not read configuration" in capsys.readouterr().err
+
+    config_path.write_text("{}")
+
+    assert main(["--config", str(config_path), "status"]) == 2
+    assert "invalid configuration" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main(["sync", "--jobs", "0"])
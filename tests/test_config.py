@@ -17,13 +17,22 @@
 
 """Tests for projector.config."""
 
+import json
+from io import StringIO
 from pathlib import Path
 
 import pytest
 from kgb import spy_on
 from marshmallow import ValidationError
 
-from projector.config import ConfigSchema
+from projector.config import (
+    ConfigSchema,
+    IncrementalConfigLoader,
+    RepositorySchema,
+    StreamingConfigLoader,
+    load_config,
+    validate_repositories,
+)
 from projector.scm_tools.git import Git, Remote, RemoteKind
 from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
 
@@ -98,10 +107,8 @@ def test_config_schema():
                             "remotes": {
                                 "origin": Remote(
                                     kind=RemoteKind.EXPLICIT,
-                                    inner={
-                                        "url": "git@github.com:brennie/projector.git",
-                                        "default": True,
-                                    },
+                                    url="git@github.com:brennie/projector.git",
+                                    default=True,
                                 )
                             },
                         },
@@ -110,3 +117,316 @@ def test_config_schema():
             }
     finally:
         get_scm_tools.cache_clear()
+
+
+def test_load_config(tmpdir, cache_dir):
+    """Testing projector.config.load_config caches validated configurations"""
+    config_path = Path(str(tmpdir)) / "projector.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "directories": {"source": "/src"},
+                "repositories": {
+                    "projector": {
+                        "scm": "Git",
+                        "config": {"remotes": {"origin": "git@github.com:brennie/projector.git"}},
+                    }
+                },
+            }
+        )
+    )
+
+    expected = {
+        "directories": {"source": Path("/src")},
+        "repositories": {
+            "projector": {
+                "scm": "Git",
+                "config": {
+                    "ref": "master",
+                    "detach": False,
+                    "remotes": {
+                        "origin": Remote(
+                            kind=RemoteKind.IMPLICIT,
+                            url="git@github.com:brennie/projector.git",
+                            default=True,
+                        )
+                    },
+                },
+            }
+        },
+    }
+
+    try:
+        with spy_on(ConfigSchema.load) as load_spy:
+            assert load_config(config_path) == expected
+            assert load_spy.called
+            assert len(list((cache_dir / "configs").iterdir())) == 1
+
+            load_spy.reset_calls()
+
+            assert load_config(config_path) == expected
+            assert not load_spy.called
+
+            assert load_config(config_path, use_cache=False) == expected
+            assert load_spy.called
+
+            load_spy.reset_calls()
+
+            for entry in (cache_dir / "configs").iterdir():
+                entry.write_bytes(b"garbage")
+
+            assert load_config(config_path) == expected
+            assert load_spy.called
+
+            load_spy.reset_calls()
+
+            config_path.write_text(
+                json.dumps({"directories": {"source": "/src"}, "repositories": {}})
+            )
+
+            assert load_config(config_path) == {
+                "directories": {"source": Path("/src")},
+                "repositories": {},
+            }
+            assert load_spy.called
+            assert len(list((cache_dir / "configs").iterdir())) == 2
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_load_config_scm_tools_mapping(tmpdir, cache_dir):
+    """Testing projector.config.load_config caches configurations with a plain SCM tool mapping"""
+    config_path = Path(str(tmpdir)) / "projector.json"
+    config_path.write_text(json.dumps({"directories": {"source": "/src"}, "repositories": {}}))
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert load_config(config_path) == load_config(config_path)
+            assert len(list((cache_dir / "configs").iterdir())) == 1
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_incremental_config_loader():
+    """Testing projector.config.IncrementalConfigLoader only revalidates changed repositories"""
+    scm_tools = {"Git": Git}
+
+    def make_repository(url):
+        return {"scm": "Git", "config": {"remotes": {"origin": url}}}
+
+    data = {
+        "directories": {"source": "/src"},
+        "repositories": {
+            f"repo-{i}": make_repository(f"https://example.com/repo-{i}.git") for i in range(5)
+        },
+    }
+
+    loader = IncrementalConfigLoader()
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: scm_tools), spy_on(
+            RepositorySchema._validate_scm
+        ) as validate_spy:
+            expected = ConfigSchema().load(data)
+            validate_spy.reset_calls()
+
+            first = loader.load(data)
+            assert first == expected
+            assert len(validate_spy.calls) == 5
+
+            data["repositories"]["repo-1"] = make_repository("https://example.com/changed.git")
+            data["repositories"]["new"] = make_repository("https://example.com/new.git")
+            del data["repositories"]["repo-4"]
+
+            expected = ConfigSchema().load(data)
+            validate_spy.reset_calls()
+
+            second = loader.load(data)
+            assert second == expected
+            assert len(validate_spy.calls) == 2
+            assert second["repositories"]["repo-0"] is first["repositories"]["repo-0"]
+            assert second["repositories"]["repo-1"] is not first["repositories"]["repo-1"]
+
+            invalid = {
+                "directories": {},
+                "repositories": {**data["repositories"], "bad": {"scm": "unknown-scm"}},
+            }
+
+            with pytest.raises(ValidationError) as expected_excinfo:
+                ConfigSchema().load(invalid)
+
+            with pytest.raises(ValidationError) as excinfo:
+                loader.load(invalid)
+
+            assert excinfo.value.messages == expected_excinfo.value.messages
+
+            with pytest.raises(ValidationError) as expected_excinfo:
+                ConfigSchema().load({"directories": {"source": "/src"}})
+
+            with pytest.raises(ValidationError) as excinfo:
+                loader.load({"directories": {"source": "/src"}})
+
+            assert excinfo.value.messages == expected_excinfo.value.messages
+
+            validate_spy.reset_calls()
+
+            assert loader.load(data) == second
+            assert len(validate_spy.calls) == 5
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_streaming_config_loader():
+    """Testing projector.config.StreamingConfigLoader"""
+    scm_tools = {"Git": Git}
+
+    data = {
+        "directories": {"source": "/src"},
+        "mirrors": {"directory": "/mirrors", "max_size": "1G"},
+        "hosts": {"example.com": {"jobs": 2, "rate": 0.5}},
+        "repositories": {
+            f"repo-{i}": {
+                "scm": "Git",
+                "config": {"remotes": {"origin": f"https://example.com/repo-{i}.git"}},
+            }
+            for i in range(10)
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: scm_tools):
+            expected = ConfigSchema().load(data)
+
+            loader = StreamingConfigLoader(StringIO(json.dumps(data, indent=4)))
+            items = iter(loader)
+
+            assert next(items) == ("repo-0", expected["repositories"]["repo-0"])
+            assert loader.directories == expected["directories"]
+            assert loader.mirrors == {"directory": Path("/mirrors"), "max_size": 1 << 30}
+            assert loader.hosts == expected["hosts"] == {"example.com": {"jobs": 2, "rate": 0.5}}
+            assert dict(items) == {
+                name: repository
+                for name, repository in expected["repositories"].items()
+                if name != "repo-0"
+            }
+
+            data["repositories"]["repo-5"]["scm"] = "unknown-scm"
+            loader = StreamingConfigLoader(StringIO(json.dumps(data)))
+
+            with pytest.raises(ValidationError) as excinfo:
+                list(loader)
+
+            assert excinfo.value.messages == {
+                "repositories": {"repo-5": {"value": {"scm": ["Unknown SCM: `unknown-scm'"]}}}
+            }
+
+            for invalid in (
+                {},
+                [],
+                {"directories": {"source": "/src"}, "repositories": []},
+                {"directories": {"source": "/src"}, "repositories": None},
+                {"directories": {"source": "/src"}, "repositories": {"repo": []}},
+                {"directories": {}, "repositories": {}},
+                {"directories": {"source": "/src"}, "mirrors": {}, "repositories": {}},
+                {
+                    "directories": {"source": "/src"},
+                    "hosts": {"example.com": {"jobs": 0, "rate": -1}},
+                    "repositories": {},
+                },
+            ):
+                with pytest.raises(ValidationError) as expected_excinfo:
+                    ConfigSchema().load(invalid)
+
+                with pytest.raises(ValidationError) as excinfo:
+                    list(StreamingConfigLoader(StringIO(json.dumps(invalid))))
+
+                assert excinfo.value.messages == expected_excinfo.value.messages
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_config_dependencies():
+    """Testing projector.config validates the dependencies between repositories"""
+    scm_tools = {"Git": Git}
+
+    def make_repository(depends_on):
+        return {
+            "scm": "Git",
+            "config": {"remotes": {"origin": "https://example.com/repo.git"}},
+            "depends_on": depends_on,
+        }
+
+    data = {
+        "directories": {"source": "/src"},
+        "repositories": {
+            "lib": make_repository([]),
+            "app": make_repository(["lib"]),
+            "a": make_repository(["b", "missing"]),
+            "b": make_repository(["a"]),
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: scm_tools):
+            with pytest.raises(ValidationError) as excinfo:
+                ConfigSchema().load(data)
+
+            assert excinfo.value.messages == {
+                "repositories": {
+                    "a": {
+                        "value": {
+                            "depends_on": [
+                                "Unknown repository: `missing'",
+                                "Dependency cycle: a -> b -> a",
+                            ]
+                        }
+                    }
+                }
+            }
+
+            for load in (
+                IncrementalConfigLoader().load,
+                lambda data: dict(StreamingConfigLoader(StringIO(json.dumps(data)))),
+            ):
+                with pytest.raises(ValidationError) as loader_excinfo:
+                    load(data)
+
+                assert loader_excinfo.value.messages == excinfo.value.messages
+
+            del data["repositories"]["a"]
+            del data["repositories"]["b"]
+
+            config = ConfigSchema().load(data)
+            assert config["repositories"]["app"]["depends_on"] == ["lib"]
+            assert IncrementalConfigLoader().load(data) == config
+    finally:
+        get_scm_tools.cache_clear()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_validate_repositories(max_workers):
+    """Testing projector.config.validate_repositories"""
+    repositories = {
+        f"repo-{i}": {
+            "scm": "Git",
+            "config": {"remotes": {"origin": f"https://example.com/repo-{i}.git"}},
+        }
+        for i in range(10)
+    }
+    repositories["repo-3"] = {"scm": "unknown-scm", "config": {}}
+    repositories["repo-7"]["config"]["remotes"] = {}
+
+    try:
+        report = validate_repositories(repositories, max_workers=max_workers, chunk_size=3)
+
+        assert report.errors == {
+            "repo-3": {"scm": ["Unknown SCM: `unknown-scm'"]},
+            "repo-7": {"remotes": {"remotes": ["Repository has no remotes."]}},
+        }
+        assert list(report.repositories) == [f"repo-{i}" for i in range(10) if i not in {3, 7}]
+        assert report.repositories["repo-0"] == RepositorySchema().load(repositories["repo-0"])
+
+        with pytest.raises(ValueError):
+            validate_repositories(repositories, chunk_size=0)
+    finally:
+        get_scm_tools.cache_clear()
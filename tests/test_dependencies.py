@@ -0,0 +1,79 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.dependencies."""
+
+import pytest
+
+from projector.dependencies import (
+    DependencyError,
+    critical_path_lengths,
+    dependency_errors,
+    get_dependencies,
+)
+
+
+def test_get_dependencies():
+    """Testing projector.dependencies.get_dependencies"""
+    assert get_dependencies({"lib": {"scm": "Git"}, "app": {"depends_on": ["lib"]}}) == {
+        "lib": [],
+        "app": ["lib"],
+    }
+
+
+def test_dependency_errors():
+    """Testing projector.dependencies.dependency_errors"""
+    assert dependency_errors({"lib": [], "util": ["lib"], "app": ["lib", "util"]}) == {}
+
+    assert dependency_errors(
+        {
+            "a": ["b"],
+            "b": ["c", "missing"],
+            "c": ["a"],
+            "d": ["a"],
+            "self": ["self"],
+            "e": ["f"],
+            "f": ["e", "g"],
+            "g": ["f"],
+        }
+    ) == {
+        "a": ["Dependency cycle: a -> b -> c -> a"],
+        "b": ["Unknown repository: `missing'"],
+        "self": ["Dependency cycle: self -> self"],
+        "e": ["Dependency cycle: e -> f -> e"],
+        "f": ["Dependency cycle: f -> g -> f"],
+    }
+
+
+def test_critical_path_lengths():
+    """Testing projector.dependencies.critical_path_lengths"""
+    assert critical_path_lengths(
+        {"app": ["lib", "util"], "util": ["lib"], "lib": [], "docs": ["app"], "other": []}
+    ) == {"lib": 4, "util": 3, "app": 2, "docs": 1, "other": 1}
+
+    for dependencies in ({"a": ["b"], "b": ["c"], "c": ["a"], "d": []}, {"self": ["self"]}):
+        with pytest.raises(DependencyError):
+            critical_path_lengths(dependencies)
+
+
+def test_dependency_error():
+    """Testing projector.dependencies.DependencyError"""
+    e = DependencyError("app", ["lib", "util"])
+
+    assert e.name == "app"
+    assert e.dependencies == ["lib", "util"]
+    assert str(e) == "Dependencies of `app' failed: `lib', `util'"
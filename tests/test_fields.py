@@ -23,7 +23,7 @@ import pytest
 from marshmallow import Schema, ValidationError, fields
 from kgb import spy_on
 
-from projector.fields import EitherField, PathField
+from projector.fields import EitherField, PathField, SizeField
 
 
 def test_either_field():
@@ -141,6 +141,34 @@ def test_either_field_subclass():
         assert not special_spy.called
 
 
+def test_either_field_dispatch_cache():
+    """Testing projector.fields.EitherField caches the field for each type"""
+
+    class Special(dict):
+        pass
+
+    class TestSchema(Schema):
+        field = EitherField(
+            required=True, fields={dict: fields.Raw(), str: fields.String(required=True)}
+        )
+
+    schema = TestSchema()
+    either_field = schema.fields["field"]
+
+    assert schema.load({"field": Special(a=1)}) == {"field": {"a": 1}}
+    assert either_field._dispatch[Special] is either_field._fields[dict]
+
+    for i in range(2):
+        with pytest.raises(ValidationError) as excinfo:
+            schema.load({"field": 123})
+
+        assert excinfo.value.messages == {
+            "field": ["Expected type of value to be one of dict, str; got int instead."]
+        }
+
+    assert either_field._dispatch[int] is None
+
+
 def test_path_field():
     """Testing projector.fields.PathField"""
 
@@ -154,3 +182,26 @@ def test_path_field():
 
     assert schema.dump({"field": Path("/")}) == {"field": "/"}
     assert schema.dump({"field": Path("/tmp/foo")}) == {"field": "/tmp/foo"}
+
+
+def test_size_field():
+    """Testing projector.fields.SizeField"""
+
+    class TestSchema(Schema):
+        field = SizeField(required=True)
+
+    schema = TestSchema()
+
+    assert schema.load({"field": 1234}) == {"field": 1234}
+    assert schema.load({"field": "1234"}) == {"field": 1234}
+    assert schema.load({"field": "512K"}) == {"field": 512 * 1024}
+    assert schema.load({"field": "1.5 GiB"}) == {"field": 3 * 1024 ** 3 // 2}
+    assert schema.load({"field": "2tb"}) == {"field": 2 * 1024 ** 4}
+
+    for invalid in ("", "big", "12X", -1, True, [1]):
+        with pytest.raises(ValidationError) as excinfo:
+            schema.load({"field": invalid})
+
+        assert excinfo.value.messages == {"field": ["Not a valid size."]}
+
+    assert schema.dump({"field": 1024}) == {"field": 1024}
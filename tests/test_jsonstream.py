@@ -0,0 +1,116 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.jsonstream."""
+
+import json
+from io import StringIO
+
+import pytest
+
+from projector.jsonstream import JsonStreamReader
+
+
+DOCUMENT = {
+    "number": 12345.5,
+    "exponent": -1.5e-10,
+    "literals": [True, False, None],
+    "nested": {"a": {"b": 'c " é'}, "empty": {}, "list": [1, 2, 3]},
+    "empty": {},
+    "last": 9876543210,
+}
+
+
+def read_document(reader):
+    """Read a document, streaming every object."""
+
+    def read_object():
+        result = {}
+
+        for key in reader.iter_object():
+            if key in {"nested", "a", "empty"}:
+                result[key] = read_object()
+            else:
+                result[key] = reader.read_value()
+
+        return result
+
+    document = read_object()
+    reader.end()
+
+    return document
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_json_stream_reader(chunk_size, indent):
+    """Testing projector.jsonstream.JsonStreamReader"""
+    text = json.dumps(DOCUMENT, indent=indent)
+    reader = JsonStreamReader(StringIO(text), chunk_size=chunk_size)
+
+    assert read_document(reader) == DOCUMENT
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[]",
+        '{"a" 1}',
+        '{"a": 1 "b": 2}',
+        '{"a": 1,}',
+        "{a: 1}",
+        '{"a": 1} {}',
+        '{"a": }',
+        '{"a": {"b": 1}',
+    ],
+)
+def test_json_stream_reader_invalid(text):
+    """Testing projector.jsonstream.JsonStreamReader with invalid documents"""
+    reader = JsonStreamReader(StringIO(text), chunk_size=2)
+
+    with pytest.raises(json.JSONDecodeError):
+        read_document(reader)
+
+
+def test_json_stream_reader_large_value():
+    """Testing projector.jsonstream.JsonStreamReader reads large values in few reads"""
+
+    class CountingStringIO(StringIO):
+        reads = 0
+
+        def read(self, *args):
+            self.reads += 1
+            return super().read(*args)
+
+    value = {"list": list(range(10000))}
+    fp = CountingStringIO(json.dumps({"value": value}))
+    reader = JsonStreamReader(fp, chunk_size=16)
+
+    assert reader.peek() == "{"
+
+    keys = reader.iter_object()
+    assert next(keys) == "value"
+    assert reader.peek() == "{"
+    assert reader.read_value() == value
+
+    # Every retry doubles the buffered data, rather than adding another chunk.
+    assert fp.reads < 20
+
+    assert list(keys) == []
+    reader.end()
+    assert reader.peek() == ""
@@ -0,0 +1,205 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.scheduler."""
+
+import asyncio
+from collections import Counter
+
+import pytest
+
+from projector.scheduler import (
+    PRIORITY_CRITICAL,
+    PRIORITY_NORMAL,
+    PRIORITY_WORKING,
+    HostLimit,
+    Scheduler,
+    repository_priority,
+)
+
+
+def run_operations(make_scheduler, operations):
+    """Run operations under a scheduler.
+
+    Each operation is a tuple of its name, hosts, priority, and duration. This returns the
+    names in the order they started, the loop times they started at, and the maximum number of
+    operations running at once, in total and per host.
+    """
+    started = []
+    start_times = {}
+    running = Counter()
+    max_running = Counter()
+
+    async def operation(scheduler, name, hosts, priority, duration):
+        async with scheduler.slot(hosts=hosts, priority=priority):
+            started.append(name)
+            start_times[name] = asyncio.get_event_loop().time()
+
+            for key in (None, *(hosts or ())):
+                running[key] += 1
+                max_running[key] = max(max_running[key], running[key])
+
+            await asyncio.sleep(duration)
+
+            for key in (None, *(hosts or ())):
+                running[key] -= 1
+
+    async def main():
+        scheduler = make_scheduler()
+        await asyncio.gather(*(operation(scheduler, *op) for op in operations))
+
+    asyncio.run(main())
+
+    return started, start_times, max_running
+
+
+def test_repository_priority():
+    """Testing projector.scheduler.repository_priority"""
+    assert repository_priority({"critical": True, "config": {}}) == PRIORITY_CRITICAL
+    assert repository_priority({"config": {"detach": False}}) == PRIORITY_WORKING
+    assert repository_priority({"critical": False, "config": {"detach": True}}) == PRIORITY_NORMAL
+    assert repository_priority({"config": {}}) == PRIORITY_NORMAL
+
+
+def test_scheduler_invalid_limits():
+    """Testing projector.scheduler.Scheduler with invalid limits"""
+    with pytest.raises(ValueError):
+        Scheduler(jobs=0)
+
+    with pytest.raises(ValueError):
+        Scheduler(host_limits={"example.com": HostLimit(jobs=0)})
+
+    with pytest.raises(ValueError):
+        Scheduler(host_limits={"example.com": HostLimit(rate=0)})
+
+
+def test_scheduler_host_jobs():
+    """Testing projector.scheduler.Scheduler limits operations per host"""
+    operations = [(f"a{i}", {"a.example"}, PRIORITY_NORMAL, 0.02) for i in range(6)]
+    operations += [(f"b{i}", {"B.example"}, PRIORITY_NORMAL, 0.02) for i in range(6)]
+
+    started, _, max_running = run_operations(
+        lambda: Scheduler(
+            jobs=5,
+            host_limits={"b.example": HostLimit(jobs=1)},
+            default_host_limit=HostLimit(jobs=2),
+        ),
+        operations,
+    )
+
+    assert len(started) == 12
+    assert max_running["a.example"] == 2
+    assert max_running["B.example"] == 1
+    assert max_running[None] == 3
+
+
+def test_scheduler_global_jobs():
+    """Testing projector.scheduler.Scheduler limits operations with unknown hosts"""
+    operations = [(f"op{i}", None, PRIORITY_NORMAL, 0.01) for i in range(10)]
+
+    started, _, max_running = run_operations(lambda: Scheduler(jobs=3), operations)
+
+    assert started == [f"op{i}" for i in range(10)]
+    assert max_running[None] == 3
+
+
+def test_scheduler_local_jobs():
+    """Testing projector.scheduler.Scheduler runs local operations in a separate pool"""
+    operations = [("remote", {"example.com"}, PRIORITY_NORMAL, 0.05)]
+    operations += [(f"local{i}", (), PRIORITY_NORMAL, 0.01) for i in range(4)]
+
+    started, start_times, max_running = run_operations(
+        lambda: Scheduler(jobs=1, local_jobs=2), operations
+    )
+
+    # The local operations do not wait for the remote operation.
+    assert max(start_times[f"local{i}"] for i in range(4)) < start_times["remote"] + 0.05
+    assert max_running[None] == 3
+
+
+def test_scheduler_rate():
+    """Testing projector.scheduler.Scheduler limits the rate operations start at per host"""
+    operations = [(f"op{i}", {"example.com"}, PRIORITY_NORMAL, 0) for i in range(4)]
+    operations.append(("other", {"other.example"}, PRIORITY_NORMAL, 0))
+
+    started, start_times, _ = run_operations(
+        lambda: Scheduler(host_limits={"example.com": HostLimit(jobs=4, rate=20)}), operations
+    )
+
+    times = [start_times[f"op{i}"] for i in range(4)]
+
+    for earlier, later in zip(times, times[1:]):
+        assert later - earlier >= 0.045
+
+    # Operations on other hosts do not wait for the rate-limited host.
+    assert start_times["other"] < times[1]
+
+
+def test_scheduler_priority():
+    """Testing projector.scheduler.Scheduler starts operations with lower priorities first"""
+    operations = [("blocker", {"example.com"}, PRIORITY_NORMAL, 0.01)]
+    operations += [
+        ("normal", {"example.com"}, PRIORITY_NORMAL, 0),
+        ("working", {"other.example"}, PRIORITY_WORKING, 0),
+        ("critical", {"example.com"}, PRIORITY_CRITICAL, 0),
+    ]
+
+    started, _, _ = run_operations(lambda: Scheduler(jobs=1), operations)
+
+    assert started == ["blocker", "critical", "working", "normal"]
+
+
+def test_scheduler_skips_blocked_hosts():
+    """Testing projector.scheduler.Scheduler does not let busy hosts hold up other operations"""
+    operations = [
+        ("busy", {"busy.example"}, PRIORITY_NORMAL, 0.05),
+        ("critical", {"busy.example"}, PRIORITY_CRITICAL, 0),
+        ("normal", {"idle.example"}, PRIORITY_NORMAL, 0),
+    ]
+
+    started, _, _ = run_operations(
+        lambda: Scheduler(jobs=2, default_host_limit=HostLimit(jobs=1)), operations
+    )
+
+    assert started == ["busy", "normal", "critical"]
+
+
+def test_scheduler_cancel():
+    """Testing projector.scheduler.Scheduler releases capacity of cancelled operations"""
+
+    async def main():
+        scheduler = Scheduler(jobs=1)
+
+        async def hold():
+            async with scheduler.slot(hosts={"example.com"}):
+                await asyncio.sleep(1)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        holder.cancel()
+
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+
+        async with scheduler.slot(hosts={"example.com"}):
+            pass
+
+    asyncio.run(asyncio.wait_for(main(), 1))
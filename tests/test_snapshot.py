@@ -0,0 +1,155 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.snapshot."""
+
+import errno
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector import snapshot
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git, GitRepositorySchema
+from projector.snapshot import SnapshotStats, copy_tree, create_snapshot, restore_snapshot
+from projector.sync import sync_repositories
+
+
+def _unsupported(src, dst):
+    raise OSError(errno.EOPNOTSUPP, "Not supported")
+
+
+@pytest.fixture
+def environment(tmpdir, make_upstream):
+    """Return the configuration of a synchronized environment with a single repository."""
+    source = Path(str(tmpdir)) / "src"
+    upstream = make_upstream("upstream")
+
+    config = {
+        "directories": {"source": source},
+        "repositories": {
+            "repo": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load({"remotes": {"origin": upstream.as_uri()}}),
+            }
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    return config
+
+
+def test_create_restore_snapshot(tmpdir, git, environment):
+    """Testing projector.snapshot.create_snapshot and restore_snapshot"""
+    source = environment["directories"]["source"]
+    snapshot_path = Path(str(tmpdir)) / "snapshot"
+    repo = source / "repo"
+
+    git("repack", "--quiet", cwd=repo)
+    git("commit", "--quiet", "--allow-empty", "-m", "Loose", cwd=repo)
+    git("update-server-info", cwd=repo)
+    head = git("rev-parse", "HEAD", cwd=repo)
+
+    with spy_on(snapshot._reflink, call_fake=_unsupported):
+        stats = create_snapshot(environment, snapshot_path)
+
+    assert stats.reflinked == 0
+    assert stats.hardlinked > 0
+    assert stats.copied > 0
+
+    # Objects and packs are shared, but nothing else is.
+    shared = set()
+
+    for path in (repo / ".git" / "objects").rglob("*"):
+        if path.is_file():
+            copy = snapshot_path / path.relative_to(source)
+
+            if os.path.samefile(str(path), str(copy)):
+                shared.add(path.parent.name)
+
+    assert "pack" in shared
+    assert len(shared) > 1
+    assert "info" not in shared
+    assert (repo / ".git" / "objects" / "info" / "packs").is_file()
+
+    assert not os.path.samefile(str(repo / "README"), str(snapshot_path / "repo" / "README"))
+    assert git("status", "--porcelain", cwd=snapshot_path / "repo") == ""
+    assert git("rev-parse", "HEAD", cwd=snapshot_path / "repo") == head
+
+    (repo / "README").write_text("changed\n")
+    git("commit", "--quiet", "-am", "Change", cwd=repo)
+
+    assert (snapshot_path / "repo" / "README").read_text() == "upstream\n"
+
+    with spy_on(snapshot._reflink, call_fake=_unsupported):
+        restore_snapshot(environment, snapshot_path)
+
+    assert git("rev-parse", "HEAD", cwd=repo) == head
+    assert (repo / "README").read_text() == "upstream\n"
+    assert git("status", "--porcelain", cwd=repo) == ""
+    assert sorted(p.name for p in source.parent.iterdir() if p.name.startswith(".src")) == []
+
+    # The snapshot is untouched and can be restored again.
+    assert git("fsck", "--no-progress", cwd=snapshot_path / "repo") == ""
+
+
+def test_copy_tree_reflink(tmpdir):
+    """Testing projector.snapshot.copy_tree reflinks files when supported"""
+    root = Path(str(tmpdir))
+    src = root / "src"
+    (src / "dir").mkdir(parents=True)
+    (src / "dir" / "file").write_text("data")
+    os.symlink("dir/file", str(src / "link"))
+
+    def fake_reflink(src, dst):
+        shutil.copyfile(str(src), str(dst))
+
+    with spy_on(snapshot._reflink, call_fake=fake_reflink):
+        assert copy_tree(src, root / "dst") == SnapshotStats(reflinked=1)
+
+    assert (root / "dst" / "dir" / "file").read_text() == "data"
+    assert os.readlink(str(root / "dst" / "link")) == "dir/file"
+
+
+def test_copy_tree_failure(tmpdir):
+    """Testing projector.snapshot.copy_tree cleans up after failures"""
+    root = Path(str(tmpdir))
+    src = root / "src"
+    src.mkdir()
+    (src / "file").write_text("data")
+
+    def failing_reflink(src, dst):
+        raise OSError(errno.EIO, "I/O error")
+
+    with spy_on(snapshot._reflink, call_fake=failing_reflink):
+        with pytest.raises(OSError):
+            copy_tree(src, root / "dst")
+
+    assert not (root / "dst").exists()
+
+    with pytest.raises(FileExistsError):
+        copy_tree(src, src)
+
+    assert (src / "file").read_text() == "data"
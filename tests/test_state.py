@@ -0,0 +1,96 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.state."""
+
+import sqlite3
+from pathlib import Path
+
+from projector.scm_tools.git import Remote
+from projector.state import STATE_INDEX_NAME, RepositoryState, StateIndex, remote_urls
+
+
+def _git_config(ref="master", url="https://example.com/foo.git"):
+    return {"ref": ref, "remotes": {"origin": Remote.from_raw(url)}}
+
+
+def test_state_index_round_trip(tmpdir):
+    """Testing projector.state.StateIndex round trips state"""
+    source = Path(str(tmpdir)) / "src"
+    state = RepositoryState(
+        name="foo",
+        fingerprint="abc",
+        configured_ref="master",
+        remotes={"origin": "https://example.com/foo.git"},
+        synced_at=1234.5,
+        head="0" * 40,
+        ref="master",
+        ahead=1,
+        behind=2,
+    )
+
+    with StateIndex.for_source(source) as index:
+        assert index.get_all() == {}
+        index.update([state])
+
+    assert (source / STATE_INDEX_NAME).exists()
+
+    with StateIndex.for_source(source) as index:
+        assert index.get_all() == {"foo": state}
+
+        index.update([state._replace(head=None, ahead=None, behind=None)])
+        assert not index.get_all()["foo"].has_status
+
+
+def test_state_index_prune(tmpdir):
+    """Testing projector.state.StateIndex.prune"""
+    with StateIndex(Path(str(tmpdir)) / STATE_INDEX_NAME) as index:
+        index.update(RepositoryState(name, None, None, {}) for name in ("foo", "bar", "baz"))
+        index.prune(["bar", "qux"])
+
+        assert index.get_all().keys() == {"bar"}
+
+
+def test_state_index_version(tmpdir):
+    """Testing projector.state.StateIndex discards indices with a different version"""
+    path = Path(str(tmpdir)) / STATE_INDEX_NAME
+
+    with StateIndex(path) as index:
+        index.update([RepositoryState("foo", None, None, {})])
+
+    db = sqlite3.connect(str(path))
+
+    with db:
+        db.execute("PRAGMA user_version = 0")
+
+    db.close()
+
+    with StateIndex(path) as index:
+        assert index.get_all() == {}
+
+
+def test_repository_state_is_valid():
+    """Testing projector.state.RepositoryState.is_valid"""
+    config = _git_config()
+    state = RepositoryState("foo", "abc", "master", remote_urls(config))
+
+    assert state.is_valid("abc", config)
+    assert not state.is_valid(None, config)
+    assert not state.is_valid("def", config)
+    assert not state.is_valid("abc", _git_config(ref="dev"))
+    assert not state.is_valid("abc", _git_config(url="https://example.com/bar.git"))
+    assert not state._replace(fingerprint=None).is_valid(None, config)
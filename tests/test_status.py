@@ -0,0 +1,147 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.status."""
+
+from pathlib import Path
+
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git, run_git
+from projector.status import RepositoryStatus, get_status, scan_source
+from projector.sync import sync_repositories
+
+
+def test_scan_source(tmpdir):
+    """Testing projector.status.scan_source"""
+    source = Path(str(tmpdir))
+
+    (source / "foo").mkdir()
+    (source / "bar").mkdir()
+    (source / "file").write_text("")
+
+    assert scan_source(source) == {"foo", "bar"}
+    assert scan_source(source / "missing") == set()
+
+
+def test_get_status(tmpdir, git, make_upstream):
+    """Testing projector.status.get_status"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(root / "src")},
+            "repositories": {
+                "foo": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+                "bar": {
+                    "scm": "Git",
+                    "config": {"detach": True, "remotes": {"upstream": bar.as_uri()}},
+                },
+                "missing": {
+                    "scm": "Git",
+                    "config": {"ref": "dev", "remotes": {"origin": foo.as_uri()}},
+                },
+            },
+        }
+    )
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config).keys() == {"missing"}
+
+            local_foo = root / "src" / "foo"
+            git("commit", "--quiet", "--allow-empty", "-m", "Local", cwd=local_foo)
+            git("commit", "--quiet", "--allow-empty", "-m", "Upstream 1", cwd=foo)
+            git("commit", "--quiet", "--allow-empty", "-m", "Upstream 2", cwd=foo)
+            git("fetch", "--quiet", "origin", cwd=local_foo)
+            (local_foo / "README").write_text("changed\n")
+
+            statuses = get_status(config)
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert list(statuses) == ["foo", "bar", "missing"]
+    assert statuses["foo"] == RepositoryStatus(
+        name="foo",
+        present=True,
+        configured_ref="master",
+        ref="master",
+        head=git("rev-parse", "HEAD", cwd=local_foo).strip(),
+        dirty=True,
+        ahead=1,
+        behind=2,
+    )
+    assert statuses["bar"] == RepositoryStatus(
+        name="bar",
+        present=True,
+        configured_ref="master",
+        ref=None,
+        head=git("rev-parse", "HEAD", cwd=bar).strip(),
+        dirty=False,
+        ahead=0,
+        behind=0,
+    )
+    assert statuses["missing"] == RepositoryStatus(
+        name="missing", present=False, configured_ref="dev"
+    )
+
+
+def test_get_status_recorded(tmpdir, git, make_upstream):
+    """Testing projector.status.get_status reuses recorded state while refs are unchanged"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+
+    config = ConfigSchema().load(
+        {
+            "directories": {"source": str(root / "src")},
+            "repositories": {
+                "foo": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}}
+            },
+        }
+    )
+
+    def count_rev_list():
+        return sum(call.args[0] == "rev-list" for call in run_git.spy.calls)
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+
+            local_foo = root / "src" / "foo"
+
+            with spy_on(run_git):
+                first = get_status(config)
+                assert count_rev_list() == 1
+
+                (local_foo / "README").write_text("changed\n")
+                second = get_status(config)
+                assert count_rev_list() == 1
+
+                git("commit", "--quiet", "--allow-empty", "-m", "Local", cwd=local_foo)
+                third = get_status(config)
+                assert count_rev_list() == 2
+    finally:
+        get_scm_tools.cache_clear()
+
+    assert first["foo"].ahead == 0
+    assert not first["foo"].dirty
+    assert second["foo"] == first["foo"]._replace(dirty=True)
+    assert third["foo"].ahead == 1
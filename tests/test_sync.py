@@ -0,0 +1,327 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.sync."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector.dependencies import DependencyError
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.base import ScmTool
+from projector.scm_tools.git import Git, GitError, GitRepositorySchema
+from projector.sync import sync_repositories
+
+
+def test_sync_repositories(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories clones and then fetches"""
+    source = Path(str(tmpdir)) / "src"
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+
+    config = {
+        "directories": {"source": source},
+        "repositories": {
+            "foo": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {"remotes": {"origin": foo.as_uri(), "mirror": bar.as_uri()}}
+                ),
+            },
+            "bar": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {"detach": True, "remotes": {"upstream": {"url": bar.as_uri()}}}
+                ),
+            },
+            "baz": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {"remotes": {"origin": (source / "missing").as_uri()}}
+                ),
+            },
+            "qux": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {"remotes": {"origin": foo.as_uri(), "broken": (source / "missing").as_uri()}}
+                ),
+            },
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            errors = sync_repositories(config, jobs=2)
+
+            assert sorted(errors) == ["baz", "qux"]
+            assert isinstance(errors["baz"], GitError)
+            assert isinstance(errors["qux"], GitError)
+            assert not [path for path in source.iterdir() if "qux" in path.name]
+
+            assert (source / "foo" / "README").read_text() == "foo\n"
+            assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=source / "foo") == "master\n"
+            assert git("remote", cwd=source / "foo").split() == ["mirror", "origin"]
+            assert git("rev-parse", "mirror/master", cwd=source / "foo") == git(
+                "rev-parse", "HEAD", cwd=bar
+            )
+
+            assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=source / "bar") == "HEAD\n"
+
+            git("commit", "--quiet", "--allow-empty", "-m", "Second commit", cwd=foo)
+
+            assert sync_repositories(config, jobs=2).keys() == {"baz", "qux"}
+            assert not [path for path in source.iterdir() if "qux" in path.name]
+            assert git("rev-parse", "origin/master", cwd=source / "foo") == git(
+                "rev-parse", "HEAD", cwd=foo
+            )
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_sync_repositories_clone_options(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories with shallow, partial and single-branch clones"""
+    source = Path(str(tmpdir)) / "src"
+    upstream = make_upstream("upstream")
+
+    git("config", "uploadpack.allowFilter", "true", cwd=upstream)
+    git("commit", "--quiet", "--allow-empty", "-m", "Second commit", cwd=upstream)
+    git("branch", "other", cwd=upstream)
+
+    config = {
+        "directories": {"source": source},
+        "repositories": {
+            "repo": {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {
+                        "remotes": {"origin": upstream.as_uri()},
+                        "depth": 1,
+                        "filter": "blob:none",
+                        "single_branch": True,
+                    }
+                ),
+            }
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+
+            repo = source / "repo"
+            assert git("rev-list", "--count", "HEAD", cwd=repo) == "1\n"
+            assert git("config", "remote.origin.partialclonefilter", cwd=repo) == "blob:none\n"
+            assert "origin/other" not in git("branch", "--remotes", cwd=repo)
+
+            git("commit", "--quiet", "--allow-empty", "-m", "Third commit", cwd=upstream)
+
+            assert sync_repositories(config) == {}
+            assert git("rev-parse", "origin/master", cwd=repo) == git(
+                "rev-parse", "HEAD", cwd=upstream
+            )
+            assert git("rev-parse", "--is-shallow-repository", cwd=repo) == "true\n"
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_sync_repositories_jobs(tmpdir):
+    """Testing projector.sync.sync_repositories respects the concurrency limit"""
+    running = 0
+    max_running = 0
+
+    class FakeScm(ScmTool):
+        name = "Fake"
+
+        @classmethod
+        async def sync(cls, path, config, context):
+            nonlocal running, max_running
+
+            running += 1
+            max_running = max(running, max_running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    config = {
+        "directories": {"source": Path(str(tmpdir))},
+        "repositories": {f"repo-{i}": {"scm": "Fake", "config": {}} for i in range(20)},
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Fake": FakeScm}):
+            assert sync_repositories(config, jobs=3) == {}
+            assert max_running == 3
+
+            with pytest.raises(ValueError):
+                sync_repositories(config, jobs=0)
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_sync_repositories_max_age(tmpdir):
+    """Testing projector.sync.sync_repositories skips recently synchronized repositories"""
+    synced = []
+    fingerprint = "abc"
+
+    class FakeScm(ScmTool):
+        name = "Fake"
+
+        @classmethod
+        async def sync(cls, path, config, context):
+            synced.append(path.name)
+
+        @classmethod
+        def fingerprint(cls, path):
+            return fingerprint
+
+    config = {
+        "directories": {"source": Path(str(tmpdir))},
+        "repositories": {"foo": {"scm": "Fake", "config": {}}},
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Fake": FakeScm}):
+            assert sync_repositories(config, max_age=60) == {}
+            assert sync_repositories(config, max_age=60) == {}
+            assert synced == ["foo"]
+
+            assert sync_repositories(config) == {}
+            assert synced == ["foo", "foo"]
+
+            fingerprint = "def"
+            assert sync_repositories(config, max_age=60) == {}
+            assert synced == ["foo", "foo", "foo"]
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_sync_repositories_dependencies(tmpdir):
+    """Testing projector.sync.sync_repositories synchronizes dependencies first"""
+    events = []
+
+    class FakeScm(ScmTool):
+        name = "Fake"
+
+        @classmethod
+        async def sync(cls, path, config, context):
+            events.append(("start", path.name))
+            await asyncio.sleep(config["duration"])
+
+            if config.get("fail"):
+                raise Exception(f"{path.name} failed")
+
+            events.append(("end", path.name))
+
+    def make_repository(duration, depends_on=(), **config):
+        return {
+            "scm": "Fake",
+            "config": {"duration": duration, **config},
+            "depends_on": list(depends_on),
+        }
+
+    config = {
+        "directories": {"source": Path(str(tmpdir))},
+        "repositories": {
+            "docs": make_repository(0, ["app"]),
+            "other": make_repository(0.01),
+            "app": make_repository(0, ["lib", "util"]),
+            "util": make_repository(0.02),
+            "lib": make_repository(0.01),
+            "plugin": make_repository(0, ["broken"]),
+            "broken": make_repository(0, fail=True),
+            "extension": make_repository(0, ["plugin"]),
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Fake": FakeScm}):
+            errors = sync_repositories(config, jobs=8)
+
+            assert errors.keys() == {"broken", "plugin", "extension"}
+            assert isinstance(errors["plugin"], DependencyError)
+            assert errors["plugin"].dependencies == ["broken"]
+            assert errors["extension"].dependencies == ["plugin"]
+
+            # Independent repositories start at once, with the longest chains first.
+            assert events[:4] == [
+                ("start", "util"),
+                ("start", "lib"),
+                ("start", "broken"),
+                ("start", "other"),
+            ]
+
+            for dependency, dependent in (("lib", "app"), ("util", "app"), ("app", "docs")):
+                assert events.index(("end", dependency)) < events.index(("start", dependent))
+
+            assert ("start", "plugin") not in events
+            assert ("start", "extension") not in events
+    finally:
+        get_scm_tools.cache_clear()
+
+
+def test_sync_repositories_pinned_commit(tmpdir, git, make_upstream):
+    """Testing projector.sync.sync_repositories with a repository pinned to a commit"""
+    source = Path(str(tmpdir)) / "src"
+    upstream = make_upstream("upstream")
+    pinned = git("rev-parse", "HEAD", cwd=upstream).strip()
+
+    git("branch", "deadbeef", cwd=upstream)
+    git("commit", "--quiet", "--allow-empty", "-m", "Second commit", cwd=upstream)
+
+    repositories = {
+        "full": {"ref": pinned, "detach": True},
+        "abbreviated": {"ref": pinned[:12], "detach": True},
+        "shallow": {"ref": pinned, "detach": True, "depth": 1, "single_branch": True},
+        "branch": {"ref": "deadbeef", "single_branch": True},
+    }
+
+    config = {
+        "directories": {"source": source},
+        "repositories": {
+            name: {
+                "scm": "Git",
+                "config": GitRepositorySchema().load(
+                    {**repository, "remotes": {"origin": upstream.as_uri()}}
+                ),
+            }
+            for name, repository in repositories.items()
+        },
+    }
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            assert sync_repositories(config) == {}
+            assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    for name in ("full", "abbreviated", "shallow"):
+        repo = source / name
+
+        assert git("rev-parse", "HEAD", cwd=repo).strip() == pinned
+        assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=repo) == "HEAD\n"
+        assert git("status", "--porcelain", cwd=repo) == ""
+        assert (repo / "README").read_text() == "upstream\n"
+        assert git("rev-parse", "origin/master", cwd=repo) == git(
+            "rev-parse", "HEAD", cwd=upstream
+        )
+
+    assert git("rev-parse", "--is-shallow-repository", cwd=source / "shallow") == "true\n"
+    assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=source / "branch") == "deadbeef\n"
+    assert git("rev-parse", "HEAD", cwd=source / "branch").strip() == pinned
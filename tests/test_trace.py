@@ -0,0 +1,155 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.trace."""
+
+import asyncio
+import gc
+import json
+from pathlib import Path
+
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git
+from projector.sync import sync_repositories
+from projector.trace import Tracer, get_tracer, span, tracing
+
+
+def test_span_disabled():
+    """Testing projector.trace.span when tracing is disabled"""
+    assert get_tracer() is None
+
+    with span("foo"):
+        pass
+
+    assert span("foo") is span("bar", "other", arg=1)
+
+
+def test_tracing():
+    """Testing projector.trace.tracing"""
+    with tracing() as tracer:
+        assert get_tracer() is tracer
+
+        with span("outer", "test", arg=1):
+            with span("inner"):
+                pass
+
+    assert get_tracer() is None
+    assert [(s.name, s.category, s.args) for s in tracer.spans] == [
+        ("inner", "projector", {}),
+        ("outer", "test", {"arg": 1}),
+    ]
+
+    inner, outer = tracer.spans
+    assert inner.track == outer.track
+    assert outer.start <= inner.start
+    assert inner.start + inner.duration <= outer.start + outer.duration
+
+
+def test_tracing_tasks():
+    """Testing projector.trace.Tracer gives each asyncio task its own track"""
+
+    async def traced(name):
+        with span(name):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(traced("a"), traced("b"))
+
+    with tracing() as tracer:
+        asyncio.run(main())
+
+    assert len({s.track for s in tracer.spans}) == 2
+
+
+def test_tracing_tasks_sequential():
+    """Testing projector.trace.Tracer does not reuse the tracks of finished asyncio tasks"""
+
+    async def traced(i):
+        with span(f"task-{i}"):
+            pass
+
+    async def main():
+        for i in range(20):
+            await asyncio.ensure_future(traced(i))
+            gc.collect()
+
+    with tracing() as tracer:
+        asyncio.run(main())
+
+    assert len({s.track for s in tracer.spans}) == 20
+
+
+def test_export(tmpdir):
+    """Testing projector.trace.Tracer exports"""
+    root = Path(str(tmpdir))
+    tracer = Tracer()
+
+    with tracer.span("foo", "test", {"path": root}):
+        pass
+
+    tracer.write_json(root / "trace.json")
+    tracer.write_chrome_trace(root / "chrome.json")
+
+    [exported] = json.loads((root / "trace.json").read_text())
+    assert exported["name"] == "foo"
+    assert exported["args"] == {"path": str(root)}
+    assert exported["duration"] == tracer.spans[0].duration / 1e9
+
+    [event] = json.loads((root / "chrome.json").read_text())["traceEvents"]
+    assert event["ph"] == "X"
+    assert event["cat"] == "test"
+    assert event["ts"] == tracer.spans[0].start / 1000
+    assert event["dur"] == tracer.spans[0].duration / 1000
+
+
+def test_tracing_sync(tmpdir, make_upstream):
+    """Testing projector.trace spans are recorded for loading and synchronizing"""
+    upstream = make_upstream("foo")
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            with tracing() as tracer:
+                config = ConfigSchema().load(
+                    {
+                        "directories": {"source": str(Path(str(tmpdir)) / "src")},
+                        "repositories": {
+                            "foo": {
+                                "scm": "Git",
+                                "config": {"remotes": {"origin": upstream.as_uri()}},
+                            }
+                        },
+                    }
+                )
+
+                assert sync_repositories(config) == {}
+    finally:
+        get_scm_tools.cache_clear()
+
+    names = [s.name for s in tracer.spans]
+
+    assert names.index("validate_scm") < names.index("ConfigSchema.load")
+    assert "prepare" in names
+    assert "git clone" in names
+
+    sync_span = tracer.spans[names.index("sync")]
+    clone_span = tracer.spans[names.index("git clone")]
+
+    assert sync_span.args == {"repository": "foo", "scm": "Git"}
+    assert clone_span.track == sync_span.track
@@ -0,0 +1,71 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.urls."""
+
+import pytest
+
+from projector.urls import ParsedUrl, normalize_url, parse_url, url_host, url_slug
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            "git@github.com:brennie/projector.git",
+            ParsedUrl("ssh", "git", "github.com", "brennie/projector.git"),
+        ),
+        (
+            "ssh://git@GitHub.com:2222/brennie/projector.git",
+            ParsedUrl("ssh", "git", "github.com:2222", "/brennie/projector.git"),
+        ),
+        (
+            "https://github.com/brennie/projector",
+            ParsedUrl("https", None, "github.com", "/brennie/projector"),
+        ),
+        ("file:///src/projector", ParsedUrl("file", None, None, "/src/projector")),
+        ("/src/projector", ParsedUrl("file", None, None, "/src/projector")),
+    ],
+)
+def test_parse_url(url, expected):
+    """Testing projector.urls.parse_url"""
+    assert parse_url(url) == expected
+
+
+def test_normalize_url():
+    """Testing projector.urls.normalize_url"""
+    urls = [
+        "git@github.com:brennie/projector.git",
+        "ssh://git@github.com/brennie/projector.git",
+        "https://GitHub.com/brennie/projector/",
+        "https://github.com/brennie/projector.git",
+    ]
+
+    assert {normalize_url(url) for url in urls} == {"github.com/brennie/projector"}
+    assert len({url_slug(url) for url in urls}) == 1
+    assert url_slug(urls[0]).startswith("projector-")
+
+    assert normalize_url("/src/projector.git") == "file:/src/projector"
+    assert normalize_url("file:///src/projector") == "file:/src/projector"
+    assert normalize_url("https://example.com/projector") != normalize_url(urls[0])
+
+
+def test_url_host():
+    """Testing projector.urls.url_host"""
+    assert url_host("git@github.com:brennie/projector.git") == "github.com"
+    assert url_host("https://example.com:8443/foo.git") == "example.com:8443"
+    assert url_host("/src/projector") is None
@@ -0,0 +1,132 @@
+# projector - a tool for managing multiple repositories and setting up
+#             development environments.
+# Copyright (C) 2018 Barret Rennie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for projector.watch."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from kgb import spy_on
+
+from projector.config import ConfigSchema
+from projector.scm_tools import _get_scm_tools_uncached, get_scm_tools
+from projector.scm_tools.git import Git
+from projector.sync import sync_repositories, sync_repositories_async
+from projector.watch import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_ISDIR,
+    Inotify,
+    RepositoryWatcher,
+    is_supported,
+)
+
+
+pytestmark = pytest.mark.skipif(not is_supported(), reason="inotify is not supported")
+
+
+async def _wait_for(predicate, timeout=10):
+    """Wait for a predicate to become true."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    while not predicate():
+        assert loop.time() < deadline, "Timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_inotify(tmpdir):
+    """Testing projector.watch.Inotify"""
+    root = Path(str(tmpdir))
+
+    with Inotify() as inotify:
+        wd = inotify.add_watch(root)
+        assert inotify.read_events() == []
+
+        (root / "file").write_text("")
+        (root / "dir").mkdir()
+
+        events = inotify.read_events()
+        masks = {}
+
+        for event in events:
+            assert event.wd == wd
+            masks[event.name] = masks.get(event.name, 0) | event.mask
+
+        assert masks["file"] & IN_CREATE
+        assert masks["file"] & IN_CLOSE_WRITE
+        assert masks["dir"] & IN_CREATE
+        assert masks["dir"] & IN_ISDIR
+
+        with pytest.raises(FileNotFoundError):
+            inotify.add_watch(root / "missing")
+
+
+def test_repository_watcher(tmpdir, git, make_upstream):
+    """Testing projector.watch.RepositoryWatcher"""
+    root = Path(str(tmpdir))
+    foo = make_upstream("foo")
+    bar = make_upstream("bar")
+
+    raw_config = {
+        "directories": {"source": str(root / "src")},
+        "repositories": {
+            "foo": {"scm": "Git", "config": {"remotes": {"origin": foo.as_uri()}}},
+            "bar": {"scm": "Git", "config": {"remotes": {"origin": bar.as_uri()}}},
+        },
+    }
+    config = ConfigSchema().load(raw_config)
+    local_foo = root / "src" / "foo"
+
+    async def run():
+        with RepositoryWatcher(config, delay=0.01) as watcher:
+            await watcher.start()
+
+            assert watcher.statuses["foo"].ahead == 0
+            assert not watcher.statuses["bar"].present
+
+            task = asyncio.ensure_future(watcher.run())
+
+            try:
+                git("commit", "--quiet", "--allow-empty", "-m", "Local", cwd=local_foo)
+                await _wait_for(lambda: watcher.statuses["foo"].ahead == 1)
+
+                (local_foo / "README").write_text("changed\n")
+                git("add", "README", cwd=local_foo)
+                await _wait_for(lambda: watcher.statuses["foo"].dirty)
+
+                assert await sync_repositories_async(config) == {}
+                bar_head = git("rev-parse", "HEAD", cwd=bar).strip()
+                await _wait_for(lambda: watcher.statuses["bar"].head == bar_head)
+                assert watcher.statuses["bar"].behind == 0
+            finally:
+                task.cancel()
+
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+
+    try:
+        with spy_on(_get_scm_tools_uncached, call_fake=lambda: {"Git": Git}):
+            foo_only = ConfigSchema().load(
+                {**raw_config, "repositories": {"foo": raw_config["repositories"]["foo"]}}
+            )
+            assert sync_repositories(foo_only) == {}
+
+            asyncio.run(run())
+    finally:
+        get_scm_tools.cache_clear()